@@ -6,86 +6,106 @@
 """
 
 import os
+import base64
 import json
 import re
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Union
-from enum import Enum
-import openai
-from openai import OpenAI
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Union
 import argparse
 import sys
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
 
-# הגדרת מבנה הנתונים למסגרת 8 האלמנטים
-@dataclass
-class PromptElements:
-    """מסגרת 8 האלמנטים ליצירת פרומפט מקצועי"""
-    subject: str = ""           # נושא - מה/מי בתמונה
-    composition: str = ""       # קומפוזיציה - איך מסודר
-    style: str = ""            # סגנון - איזה מראה
-    lighting: str = ""         # תאורה - איזה אור
-    color: str = ""            # צבע - אילו צבעים
-    mood: str = ""             # מצב רוח - איזו תחושה
-    details: str = ""          # פרטים - מה לכלול/להשמיט
-    context: str = ""          # הקשר - למה זה מיועד
+import prompt_core
+from image_store import ImageStore
+# מבנה הנתונים מוגדר בליבה הקלה ומיוצא מחדש מכאן לתאימות לאחור
+from prompt_core import (CompositionType, LightingType, MoodType, PromptElements,  # noqa: F401
+                         StyleCategory)
+from rate_limiter import RequestScheduler
+from resilience import (APIRequestError, CircuitBreaker, DeadlineExceededError, PromptGeneratorError,
+                        RetryPolicy, call_with_retry, call_with_retry_async)
+from single_flight import AsyncSingleFlight, SingleFlight
+
+# asyncio (ssl, socket), prompt_cache (sqlite3) ו-cassette (gzip) נטענים רק
+# בשימוש - כמו openai; כאן רק לבדיקת טיפוסים
+if TYPE_CHECKING:
+    from cassette import Cassette
+    from prompt_cache import PromptCache
 
-class StyleCategory(Enum):
-    """קטגוריות סגנונות זמינות"""
-    REALISTIC = "realistic"
-    CARTOON = "cartoon"
-    WATERCOLOR = "watercolor"
-    OIL_PAINTING = "oil painting"
-    SKETCH = "sketch"
-    RENDER_3D = "3D render"
-    MINIMALIST = "minimalist"
-    VINTAGE = "vintage"
-    MODERN = "modern"
-    PHOTOGRAPHY = "professional photography"
+async def _close_with_loop(client, clients):
+    """
+    מחזיק לקוח אסינכרוני פתוח עד סיום לולאת האירועים שלו
 
-class LightingType(Enum):
-    """סוגי תאורה זמינים"""
-    SOFT_MORNING = "soft morning light"
-    DRAMATIC_SUNSET = "dramatic sunset"
-    STUDIO = "studio lighting"
-    NATURAL_DAYLIGHT = "natural daylight"
-    MOODY_SHADOWS = "moody shadows"
-    BRIGHT_AIRY = "bright and airy"
+    asyncio.run (וכל מי שקורא ל-loop.shutdown_asyncgens) סוגר גנרטורים
+    אסינכרוניים פתוחים לפני סגירת הלולאה - ה-finally מסיר אז את הלקוח
+    מ-clients וסוגר את מאגר החיבורים שלו, בזמן שהלולאה עדיין רצה.
+    """
+    import asyncio
 
-class MoodType(Enum):
-    """סוגי מצבי רוח"""
-    ENERGETIC = "energetic"
-    CALM = "calm"
-    MYSTERIOUS = "mysterious"
-    PROFESSIONAL = "professional"
-    PLAYFUL = "playful"
-    ELEGANT = "elegant"
-    RUSTIC = "rustic"
-    FUTURISTIC = "futuristic"
+    try:
+        yield
+    finally:
+        # הלולאה נלקחת כאן ולא כארגומנט - ערך במילון לא מחזיק את המפתח החלש
+        clients.pop(asyncio.get_running_loop(), None)
+        await client.close()
 
-class CompositionType(Enum):
-    """סוגי קומפוזיציה"""
-    CLOSE_UP = "close-up portrait"
-    WIDE_ANGLE = "wide angle"
-    BIRDS_EYE = "bird's eye view"
-    LOW_ANGLE = "low angle"
-    SYMMETRICAL = "symmetrical"
-    RULE_OF_THIRDS = "rule of thirds"
+@dataclass
+class GeneratedImage:
+    """תמונה שנוצרה - כתובת URL, או תוכן התמונה עצמו כשהתבקש b64_json"""
+    url: Optional[str] = None
+    data: Optional[bytes] = None
+    revised_prompt: Optional[str] = None
 
 class AIImagePromptGenerator:
     """מחולל פרומפטים מקצועי ליצירת תמונות"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, cache: Optional["PromptCache"] = None,
+                 scheduler: Optional[RequestScheduler] = None, retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, timeout: float = 60.0,
+                 image_store: Optional[ImageStore] = None, base_url: Optional[str] = None,
+                 cassette: Optional["Cassette"] = None):
         """
         אתחול המחולל
         
         Args:
             api_key: מפתח API של OpenAI (אם לא מועבר, יחפש במשתנה הסביבה)
+            cache: מטמון קבוע לתוצאות שיפור פרומפטים (אופציונלי)
+            scheduler: מתזמן משותף למגבלות קצב ומקביליות (אופציונלי, ניתן לשתף בין מחוללים)
+            retry_policy: מדיניות ניסיונות חוזרים לשגיאות זמניות (ברירת מחדל: 3 ניסיונות)
+            circuit_breaker: מפסק זרם משותף (ברירת מחדל: מפסק פרטי למחולל)
+            timeout: זמן מרבי בשניות לבקשת API בודדת
+            image_store: מאגר תמונות מקומי - בקשה חוזרת מוגשת מהדיסק (אופציונלי)
+            base_url: כתובת שרת תואם OpenAI (למשל mock_openai_server); ברירת מחדל: OpenAI
+            cassette: קסטת הקלטה/השמעה - בהשמעה התשובות מוגשות מהקסטה בלי רשת (אופציונלי)
         """
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-        if not self.api_key:
+        # השמעה מקסטה אינה פונה ל-API ולכן אינה דורשת מפתח
+        replaying = False
+        if cassette is not None:
+            from cassette import Cassette
+            replaying = cassette.mode == Cassette.REPLAY
+        if not self.api_key and not replaying:
             raise ValueError("נדרש מפתח API של OpenAI. הגדר את המשתנה OPENAI_API_KEY או העבר את המפתח בקונסטרקטור")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # הלקוחות (וה-SDK עצמו) נוצרים רק בקריאת הרשת הראשונה - ראו client
+        self.timeout = timeout
+        self.base_url = base_url
+        self._client = None
+        # לקוח אסינכרוני לכל לולאת אירועים - מאגר החיבורים קשור ללולאה שיצרה אותו
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._client_lock = threading.Lock()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.cache = cache
+        self.scheduler = scheduler
+        self.image_store = image_store
+        self.cassette = cassette
+        
+        # איחוד בקשות זהות שרצות במקביל
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
         
         # בנק ביטויים מועילים
         self.style_keywords = {
@@ -111,44 +131,198 @@ class AIImagePromptGenerator:
         Returns:
             פרומפט מעוצב
         """
-        prompt_parts = []
-        
-        # נושא (חובה)
-        if elements.subject:
-            prompt_parts.append(elements.subject)
-        
-        # קומפוזיציה
-        if elements.composition:
-            prompt_parts.append(f"composition: {elements.composition}")
+        return prompt_core.create_basic_prompt(elements)
+    
+    @property
+    def client(self):
+        """
+        לקוח OpenAI סינכרוני משותף
         
-        # סגנון
-        if elements.style:
-            prompt_parts.append(f"style: {elements.style}")
+        ייבוא ה-SDK ויצירת הלקוח נדחים לקריאה הראשונה, כך שבניית פרומפטים
+        ותבניות בלבד אינה משלמת עליהם. הניסיונות החוזרים מנוהלים כאן ולא
+        ב-SDK (max_retries=0), כדי שיעברו דרך המתזמן והמפסק.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=0)
+        return self._client
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    async def _get_async_client(self):
+        """
+        לקוח OpenAI אסינכרוני ללולאת האירועים הנוכחית - נוצר בקריאה הראשונה
+        בכל לולאה (למשל asyncio.run חוזר) ומחזיק מאגר חיבורים אחד, שנסגר
+        כשהלולאה מסתיימת (ראו _close_with_loop) או ב-aclose
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(loop)
+        if entry is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+            entry = self._async_clients[loop] = (client, _close_with_loop(client, self._async_clients))
+            # הצעד הראשון רושם את הגנרטור בלולאה, שתסגור אותו בסיומה
+            await entry[1].__anext__()
+        return entry[0]
+    
+    async def aclose(self):
+        """סגירת מאגר החיבורים של הלקוח האסינכרוני של הלולאה הנוכחית (לפני סיומה)"""
+        import asyncio
+
+        entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+    
+    def _request_tokens(self, request: dict) -> int:
+        """הערכת הטוקנים שבקשת chat תנצל (קלט ומקסימום פלט) לצורך תקציב TPM"""
+        prompt_tokens = sum(self._estimate_tokens(m["content"]) for m in request["messages"])
+        return prompt_tokens + request.get("max_tokens", 0)
+    
+    def _chat_completion(self, request: dict):
+        """קריאה ל-chat.completions עם ניסיונות חוזרים ומפסק זרם"""
+        return call_with_retry(lambda: self._chat_attempt(request), self.retry_policy, self.circuit_breaker)
+    
+    async def _chat_completion_async(self, request: dict):
+        """גרסה אסינכרונית של _chat_completion"""
+        return await call_with_retry_async(lambda: self._chat_attempt_async(request),
+                                           self.retry_policy, self.circuit_breaker)
+    
+    def _images_generate(self, request: dict):
+        """קריאה ל-images.generate עם ניסיונות חוזרים ומפסק זרם"""
+        return call_with_retry(lambda: self._images_attempt(request), self.retry_policy, self.circuit_breaker)
+    
+    async def _images_generate_async(self, request: dict):
+        """גרסה אסינכרונית של _images_generate"""
+        return await call_with_retry_async(lambda: self._images_attempt_async(request),
+                                           self.retry_policy, self.circuit_breaker)
+    
+    def _send(self, endpoint: str, request: dict):
+        """שליחת הבקשה ל-API, או דרך הקסטה אם הוגדרה (הקלטה/השמעה)"""
+        def send():
+            if endpoint == "chat":
+                return self.client.chat.completions.create(**request)
+            return self.client.images.generate(**request)
+        
+        if self.cassette is None:
+            return send()
+        return self.cassette.call(endpoint, request, send)
+    
+    async def _send_async(self, endpoint: str, request: dict):
+        """גרסה אסינכרונית של _send"""
+        async def send():
+            client = await self._get_async_client()
+            if endpoint == "chat":
+                return await client.chat.completions.create(**request)
+            return await client.images.generate(**request)
+        
+        if self.cassette is None:
+            return await send()
+        return await self.cassette.call_async(endpoint, request, send)
+    
+    def _chat_attempt(self, request: dict):
+        """ניסיון בודד של chat.completions דרך המתזמן המשותף (אם הוגדר)"""
+        if self.scheduler is None:
+            return self._send("chat", request)
         
-        # תאורה
-        if elements.lighting:
-            prompt_parts.append(f"lighting: {elements.lighting}")
+        ticket = self.scheduler.acquire("chat", self._request_tokens(request))
+        try:
+            response = self._send("chat", request)
+        except BaseException as e:
+            self.scheduler.release(ticket, error=e)
+            raise
+        if request.get("stream"):
+            # בהזרמה הבקשה נמשכת עד סוף הזרם - הכרטיס משוחרר רק אז
+            return self._stream_with_ticket(response, ticket)
+        usage = getattr(response, "usage", None)
+        self.scheduler.release(ticket, used_tokens=getattr(usage, "total_tokens", None))
+        return response
+    
+    def _stream_with_ticket(self, stream, ticket):
+        """הזרם עטוף כך שהכרטיס במתזמן מוחזק עד שהזרם נגמר, נכשל או נסגר"""
+        error = None
+        try:
+            yield from stream
+        except BaseException as e:
+            # גם GeneratorExit (זרם שננטש באמצע) אינו נספר כהצלחה ב-AIMD
+            error = e
+            raise
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            self.scheduler.release(ticket, error=error)
+    
+    async def _chat_attempt_async(self, request: dict):
+        """גרסה אסינכרונית של _chat_attempt"""
+        if self.scheduler is None:
+            return await self._send_async("chat", request)
         
-        # צבעים
-        if elements.color:
-            prompt_parts.append(f"colors: {elements.color}")
+        ticket = await self.scheduler.acquire_async("chat", self._request_tokens(request))
+        try:
+            response = await self._send_async("chat", request)
+        except BaseException as e:
+            self.scheduler.release(ticket, error=e)
+            raise
+        usage = getattr(response, "usage", None)
+        self.scheduler.release(ticket, used_tokens=getattr(usage, "total_tokens", None))
+        return response
+    
+    def _images_attempt(self, request: dict):
+        """ניסיון בודד של images.generate דרך המתזמן המשותף (אם הוגדר)"""
+        if self.scheduler is None:
+            return self._send("images", request)
         
-        # מצב רוח
-        if elements.mood:
-            prompt_parts.append(f"mood: {elements.mood}")
+        with self.scheduler.slot("images"):
+            return self._send("images", request)
+    
+    async def _images_attempt_async(self, request: dict):
+        """גרסה אסינכרונית של _images_attempt"""
+        if self.scheduler is None:
+            return await self._send_async("images", request)
         
-        # פרטים נוספים
-        if elements.details:
-            prompt_parts.append(f"details: {elements.details}")
+        async with self.scheduler.slot_async("images"):
+            return await self._send_async("images", request)
+    
+    def _enhance_request(self, basic_prompt: str, target_use: str) -> dict:
+        """בניית פרמטרי הבקשה לשיפור פרומפט"""
+        system_prompt = f"""
+        אתה מומחה ליצירת פרומפטים איכותיים למערכות AI ליצירת תמונות.
+        המטרה שלך היא לקחת פרומפט בסיסי ולשפר אותו למטרה: {target_use}
         
-        # הקשר
-        if elements.context:
-            prompt_parts.append(f"for: {elements.context}")
+        עקרונות לשיפור:
+        1. הוסף פרטים טכניים רלוונטיים (רזולוציה, סגנון צילום וכו')
+        2. השתמש במילות מפתח שמניבות תוצאות איכותיות
+        3. הוסף הוראות ספציפיות לקומפוזיציה ותאורה
+        4. ודא שהפרומפט ברור ומובנה
+        5. הוסף negative prompts לדברים שלא רוצים לראות
         
-        # הוספת משפרי איכות
-        prompt_parts.extend(["high quality", "detailed", "professional"])
+        החזר רק את הפרומפט המשופר, ללא הסברים נוספים.
+        """
         
-        return ", ".join(prompt_parts)
+        return dict(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"שפר את הפרומפט הבא: {basic_prompt}"}
+            ],
+            max_tokens=300,
+            temperature=0.7
+        )
+    
+    def _enhance_cache_key(self, basic_prompt: str, target_use: str, request: dict) -> Optional[str]:
+        """מפתח המטמון לבקשת שיפור, או None אם המטמון כבוי"""
+        if self.cache is None:
+            return None
+        from prompt_cache import PromptCache
+        return PromptCache.make_key(basic_prompt, target_use, request["model"],
+                                    request["temperature"], request["max_tokens"])
     
     def enhance_prompt_with_ai(self, basic_prompt: str, target_use: str = "general") -> str:
         """
@@ -160,49 +334,221 @@ class AIImagePromptGenerator:
             
         Returns:
             פרומפט משופר
+            
+        Raises:
+            APIRequestError: הבקשה נכשלה לאחר כל הניסיונות החוזרים
+            CircuitOpenError: השירות מסומן כלא זמין והבקשה נדחתה מיד
         """
-        system_prompt = f"""
-        אתה מומחה ליצירת פרומפטים איכותיים למערכות AI ליצירת תמונות.
-        המטרה שלך היא לקחת פרומפט בסיסי ולשפר אותו למטרה: {target_use}
-        
-        עקרונות לשיפור:
-        1. הוסף פרטים טכניים רלוונטיים (רזולוציה, סגנון צילום וכו')
-        2. השתמש במילות מפתח שמניבות תוצאות איכותיות
-        3. הוסף הוראות ספציפיות לקומפוזיציה ותאורה
-        4. ודא שהפרומפט ברור ומובנה
-        5. הוסף negative prompts לדברים שלא רוצים לראות
-        
-        החזר רק את הפרומפט המשופר, ללא הסברים נוספים.
+        # קריאות זהות שמגיעות במקביל ממתינות לבקשה אחת משותפת
+        return self._flight.do(("enhance", basic_prompt, target_use),
+                               self._enhance_prompt_with_ai, basic_prompt, target_use)
+    
+    def _enhance_prompt_with_ai(self, basic_prompt: str, target_use: str) -> str:
+        """ביצוע בקשת השיפור בפועל"""
+        request = self._enhance_request(basic_prompt, target_use)
+        cache_key = self._enhance_cache_key(basic_prompt, target_use, request)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = self._chat_completion(request)
+        
+        enhanced_prompt = response.choices[0].message.content.strip()
+        if cache_key:
+            self.cache.set(cache_key, enhanced_prompt)
+        return enhanced_prompt
+    
+    def enhance_prompt_with_ai_stream(self, basic_prompt: str, target_use: str = "general") -> Iterator[str]:
         """
+        שיפור הפרומפט עם הזרמה - מחזיר את קטעי הטקסט מיד כשהם מגיעים
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"שפר את הפרומפט הבא: {basic_prompt}"}
-                ],
-                max_tokens=300,
-                temperature=0.7
-            )
+        Args:
+            basic_prompt: הפרומפט הבסיסי
+            target_use: מטרת השימוש
             
-            enhanced_prompt = response.choices[0].message.content.strip()
-            return enhanced_prompt
+        Yields:
+            קטעי הפרומפט המשופר לפי הסדר (פגיעה במטמון מחזירה קטע אחד שלם)
             
+        Raises:
+            APIRequestError: הבקשה או ההזרמה נכשלו
+            CircuitOpenError: השירות מסומן כלא זמין והבקשה נדחתה מיד
+        """
+        request = self._enhance_request(basic_prompt, target_use)
+        cache_key = self._enhance_cache_key(basic_prompt, target_use, request)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        # ניסיונות חוזרים אפשריים רק עד שהזרם נפתח; אחרי קטע ראשון אין חזרה
+        stream = self._chat_completion(dict(request, stream=True))
+        parts = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
         except Exception as e:
-            print(f"שגיאה בשיפור הפרומפט: {e}")
-            return basic_prompt
+            raise APIRequestError(f"ההזרמה נקטעה: {e}", getattr(e, "status_code", None)) from e
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        
+        enhanced_prompt = "".join(parts).strip()
+        if cache_key and enhanced_prompt:
+            self.cache.set(cache_key, enhanced_prompt)
     
-    def reverse_engineer_prompt(self, image_description: str) -> PromptElements:
+    async def enhance_prompt_with_ai_async(self, basic_prompt: str, target_use: str = "general") -> str:
+        """גרסה אסינכרונית של enhance_prompt_with_ai"""
+        return await self._async_flight.do(("enhance", basic_prompt, target_use),
+                                           self._enhance_prompt_with_ai_async, basic_prompt, target_use)
+    
+    async def _enhance_prompt_with_ai_async(self, basic_prompt: str, target_use: str) -> str:
+        """ביצוע בקשת השיפור האסינכרונית בפועל"""
+        request = self._enhance_request(basic_prompt, target_use)
+        cache_key = self._enhance_cache_key(basic_prompt, target_use, request)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = await self._chat_completion_async(request)
+        
+        enhanced_prompt = response.choices[0].message.content.strip()
+        if cache_key:
+            self.cache.set(cache_key, enhanced_prompt)
+        return enhanced_prompt
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
         """
-        הנדסה לאחור - יצירת פרומפט מתיאור תמונה
+        הערכה גסה של מספר הטוקנים בטקסט
+        
+        טקסט לטיני - כ-4 תווים לטוקן; עברית ותווים אחרים - כטוקן לתו
+        """
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+    
+    def _batch_request(self, prompts: List[str], target_use: str) -> dict:
+        """בניית פרמטרי הבקשה לשיפור מספר פרומפטים בקריאה אחת"""
+        single = self._enhance_request("", target_use)
+        system_prompt = single["messages"][0]["content"] + f"""
+        תקבל מערך JSON של {len(prompts)} פרומפטים בסיסיים.
+        שפר כל אחד מהם בנפרד והחזר מערך JSON של {len(prompts)} מחרוזות באותו הסדר בדיוק.
+        החזר רק את מערך ה-JSON, ללא טקסט נוסף.
+        """
+        
+        return dict(
+            model=single["model"],
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": json.dumps(prompts, ensure_ascii=False)}
+            ],
+            max_tokens=single["max_tokens"] * len(prompts),
+            temperature=single["temperature"]
+        )
+    
+    def _plan_batches(self, prompts: List[str], target_use: str, max_batch_tokens: int,
+                      max_batch_size: int) -> List[List[str]]:
+        """חלוקת הפרומפטים לקבוצות לפי תקציב הטוקנים של בקשה אחת"""
+        single = self._enhance_request("", target_use)
+        overhead = self._estimate_tokens(single["messages"][0]["content"]) + 100
+        per_item_output = single["max_tokens"]
+        
+        batches = []
+        current = []
+        used = overhead
+        for prompt in prompts:
+            cost = self._estimate_tokens(prompt) + per_item_output
+            if current and (used + cost > max_batch_tokens or len(current) >= max_batch_size):
+                batches.append(current)
+                current = []
+                used = overhead
+            current.append(prompt)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _parse_batch_result(self, result: str, count: int) -> List[Optional[str]]:
+        """פענוח מערך ה-JSON שהוחזר; פריט שלא ניתן לפענח מסומן ב-None"""
+        try:
+            json_match = re.search(r'\[.*\]', result, re.DOTALL)
+            items = json.loads(json_match.group()) if json_match else None
+        except ValueError:
+            items = None
+        
+        # מערך באורך שגוי - אי אפשר לשייך פריטים לפרומפטים
+        if not isinstance(items, list) or len(items) != count:
+            return [None] * count
+        
+        return [item.strip() if isinstance(item, str) and item.strip() else None for item in items]
+    
+    def _enhance_batch(self, prompts: List[str], target_use: str) -> List[Optional[str]]:
+        """שיפור קבוצה אחת של פרומפטים בקריאת API אחת"""
+        response = self._chat_completion(self._batch_request(prompts, target_use))
+        result = response.choices[0].message.content.strip()
+        return self._parse_batch_result(result, len(prompts))
+    
+    def enhance_prompts_batch(self, prompts: List[str], target_use: str = "general",
+                              max_batch_tokens: int = 8000, max_batch_size: int = 20,
+                              max_concurrency: int = 4) -> List[str]:
+        """
+        שיפור מספר פרומפטים עם מספר מזערי של קריאות API
+        
+        הפרומפטים נארזים לקבוצות לפי תקציב טוקנים, וכל קבוצה נשלחת כבקשה אחת
+        שמחזירה מערך JSON. פריטים שלא פוענחו נשלחים שוב בנפרד.
         
         Args:
-            image_description: תיאור התמונה
+            prompts: רשימת פרומפטים בסיסיים
+            target_use: מטרת השימוש
+            max_batch_tokens: תקציב טוקנים (קלט ופלט) לבקשה אחת
+            max_batch_size: מספר פרומפטים מרבי בבקשה אחת
+            max_concurrency: מספר מרבי של בקשות במקביל
             
         Returns:
-            מבנה אלמנטים שמתאים לתיאור
+            רשימת פרומפטים משופרים באותו הסדר
         """
+        results: Dict[str, str] = {}
+        pending = []
+        for prompt in dict.fromkeys(prompts):
+            cache_key = self._enhance_cache_key(prompt, target_use, self._enhance_request(prompt, target_use))
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                results[prompt] = cached
+            else:
+                pending.append(prompt)
+        
+        batches = self._plan_batches(pending, target_use, max_batch_tokens, max_batch_size)
+        failed = []
+        if batches:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+                for batch, enhanced in zip(batches, executor.map(
+                        lambda batch: self._enhance_batch(batch, target_use), batches)):
+                    for prompt, item in zip(batch, enhanced):
+                        if item is None:
+                            failed.append(prompt)
+                            continue
+                        results[prompt] = item
+                        cache_key = self._enhance_cache_key(prompt, target_use,
+                                                            self._enhance_request(prompt, target_use))
+                        if cache_key:
+                            self.cache.set(cache_key, item)
+        
+        # ניסיון חוזר רק לפריטים שנכשלו, כל אחד בבקשה נפרדת
+        for prompt in failed:
+            results[prompt] = self.enhance_prompt_with_ai(prompt, target_use)
+        
+        return [results[prompt] for prompt in prompts]
+    
+    def _reverse_request(self, image_description: str) -> dict:
+        """בניית פרמטרי הבקשה להנדסה לאחור"""
         system_prompt = """
         אתה מומחה לניתוח תמונות וחילוץ אלמנטים ליצירת פרומפטים.
         קבל תיאור של תמונה וחלק אותו ל-8 האלמנטים הבאים:
@@ -218,35 +564,69 @@ class AIImagePromptGenerator:
         החזר תשובה בפורמט JSON עם המפתחות האלה.
         """
         
+        return dict(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"נתח את התמונה הבאה: {image_description}"}
+            ],
+            max_tokens=400,
+            temperature=0.3
+        )
+    
+    def _parse_reverse_result(self, result: str) -> PromptElements:
+        """חילוץ אלמנטים מתשובת המודל - JSON אם אפשר, אחרת טקסט חופשי"""
+        # ניסיון לחלץ JSON מהתשובה
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"נתח את התמונה הבאה: {image_description}"}
-                ],
-                max_tokens=400,
-                temperature=0.3
-            )
-            
-            result = response.choices[0].message.content.strip()
-            
-            # ניסיון לחלץ JSON מהתשובה
-            try:
-                # חיפוש JSON בתשובה
-                json_match = re.search(r'\{.*\}', result, re.DOTALL)
-                if json_match:
-                    elements_dict = json.loads(json_match.group())
-                    return PromptElements(**elements_dict)
-            except:
-                pass
+            # חיפוש JSON בתשובה
+            json_match = re.search(r'\{.*\}', result, re.DOTALL)
+            if json_match:
+                elements_dict = json.loads(json_match.group())
+                return PromptElements(**elements_dict)
+        except:
+            pass
+        
+        # אם לא הצלחנו לחלץ JSON, ננסה לפרסר ידנית
+        return self._parse_elements_from_text(result)
+    
+    def reverse_engineer_prompt(self, image_description: str) -> PromptElements:
+        """
+        הנדסה לאחור - יצירת פרומפט מתיאור תמונה
+        
+        Args:
+            image_description: תיאור התמונה
             
-            # אם לא הצלחנו לחלץ JSON, ננסה לפרסר ידנית
-            return self._parse_elements_from_text(result)
+        Returns:
+            מבנה אלמנטים שמתאים לתיאור
             
-        except Exception as e:
-            print(f"שגיאה בהנדסה לאחור: {e}")
-            return PromptElements()
+        Raises:
+            APIRequestError: הבקשה נכשלה לאחר כל הניסיונות החוזרים
+            CircuitOpenError: השירות מסומן כלא זמין והבקשה נדחתה מיד
+        """
+        elements = self._flight.do(("reverse", image_description),
+                                   self._reverse_engineer_prompt, image_description)
+        # כל קורא מקבל עותק משלו של התוצאה המשותפת
+        return replace(elements)
+    
+    def _reverse_engineer_prompt(self, image_description: str) -> PromptElements:
+        """ביצוע בקשת ההנדסה לאחור בפועל"""
+        response = self._chat_completion(self._reverse_request(image_description))
+        
+        result = response.choices[0].message.content.strip()
+        return self._parse_reverse_result(result)
+    
+    async def reverse_engineer_prompt_async(self, image_description: str) -> PromptElements:
+        """גרסה אסינכרונית של reverse_engineer_prompt"""
+        elements = await self._async_flight.do(("reverse", image_description),
+                                               self._reverse_engineer_prompt_async, image_description)
+        return replace(elements)
+    
+    async def _reverse_engineer_prompt_async(self, image_description: str) -> PromptElements:
+        """ביצוע בקשת ההנדסה לאחור האסינכרונית בפועל"""
+        response = await self._chat_completion_async(self._reverse_request(image_description))
+        
+        result = response.choices[0].message.content.strip()
+        return self._parse_reverse_result(result)
     
     def _parse_elements_from_text(self, text: str) -> PromptElements:
         """פענוח אלמנטים מטקסט חופשי"""
@@ -275,6 +655,27 @@ class AIImagePromptGenerator:
         
         return elements
     
+    def _image_request(self, prompt: str, size: str, quality: str, response_format: str = "url") -> dict:
+        """בניית פרמטרי הבקשה ליצירת תמונה"""
+        return dict(
+            model="dall-e-3",
+            prompt=prompt,
+            size=size,
+            quality=quality,
+            n=1,
+            response_format=response_format,
+        )
+    
+    def _generated_image(self, response) -> GeneratedImage:
+        """המרת תשובת ה-API ל-GeneratedImage; תוכן b64 מפוענח פעם אחת בלבד"""
+        item = response.data[0]
+        b64_json = getattr(item, "b64_json", None)
+        return GeneratedImage(
+            url=getattr(item, "url", None),
+            data=base64.b64decode(b64_json) if b64_json else None,
+            revised_prompt=getattr(item, "revised_prompt", None),
+        )
+    
     def generate_image(self, prompt: str, size: str = "1024x1024", quality: str = "standard") -> str:
         """
         יצירת תמונה באמצעות DALL-E
@@ -286,60 +687,198 @@ class AIImagePromptGenerator:
             
         Returns:
             URL של התמונה שנוצרה
-        """
-        try:
-            response = self.client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality=quality,
-                n=1,
-            )
-            
-            return response.data[0].url
             
-        except Exception as e:
-            print(f"שגיאה ביצירת התמונה: {e}")
-            return None
+        Raises:
+            APIRequestError: הבקשה נכשלה לאחר כל הניסיונות החוזרים
+            CircuitOpenError: השירות מסומן כלא זמין והבקשה נדחתה מיד
+        """
+        # עם מאגר מקומי - כתובת file:// של העותק השמור
+        if self.image_store is not None:
+            return self.generate_image_data(prompt, size, quality).url
+        
+        response = self._images_generate(self._image_request(prompt, size, quality))
+        
+        return response.data[0].url
     
-    def create_campaign_prompts(self, business_type: str, brand_colors: List[str] = None) -> Dict[str, str]:
+    async def generate_image_async(self, prompt: str, size: str = "1024x1024", quality: str = "standard") -> str:
+        """גרסה אסינכרונית של generate_image"""
+        if self.image_store is not None:
+            return (await self.generate_image_data_async(prompt, size, quality)).url
+        
+        response = await self._images_generate_async(self._image_request(prompt, size, quality))
+        
+        return response.data[0].url
+    
+    def generate_image_data(self, prompt: str, size: str = "1024x1024", quality: str = "standard",
+                            response_format: str = "b64_json") -> GeneratedImage:
         """
-        יצירת סדרת פרומפטים לקמפיין שיווקי
+        יצירת תמונה עם קבלת התוכן בתשובה עצמה
+        
+        עם b64_json התמונה מגיעה בתשובת היצירה, כך שאין צורך בהורדה נוספת
+        לתצוגה או לשמירה.
         
         Args:
-            business_type: סוג העסק
-            brand_colors: צבעי המותג
+            prompt: הפרומפט ליצירת התמונה
+            size: גודל התמונה
+            quality: איכות התמונה
+            response_format: "b64_json" (תוכן התמונה) או "url"
             
         Returns:
-            מילון עם פרומפטים שונים לקמפיין
+            GeneratedImage עם data (ב-b64_json) או url
         """
+        request = self._image_request(prompt, size, quality, response_format)
+        store_key = self._image_store_key(request)
+        if store_key:
+            stored = self._load_stored_image(store_key)
+            if stored is not None:
+                return stored
+            # שמירה במאגר דורשת את תוכן התמונה
+            request["response_format"] = "b64_json"
+        
+        generated = self._generated_image(self._images_generate(request))
+        if store_key:
+            self._save_stored_image(store_key, generated)
+        return generated
+    
+    async def generate_image_data_async(self, prompt: str, size: str = "1024x1024", quality: str = "standard",
+                                        response_format: str = "b64_json") -> GeneratedImage:
+        """גרסה אסינכרונית של generate_image_data"""
+        request = self._image_request(prompt, size, quality, response_format)
+        store_key = self._image_store_key(request)
+        if store_key:
+            stored = self._load_stored_image(store_key)
+            if stored is not None:
+                return stored
+            request["response_format"] = "b64_json"
+        
+        generated = self._generated_image(await self._images_generate_async(request))
+        if store_key:
+            self._save_stored_image(store_key, generated)
+        return generated
+    
+    def _image_store_key(self, request: dict) -> Optional[str]:
+        """מפתח התמונה במאגר המקומי, או None אם המאגר כבוי"""
+        if self.image_store is None:
+            return None
+        return ImageStore.make_key(request["model"], request["prompt"], request["size"], request["quality"])
+    
+    def _load_stored_image(self, key: str) -> Optional[GeneratedImage]:
+        """תמונה מהמאגר המקומי, או None"""
+        data = self.image_store.get(key)
+        path = self.image_store.path(key)
+        if data is None or path is None:
+            return None
+        return GeneratedImage(url=Path(path).resolve().as_uri(), data=data)
+    
+    def _save_stored_image(self, key: str, generated: GeneratedImage):
+        """שמירת תמונה שנוצרה במאגר; הכתובת מוחלפת בעותק המקומי"""
+        # תשובה ללא תוכן (למשל url בלבד מ-API תואם) - אין מה לשמור
+        if generated.data is None:
+            return
+        path = self.image_store.put(key, generated.data)
+        generated.url = Path(path).resolve().as_uri()
+    
+    def _campaign_base_prompts(self, business_type: str, brand_colors: Optional[List[str]]) -> Dict[str, str]:
+        """פרומפטי הבסיס של הקמפיין לפני שיפור"""
         colors_str = f"brand colors: {', '.join(brand_colors)}" if brand_colors else ""
         
-        prompts = {
+        return {
             "logo": f"minimalist logo design for {business_type}, {colors_str}, clean, professional, vector style",
             "instagram_post": f"Instagram post design for {business_type}, {colors_str}, engaging, modern, social media optimized",
             "hero_image": f"hero banner image for {business_type} website, {colors_str}, professional, engaging, wide format",
             "avatar": f"profile avatar for {business_type}, {colors_str}, circular, clean, recognizable"
         }
+    
+    def create_campaign_prompts(self, business_type: str, brand_colors: List[str] = None,
+                                max_concurrency: int = 4, timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        יצירת סדרת פרומפטים לקמפיין שיווקי
+        
+        השיפורים מול ה-API רצים במקביל, כך שזמן הקמפיין קרוב לזמן הקריאה האיטית ביותר
+        
+        Args:
+            business_type: סוג העסק
+            brand_colors: צבעי המותג
+            max_concurrency: מספר מרבי של קריאות API במקביל
+            timeout: זמן מרבי בשניות לכל הקמפיין (None - ללא הגבלה)
+            
+        Returns:
+            מילון עם פרומפטים שונים לקמפיין
+            
+        Raises:
+            DeadlineExceededError: הקמפיין לא הושלם בזמן (הפרומפטים שהושלמו ב-partial)
+        """
+        prompts = self._campaign_base_prompts(business_type, brand_colors)
+        target_use = f"marketing for {business_type}"
+        
+        # שיפור כל הפרומפטים עם AI במקביל
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts))))
+        futures = {}
+        try:
+            for key, prompt in prompts.items():
+                futures[key] = executor.submit(self.enhance_prompt_with_ai, prompt, target_use)
+            wait(futures.values(), timeout=timeout)
+        finally:
+            # לא ממתינים לקריאות שחרגו מהזמן - הן יסתיימו ברקע
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
         
-        # שיפור כל פרומפט עם AI
         enhanced_prompts = {}
-        for key, prompt in prompts.items():
-            enhanced_prompts[key] = self.enhance_prompt_with_ai(prompt, f"marketing for {business_type}")
+        missing = []
+        for key, future in futures.items():
+            if future.done() and not future.cancelled():
+                enhanced_prompts[key] = future.result()
+            else:
+                missing.append(key)
+        
+        if missing:
+            raise DeadlineExceededError(f"חריגה מזמן הקמפיין בשיפור: {', '.join(missing)}",
+                                        partial=enhanced_prompts)
+        return enhanced_prompts
+    
+    async def create_campaign_prompts_async(self, business_type: str, brand_colors: List[str] = None,
+                                            max_concurrency: int = 4,
+                                            timeout: Optional[float] = None) -> Dict[str, str]:
+        """גרסה אסינכרונית של create_campaign_prompts - כל השיפורים רצים על לולאת האירועים"""
+        import asyncio
+
+        prompts = self._campaign_base_prompts(business_type, brand_colors)
+        target_use = f"marketing for {business_type}"
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def enhance(prompt):
+            async with semaphore:
+                return await self.enhance_prompt_with_ai_async(prompt, target_use)
         
+        tasks = {key: asyncio.ensure_future(enhance(prompt)) for key, prompt in prompts.items()}
+        try:
+            await asyncio.wait(tasks.values(), timeout=timeout)
+            
+            enhanced_prompts = {}
+            missing = []
+            for key, task in tasks.items():
+                if task.done():
+                    enhanced_prompts[key] = task.result()
+                else:
+                    missing.append(key)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        
+        if missing:
+            raise DeadlineExceededError(f"חריגה מזמן הקמפיין בשיפור: {', '.join(missing)}",
+                                        partial=enhanced_prompts)
         return enhanced_prompts
     
     def save_elements_template(self, elements: PromptElements, filename: str):
         """שמירת תבנית אלמנטים לקובץ"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(elements.__dict__, f, ensure_ascii=False, indent=2)
+        prompt_core.save_elements_template(elements, filename)
     
     def load_elements_template(self, filename: str) -> PromptElements:
         """טעינת תבנית אלמנטים מקובץ"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return PromptElements(**data)
+            return prompt_core.load_elements_template(filename)
         except Exception as e:
             print(f"שגיאה בטעינת התבנית: {e}")
             return PromptElements()
@@ -360,11 +899,26 @@ def main():
     parser.add_argument('--generate', action='store_true', help='יצירת התמונה')
     parser.add_argument('--save-template', help='שמירת התבנית לקובץ')
     parser.add_argument('--load-template', help='טעינת תבנית מקובץ')
+    parser.add_argument('--cache', help='קובץ מטמון לתוצאות שיפור (SQLite)')
+    parser.add_argument('--cache-ttl', type=float, help='תוקף רשומות המטמון בשניות')
+    parser.add_argument('--image-store', help='תיקיית מאגר תמונות מקומי')
+    parser.add_argument('--base-url', help='כתובת שרת תואם OpenAI (למשל שרת מדומה מקומי)')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', help='הקלטת תעבורת ה-API לקסטה (.jsonl.gz)')
+    cassette_group.add_argument('--replay', help='השמעת תשובות מקסטה, ללא רשת')
     
     args = parser.parse_args()
+    from cassette import Cassette
+    from prompt_cache import PromptCache
     
+    cassette = None
     try:
-        generator = AIImagePromptGenerator(args.api_key)
+        cache = PromptCache(args.cache, ttl=args.cache_ttl) if args.cache else None
+        image_store = ImageStore(args.image_store) if args.image_store else None
+        if args.record or args.replay:
+            cassette = Cassette(args.record or args.replay, Cassette.RECORD if args.record else Cassette.REPLAY)
+        generator = AIImagePromptGenerator(args.api_key, cache=cache, image_store=image_store,
+                                           base_url=args.base_url, cassette=cassette)
         
         # טעינת תבנית אם נדרשה
         if args.load_template:
@@ -387,9 +941,14 @@ def main():
         
         # שיפור עם AI אם נדרש
         if args.enhance:
-            enhanced_prompt = generator.enhance_prompt_with_ai(basic_prompt)
-            print(f"פרומפט משופר:\n{enhanced_prompt}\n")
-            final_prompt = enhanced_prompt
+            try:
+                enhanced_prompt = generator.enhance_prompt_with_ai(basic_prompt)
+                print(f"פרומפט משופר:\n{enhanced_prompt}\n")
+                final_prompt = enhanced_prompt
+            except PromptGeneratorError as e:
+                print(f"שגיאה בשיפור הפרומפט: {e}")
+                print("ממשיך עם הפרומפט הבסיסי\n")
+                final_prompt = basic_prompt
         else:
             final_prompt = basic_prompt
         
@@ -410,6 +969,9 @@ def main():
     except Exception as e:
         print(f"שגיאה: {e}")
         sys.exit(1)
+    finally:
+        if cassette is not None:
+            cassette.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+הקלטה והשמעה של תעבורת ה-API - קסטות JSONL דחוסות לפי hash של הבקשה
+Record/replay cassettes for deterministic offline runs
+
+במצב הקלטה כל תשובה (כולל קטעי הזרמה) נשמרת עם זמני התגובה המקוריים;
+במצב השמעה התשובות מוגשות מהקסטה בלי רשת ובלי עלות - בזמנים המקוריים
+או במהירות מלאה.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Iterator, List
+
+from resilience import PromptGeneratorError
+
+
+class CassetteMissError(PromptGeneratorError):
+    """במצב השמעה - הבקשה אינה מוקלטת בקסטה"""
+
+
+def request_key(endpoint: str, request: dict) -> str:
+    """מפתח הבקשה בקסטה: hash של נקודת הקצה והפרמטרים (בסדר מפתחות קבוע)"""
+    payload = json.dumps([endpoint, request], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _to_jsonable(obj: Any) -> Any:
+    """המרת תשובת SDK (pydantic) או אובייקט דמה למבנה JSON"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, SimpleNamespace):
+        obj = vars(obj)
+    if isinstance(obj, dict):
+        return {key: _to_jsonable(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_jsonable(value) for value in obj]
+    return obj
+
+
+def _to_response(data: Any) -> Any:
+    """מבנה JSON מוקלט -> אובייקט עם גישה בתכונות, כמו תשובת ה-SDK"""
+    if isinstance(data, dict):
+        return SimpleNamespace(**{key: _to_response(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [_to_response(value) for value in data]
+    return data
+
+
+class Cassette:
+    """
+    קסטת הקלטה/השמעה לקריאות chat.completions ו-images.generate
+
+    קובץ הקסטה הוא JSONL דחוס ב-gzip, רשומה לכל תשובה. בקשה שהוקלטה כמה
+    פעמים מושמעת לפי סדר ההקלטה ובמחזוריות.
+    """
+
+    RECORD = "record"
+    REPLAY = "replay"
+
+    def __init__(self, path: str, mode: str = REPLAY, realtime: bool = False, speed: float = 1.0):
+        """
+        Args:
+            path: קובץ הקסטה (.jsonl.gz)
+            mode: "record" (קריאות אמיתיות נשמרות; קובץ קיים נדרס) או "replay"
+            realtime: בהשמעה - המתנה לפי זמני התגובה המקוריים (אחרת מהירות מלאה)
+            speed: מקדם מהירות להשמעה בזמן אמת (2.0 - פי שניים מהר יותר)
+        """
+        if mode not in (self.RECORD, self.REPLAY):
+            raise ValueError(f"מצב קסטה לא מוכר: {mode}")
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[dict]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+        self._file = None
+        if mode == self.REPLAY:
+            self._load()
+        else:
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+            except (EOFError, ValueError):
+                # הקלטה שנקטעה (התהליך נעצר לפני close) - הרשומות השלמות נשמרות
+                pass
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def close(self):
+        """סגירת קובץ ההקלטה"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._entries[entry["key"]].append(entry)
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            # flush כותב בלוק gzip שלם - קסטה שנקטעה באמצע עדיין קריאה
+            self._file.flush()
+
+    def _next_entry(self, endpoint: str, request: dict) -> dict:
+        key = request_key(endpoint, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(f"הבקשה ({endpoint}) אינה מוקלטת בקסטה {self.path}")
+            position = self._positions[key]
+            self._positions[key] = position + 1
+            return entries[position % len(entries)]
+
+    def _delay(self, seconds: float) -> float:
+        return seconds / self.speed if self.realtime else 0.0
+
+    def call(self, endpoint: str, request: dict, send: Callable[[], Any]) -> Any:
+        """
+        ביצוע בקשה דרך הקסטה
+
+        Args:
+            endpoint: "chat" או "images"
+            request: פרמטרי הבקשה (המפתח בקסטה)
+            send: הקריאה האמיתית (בהקלטה בלבד)
+        """
+        if self.mode == self.RECORD:
+            started = time.monotonic()
+            response = send()
+            if request.get("stream"):
+                return self._record_stream(endpoint, request, response, started)
+            self._write({"key": request_key(endpoint, request), "endpoint": endpoint, "request": request,
+                         "elapsed": time.monotonic() - started, "response": _to_jsonable(response)})
+            return response
+
+        entry = self._next_entry(endpoint, request)
+        if "chunks" in entry:
+            return self._replay_stream(entry)
+        time.sleep(self._delay(entry["elapsed"]))
+        return _to_response(entry["response"])
+
+    async def call_async(self, endpoint: str, request: dict, send: Callable[[], Awaitable[Any]]) -> Any:
+        """גרסה אסינכרונית של call (ללא הזרמה)"""
+        if self.mode == self.RECORD:
+            started = time.monotonic()
+            response = await send()
+            self._write({"key": request_key(endpoint, request), "endpoint": endpoint, "request": request,
+                         "elapsed": time.monotonic() - started, "response": _to_jsonable(response)})
+            return response
+
+        entry = self._next_entry(endpoint, request)
+        await asyncio.sleep(self._delay(entry["elapsed"]))
+        return _to_response(entry["response"])
+
+    def _record_stream(self, endpoint: str, request: dict, stream, started: float) -> Iterator[Any]:
+        """העברת קטעי ההזרמה הלאה תוך הקלטתם; נשמר רק זרם שהסתיים במלואו"""
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append([time.monotonic() - started, _to_jsonable(chunk)])
+                yield chunk
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        self._write({"key": request_key(endpoint, request), "endpoint": endpoint, "request": request,
+                     "elapsed": time.monotonic() - started, "chunks": chunks})
+
+    def _replay_stream(self, entry: dict) -> Iterator[Any]:
+        """השמעת קטעי ההזרמה בהפרשי הזמן המקוריים"""
+        previous = 0.0
+        for offset, chunk in entry["chunks"]:
+            time.sleep(self._delay(offset - previous))
+            previous = offset
+            yield _to_response(chunk)
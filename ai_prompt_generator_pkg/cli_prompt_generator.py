@@ -5,76 +5,20 @@
 Simple Prompt Generator for AI Images - CLI Version
 """
 
-import json
-import os
 import argparse
-from dataclasses import dataclass
-from enum import Enum
-
-
-# הגדרת מבנה הנתונים למסגרת 8 האלמנטים
-@dataclass
-class PromptElements:
-    """מסגרת 8 האלמנטים ליצירת פרומפט מקצועי"""
-
-    subject: str = ""  # נושא - מה/מי בתמונה
-    composition: str = ""  # קומפוזיציה - איך מסודר
-    style: str = ""  # סגנון - איזה מראה
-    lighting: str = ""  # תאורה - איזה אור
-    color: str = ""  # צבע - אילו צבעים
-    mood: str = ""  # מצב רוח - איזו תחושה
-    details: str = ""  # פרטים - מה לכלול/להשמיט
-    context: str = ""  # הקשר - למה זה מיועד
-
-
-class StyleCategory(Enum):
-    """קטגוריות סגנונות זמינות"""
-
-    REALISTIC = "realistic"
-    CARTOON = "cartoon"
-    WATERCOLOR = "watercolor"
-    OIL_PAINTING = "oil painting"
-    SKETCH = "sketch"
-    RENDER_3D = "3D render"
-    MINIMALIST = "minimalist"
-    VINTAGE = "vintage"
-    MODERN = "modern"
-    PHOTOGRAPHY = "professional photography"
-
-
-class LightingType(Enum):
-    """סוגי תאורה זמינים"""
-
-    SOFT_MORNING = "soft morning light"
-    DRAMATIC_SUNSET = "dramatic sunset"
-    STUDIO = "studio lighting"
-    NATURAL_DAYLIGHT = "natural daylight"
-    MOODY_SHADOWS = "moody shadows"
-    BRIGHT_AIRY = "bright and airy"
-
-
-class MoodType(Enum):
-    """סוגי מצבי רוח"""
-
-    ENERGETIC = "energetic"
-    CALM = "calm"
-    MYSTERIOUS = "mysterious"
-    PROFESSIONAL = "professional"
-    PLAYFUL = "playful"
-    ELEGANT = "elegant"
-    RUSTIC = "rustic"
-    FUTURISTIC = "futuristic"
-
-
-class CompositionType(Enum):
-    """סוגי קומפוזיציה"""
+import os
+import sys
 
-    CLOSE_UP = "close-up portrait"
-    WIDE_ANGLE = "wide angle"
-    BIRDS_EYE = "bird's eye view"
-    LOW_ANGLE = "low angle"
-    SYMMETRICAL = "symmetrical"
-    RULE_OF_THIRDS = "rule of thirds"
+import prompt_batch
+import prompt_core
+from prompt_core import (
+    CompositionType,
+    LightingType,
+    MoodType,
+    PromptElements,
+    StyleCategory,
+)
+from prompt_templates import ParametricTemplate
 
 
 class SimplePromptGenerator:
@@ -86,56 +30,16 @@ class SimplePromptGenerator:
 
     def create_basic_prompt(self, elements):
         """יצירת פרומפט בסיסי מאלמנטים"""
-        prompt_parts = []
-
-        # נושא (חובה)
-        if elements.subject:
-            prompt_parts.append(elements.subject)
-
-        # קומפוזיציה
-        if elements.composition:
-            prompt_parts.append(f"composition: {elements.composition}")
-
-        # סגנון
-        if elements.style:
-            prompt_parts.append(f"style: {elements.style}")
-
-        # תאורה
-        if elements.lighting:
-            prompt_parts.append(f"lighting: {elements.lighting}")
-
-        # צבעים
-        if elements.color:
-            prompt_parts.append(f"colors: {elements.color}")
-
-        # מצב רוח
-        if elements.mood:
-            prompt_parts.append(f"mood: {elements.mood}")
-
-        # פרטים נוספים
-        if elements.details:
-            prompt_parts.append(f"details: {elements.details}")
-
-        # הקשר
-        if elements.context:
-            prompt_parts.append(f"for: {elements.context}")
-
-        # הוספת משפרי איכות
-        prompt_parts.extend(["high quality", "detailed", "professional"])
-
-        return ", ".join(prompt_parts)
+        return prompt_core.create_basic_prompt(elements)
 
     def save_template(self, elements, filename):
         """שמירת תבנית לקובץ"""
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(elements.__dict__, f, ensure_ascii=False, indent=2)
+        prompt_core.save_elements_template(elements, filename)
         print(f"התבנית נשמרה ב: {filename}")
 
     def load_template(self, filename):
         """טעינת תבנית מקובץ"""
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return PromptElements(**data)
+        return prompt_core.load_elements_template(filename)
 
 
 def print_examples():
@@ -154,6 +58,15 @@ def print_examples():
 
 4. שימוש בדוגמא מוכנה:
    python cli_prompt_generator.py --example "cat"
+
+5. אצווה - פרומפט לכל שורה בקובץ JSONL או CSV:
+   python cli_prompt_generator.py --input catalog.csv --output prompts.jsonl --progress
+
+6. אצווה מקבילית לקבצים גדולים (תהליך לכל ליבה):
+   python cli_prompt_generator.py --input catalog.jsonl --output prompts.jsonl --workers 8
+
+7. אצווה מתבנית עם מצייני מקום (למשל "subject": "{product} in {color}"):
+   python cli_prompt_generator.py --load-template product_template.json --input catalog.csv --output prompts.jsonl
 """
     print(examples)
 
@@ -192,6 +105,17 @@ def main():
     # עזרה
     parser.add_argument("--examples", action="store_true", help="הצגת דוגמאות שימוש")
 
+    # מצב אצווה
+    parser.add_argument("--input", help="קובץ JSONL/CSV של אלמנטים, שורה לכל פרומפט ('-' - stdin)")
+    parser.add_argument("--output", default="-", help="קובץ הפלט במצב אצווה ('-' - stdout)")
+    parser.add_argument("--input-format", choices=prompt_batch.FORMATS, help="פורמט הקלט (ברירת מחדל: לפי הסיומת)")
+    parser.add_argument(
+        "--output-format", choices=prompt_batch.OUTPUT_FORMATS, help="פורמט הפלט (ברירת מחדל: לפי הסיומת)"
+    )
+    parser.add_argument("--progress", action="store_true", help="הצגת מונה שורות וקצב ל-stderr")
+    parser.add_argument("--workers", type=int, help="עיבוד מקבילי של קובץ הקלט במספר תהליכים (0 - לפי מספר הליבות)")
+    parser.add_argument("--unordered", action="store_true", help="במצב מקבילי - הפלט לפי סדר סיום הקטעים")
+
     args = parser.parse_args()
 
     # הצגת דוגמאות
@@ -199,6 +123,9 @@ def main():
         print_examples()
         return
 
+    if args.input:
+        sys.exit(run_batch_mode(args))
+
     generator = SimplePromptGenerator()
 
     # טעינת דוגמא מוכנה
@@ -245,43 +172,83 @@ def main():
             print(f"שגיאה בשמירת התבנית: {str(e)}")
 
 
+def run_batch_mode(args):
+    """מצב אצווה: פרומפט לכל שורת קלט, בהזרמה ובזיכרון קבוע"""
+    try:
+        input_format = args.input_format or prompt_batch.detect_format(args.input, formats=prompt_batch.FORMATS)
+    except ValueError as e:
+        print(f"שגיאה בקלט: {e} (--input-format)", file=sys.stderr)
+        return 1
+    output_format = args.output_format or prompt_batch.detect_format(args.output)
+    progress = prompt_batch.Progress() if args.progress else None
+    # תבנית עם מצייני מקום: עמודות השורה ממלאות את {product}, {color} וכו'
+    template = None
+    if args.load_template:
+        try:
+            template = ParametricTemplate.load(args.load_template)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"שגיאה בטעינת התבנית: {e}", file=sys.stderr)
+            return 1
+    if args.workers is not None and args.input != "-":
+        return run_parallel_batch_mode(args, input_format, output_format, progress, template)
+    try:
+        input_stream = prompt_batch.open_input(args.input)
+        output_stream = prompt_batch.open_output(args.output)
+    except OSError as e:
+        print(f"שגיאה בפתיחת הקובץ: {e}", file=sys.stderr)
+        return 1
+    try:
+        prompt_batch.run_batch(input_stream, output_stream, input_format, output_format, progress, template)
+    except ValueError as e:
+        print(f"שגיאה בקלט: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    return 0
+
+
+def run_parallel_batch_mode(args, input_format, output_format, progress, template=None):
+    """מצב אצווה מקבילי: קובץ הקלט מחולק לטווחים בין תהליכים"""
+    # multiprocessing נטען רק במצב זה - לא בכל הפעלה של שורת הפקודה
+    import parallel_batch
+
+    tmpdir = None if args.output == "-" else os.path.dirname(os.path.abspath(args.output))
+    try:
+        output_stream = prompt_batch.open_output(args.output)
+    except OSError as e:
+        print(f"שגיאה בפתיחת הקובץ: {e}", file=sys.stderr)
+        return 1
+    try:
+        parallel_batch.run_parallel_batch(
+            args.input,
+            output_stream,
+            input_format,
+            output_format,
+            workers=args.workers or None,
+            ordered=not args.unordered,
+            progress=progress,
+            tmpdir=tmpdir,
+            template=template,
+        )
+    except OSError as e:
+        print(f"שגיאה בפתיחת הקובץ: {e}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"שגיאה בקלט: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    return 0
+
+
 def load_example(example_type):
     """טעינת דוגמאות מוכנות"""
-    examples = {
-        "cat": PromptElements(
-            subject="חתול פרסי לבן",
-            composition="close-up portrait",
-            style="professional photography",
-            lighting="soft morning light",
-            color="גוונים חמים",
-            mood="calm",
-            details="עיניים כחולות, פרווה רכה",
-            context="צילום מקצועי",
-        ),
-        "logo": PromptElements(
-            subject="לוגו מינימליסטי",
-            composition="symmetrical",
-            style="minimalist",
-            lighting="clean lighting",
-            color="כחול וצבעי אמון",
-            mood="professional",
-            details="פשוט וזכיר",
-            context="מיתוג עסקי",
-        ),
-        "landscape": PromptElements(
-            subject="נוף הרים עם אגם",
-            composition="wide angle",
-            style="realistic",
-            lighting="dramatic sunset",
-            color="צבעי זהב וכתום",
-            mood="calm",
-            details="השתקפויות במים",
-            context="צילום טבע",
-        ),
-    }
-
     print(f"נטענה דוגמא: {example_type}")
-    return examples.get(example_type, PromptElements())
+    return prompt_core.get_example(example_type)
 
 
 if __name__ == "__main__":
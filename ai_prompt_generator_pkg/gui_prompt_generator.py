@@ -5,37 +5,94 @@
 GUI for AI Image Prompt Generator
 """
 
+import time
+
+# תחילת מדידת ההפעלה - לפני כל ייבוא כבד
+_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import webbrowser
+import argparse
+import sys
 import threading
 import os
-from PIL import Image, ImageTk
-import requests
-from io import BytesIO
-import json
 
-# ייבוא המחלקה שיצרנו קודם
-from ai_prompt_generator import AIImagePromptGenerator, PromptElements, StyleCategory, LightingType, MoodType, CompositionType
+# רק הליבה הקלה נטענת מראש; PIL, requests ו-OpenAI נטענים ברקע לאחר הציור
+# הראשון של החלון, או בשימוש הראשון (image_pipeline, ai_prompt_generator)
+import prompt_core
+from prompt_core import PromptElements, StyleCategory, LightingType, MoodType, CompositionType
+
+class StartupTimer:
+    """מדידת שלבי ההפעלה של הממשק - לדו"ח זמני ההפעלה (--timing)"""
+    
+    def __init__(self, started: float):
+        self.started = started
+        self.marks = []
+        self._lock = threading.Lock()
+    
+    def mark(self, name: str):
+        """רישום סיום שלב (נקרא גם מ-threads ברקע)"""
+        with self._lock:
+            self.marks.append((name, time.perf_counter() - self.started))
+    
+    def report(self) -> str:
+        """דו"ח השלבים: זמן מצטבר מתחילת התהליך ומשך כל שלב"""
+        lines = ["startup timing (ms):"]
+        previous = 0.0
+        with self._lock:
+            for name, elapsed in self.marks:
+                lines.append(f"  {name:<20} {elapsed * 1000:8.1f}  (+{(elapsed - previous) * 1000:.1f})")
+                previous = elapsed
+        return "\n".join(lines)
 
 class PromptGeneratorGUI:
     """ממשק גרפי למחולל פרומפטים"""
     
-    def __init__(self, root):
+    def __init__(self, root, timer: StartupTimer = None):
         self.root = root
+        self.timer = timer
         self.root.title("מחולל פרומפטים מקצועי - AI Image Prompt Generator")
         self.root.geometry("1200x800")
         self.root.configure(bg='#f0f0f0')
         
         # משתנים
         self.generator = None
-        self.current_image_url = None
+        self.current_image = None  # GeneratedImage - התוכן משותף לתצוגה ולשמירה
+        self._image_pipeline = None  # נוצר עם התמונה הראשונה (טוען PIL ו-requests)
         
         # יצירת הממשק
         self.create_widgets()
         
         # סגנון
         self.setup_styles()
+        
+        # טעינת התלויות הכבדות מתחילה רק אחרי שהחלון צויר
+        self.root.after_idle(lambda: self.root.after(0, self._on_first_paint))
+    
+    def _on_first_paint(self):
+        """החלון מוצג ואינטראקטיבי - טעינת התלויות הכבדות ברקע"""
+        if self.timer:
+            self.timer.mark("first_paint")
+        threading.Thread(target=self._preload_dependencies, daemon=True).start()
+    
+    def _preload_dependencies(self):
+        """ייבוא מוקדם ברקע, כדי שהשימוש הראשון לא ימתין; כישלון יתגלה בשימוש עצמו"""
+        try:
+            import image_pipeline  # noqa: F401 - PIL, requests
+            from PIL import ImageTk  # noqa: F401
+            import ai_prompt_generator  # noqa: F401
+        except Exception:
+            pass
+        if self.timer:
+            self.timer.mark("background_preload")
+            print(self.timer.report(), file=sys.stderr)
+    
+    def _get_image_pipeline(self):
+        """צינור טעינת התמונות - נוצר בשימוש הראשון"""
+        if self._image_pipeline is None:
+            from image_pipeline import ImagePipeline
+            self._image_pipeline = ImagePipeline(max_size=(380, 380))
+        return self._image_pipeline
     
     def setup_styles(self):
         """הגדרת סגנונות הממשק"""
@@ -228,14 +285,31 @@ class PromptGeneratorGUI:
             messagebox.showerror("שגיאה", "נא להזין מפתח API")
             return
         
-        try:
-            self.generator = AIImagePromptGenerator(api_key)
-            self.connection_status.config(text="✅ מחובר", fg='green')
-            self.status_var.set("התחבר בהצלחה ל-OpenAI API")
-            messagebox.showinfo("הצלחה", "התחברות ל-API הצליחה!")
-        except Exception as e:
-            self.connection_status.config(text="❌ שגיאה", fg='red')
-            messagebox.showerror("שגיאה", f"שגיאה בהתחברות: {str(e)}")
+        self.connection_status.config(text="⏳ מתחבר...", fg='orange')
+        self.status_var.set("מתחבר ל-OpenAI API...")
+        
+        def connect_thread():
+            # ייבוא ה-SDK ויצירת הלקוח אורכים זמן - מחוץ ל-thread של הממשק
+            try:
+                from ai_prompt_generator import AIImagePromptGenerator
+                generator = AIImagePromptGenerator(api_key)
+                generator.client
+            except Exception as e:
+                self.root.after(0, self._connect_failed, str(e))
+                return
+            self.root.after(0, self._connect_done, generator)
+        
+        threading.Thread(target=connect_thread, daemon=True).start()
+    
+    def _connect_done(self, generator):
+        self.generator = generator
+        self.connection_status.config(text="✅ מחובר", fg='green')
+        self.status_var.set("התחבר בהצלחה ל-OpenAI API")
+        messagebox.showinfo("הצלחה", "התחברות ל-API הצליחה!")
+    
+    def _connect_failed(self, msg):
+        self.connection_status.config(text="❌ שגיאה", fg='red')
+        messagebox.showerror("שגיאה", f"שגיאה בהתחברות: {msg}")
     
     def get_elements(self):
         """קבלת הערכים מהממשק"""
@@ -262,18 +336,14 @@ class PromptGeneratorGUI:
         self.context_var.set(elements.context)
     
     def generate_basic_prompt(self):
-        """יצירת פרומפט בסיסי"""
-        if not self.generator:
-            messagebox.showerror("שגיאה", "נא להתחבר תחילה ל-API")
-            return
-        
+        """יצירת פרומפט בסיסי (אינו דורש חיבור ל-API)"""
         elements = self.get_elements()
         if not elements.subject:
             messagebox.showerror("שגיאה", "נא להזין לפחות נושא לתמונה")
             return
         
         try:
-            prompt = self.generator.create_basic_prompt(elements)
+            prompt = prompt_core.create_basic_prompt(elements)
             self.basic_prompt_text.delete(1.0, tk.END)
             self.basic_prompt_text.insert(1.0, prompt)
             self.status_var.set("פרומפט בסיסי נוצר בהצלחה")
@@ -292,18 +362,28 @@ class PromptGeneratorGUI:
             return
         
         self.status_var.set("משפר פרומפט עם AI...")
+        self.enhanced_prompt_text.delete(1.0, tk.END)
         
         def enhance_thread():
             try:
-                enhanced = self.generator.enhance_prompt_with_ai(basic_prompt)
-                self.root.after(0, lambda: self._update_enhanced_prompt(enhanced))
+                # הטקסט מתמלא בהדרגה - כל קטע שמגיע מועבר ל-thread של הממשק
+                for delta in self.generator.enhance_prompt_with_ai_stream(basic_prompt):
+                    self.root.after(0, self._append_enhanced_delta, delta)
+                self.root.after(0, self._finish_enhanced_prompt)
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("שגיאה", f"שגיאה בשיפור: {str(e)}"))
+                # הודעת השגיאה נלכדת עכשיו - המשתנה e לא קיים כשה-lambda רצה
+                self.root.after(0, lambda msg=str(e): messagebox.showerror("שגיאה", f"שגיאה בשיפור: {msg}"))
         
         threading.Thread(target=enhance_thread, daemon=True).start()
     
-    def _update_enhanced_prompt(self, enhanced_prompt):
-        """עדכון הפרומפט המשופר"""
+    def _append_enhanced_delta(self, delta):
+        """הוספת קטע טקסט שהגיע לפרומפט המשופר"""
+        self.enhanced_prompt_text.insert(tk.END, delta)
+        self.enhanced_prompt_text.see(tk.END)
+    
+    def _finish_enhanced_prompt(self):
+        """סיום הזרמת הפרומפט המשופר"""
+        enhanced_prompt = self.enhanced_prompt_text.get(1.0, tk.END).strip()
         self.enhanced_prompt_text.delete(1.0, tk.END)
         self.enhanced_prompt_text.insert(1.0, enhanced_prompt)
         self.status_var.set("פרומפט שופר בהצלחה עם AI")
@@ -327,30 +407,35 @@ class PromptGeneratorGUI:
         
         def generate_thread():
             try:
-                image_url = self.generator.generate_image(prompt)
-                if image_url:
-                    self.root.after(0, lambda: self._load_image(image_url))
+                # b64_json - התמונה מגיעה בתשובת היצירה, ללא הורדה נוספת
+                image = self.generator.generate_image_data(prompt)
+                if image.data or image.url:
+                    self.root.after(0, lambda: self._load_image(image))
                 else:
                     self.root.after(0, lambda: messagebox.showerror("שגיאה", "שגיאה ביצירת התמונה"))
             except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("שגיאה", f"שגיאה ביצירת התמונה: {str(e)}"))
+                self.root.after(0, lambda msg=str(e): messagebox.showerror("שגיאה", f"שגיאה ביצירת התמונה: {msg}"))
         
         threading.Thread(target=generate_thread, daemon=True).start()
     
-    def _load_image(self, image_url):
-        """טעינת התמונה לממשק"""
+    def _load_image(self, generated):
+        """טעינת התמונה לממשק - ההורדה, הפענוח וההקטנה רצים ברקע"""
+        self.status_var.set("טוען תמונה...")
+        self._get_image_pipeline().submit(
+            generated,
+            on_ready=lambda generated, preview: self.root.after(0, self._show_image, generated, preview),
+            on_error=lambda e: self.root.after(
+                0, lambda msg=str(e): messagebox.showerror("שגיאה", f"שגיאה בטעינת התמונה: {msg}")),
+        )
+    
+    def _show_image(self, generated, preview):
+        """הצגת תמונה מוכנה (מוקטנת ומפוענחת) - רץ ב-thread של הממשק"""
         try:
-            self.current_image_url = image_url
+            self.current_image = generated
             
-            # הורדת התמונה
-            response = requests.get(image_url)
-            image = Image.open(BytesIO(response.content))
-            
-            # שינוי גודל לממשק
-            image.thumbnail((380, 380), Image.Resampling.LANCZOS)
-            
-            # המרה לפורמט tkinter
-            photo = ImageTk.PhotoImage(image)
+            # המרה לפורמט tkinter - חייבת לרוץ ב-thread של Tk
+            from PIL import ImageTk
+            photo = ImageTk.PhotoImage(preview)
             
             # עדכון התווית
             self.image_label.config(image=photo, text="")
@@ -363,14 +448,23 @@ class PromptGeneratorGUI:
     
     def open_image_in_browser(self):
         """פתיחת התמונה בדפדפן"""
-        if self.current_image_url:
-            webbrowser.open(self.current_image_url)
-        else:
+        import webbrowser
+        
+        if not self.current_image:
             messagebox.showwarning("אזהרה", "אין תמונה זמינה")
+        elif self.current_image.url:
+            webbrowser.open(self.current_image.url)
+        else:
+            # תמונה שהתקבלה כתוכן נפתחת מקובץ זמני
+            import tempfile
+            from pathlib import Path
+            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+                f.write(self.current_image.data)
+            webbrowser.open(Path(f.name).as_uri())
     
     def save_image(self):
         """שמירת התמונה"""
-        if not self.current_image_url:
+        if not self.current_image:
             messagebox.showwarning("אזהרה", "אין תמונה זמינה")
             return
         
@@ -381,9 +475,9 @@ class PromptGeneratorGUI:
         
         if filename:
             try:
-                response = requests.get(self.current_image_url)
+                from image_pipeline import fetch_image_bytes
                 with open(filename, 'wb') as f:
-                    f.write(response.content)
+                    f.write(fetch_image_bytes(self.current_image))
                 messagebox.showinfo("הצלחה", f"התמונה נשמרה ב: {filename}")
             except Exception as e:
                 messagebox.showerror("שגיאה", f"שגיאה בשמירת התמונה: {str(e)}")
@@ -398,12 +492,7 @@ class PromptGeneratorGUI:
         if filename:
             try:
                 elements = self.get_elements()
-                self.generator.save_elements_template(elements, filename) if self.generator else None
-                
-                # שמירה ישירה אם אין generator
-                if not self.generator:
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(elements.__dict__, f, ensure_ascii=False, indent=2)
+                prompt_core.save_elements_template(elements, filename)
                 
                 messagebox.showinfo("הצלחה", f"התבנית נשמרה ב: {filename}")
             except Exception as e:
@@ -417,13 +506,7 @@ class PromptGeneratorGUI:
         
         if filename:
             try:
-                if self.generator:
-                    elements = self.generator.load_elements_template(filename)
-                else:
-                    # טעינה ישירה
-                    with open(filename, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        elements = PromptElements(**data)
+                elements = prompt_core.load_elements_template(filename)
                 
                 self.set_elements(elements)
                 messagebox.showinfo("הצלחה", "התבנית נטענה בהצלחה")
@@ -437,50 +520,25 @@ class PromptGeneratorGUI:
         self.basic_prompt_text.delete(1.0, tk.END)
         self.enhanced_prompt_text.delete(1.0, tk.END)
         self.image_label.config(image='', text="התמונה תופיע כאן")
-        self.current_image_url = None
+        self.current_image = None
         self.status_var.set("השדות נוקו")
     
     def load_example(self, example_type):
         """טעינת דוגמאות מהירות"""
-        examples = {
-            "cat": PromptElements(
-                subject="חתול פרסי לבן",
-                composition="close-up portrait",
-                style="professional photography",
-                lighting="soft morning light",
-                color="גוונים חמים",
-                mood="calm",
-                details="עיניים כחולות, פרווה רכה",
-                context="צילום מקצועי"
-            ),
-            "logo": PromptElements(
-                subject="לוגו מינימליסטי",
-                composition="symmetrical",
-                style="minimalist",
-                lighting="clean lighting",
-                color="כחול וצבעי אמון",
-                mood="professional",
-                details="פשוט וזכיר",
-                context="מיתוג עסקי"
-            ),
-            "landscape": PromptElements(
-                subject="נוף הרים עם אגם",
-                composition="wide angle",
-                style="realistic",
-                lighting="dramatic sunset",
-                color="צבעי זהב וכתום",
-                mood="calm",
-                details="השתקפויות במים",
-                context="צילום טבע"
-            )
-        }
-        
-        if example_type in examples:
-            self.set_elements(examples[example_type])
+        if example_type in prompt_core.EXAMPLES:
+            self.set_elements(prompt_core.get_example(example_type))
             self.status_var.set(f"נטענה דוגמא: {example_type}")
 
 def main():
     """הפעלת הממשק הגרפי"""
+    parser = argparse.ArgumentParser(description='ממשק גרפי למחולל פרומפטים')
+    parser.add_argument('--timing', action='store_true', help='הדפסת דו"ח זמני הפעלה ל-stderr')
+    args = parser.parse_args()
+    
+    timer = StartupTimer(_STARTED) if args.timing else None
+    if timer:
+        timer.mark("imports")
+    
     root = tk.Tk()
     
     # הגדרת RTL לעברית
@@ -489,7 +547,9 @@ def main():
     except:
         pass
     
-    app = PromptGeneratorGUI(root)
+    app = PromptGeneratorGUI(root, timer)
+    if timer:
+        timer.mark("widgets")
     
     # מרכוז החלון
     root.update_idletasks()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+צינור טעינת תמונות ברקע - הורדה, פענוח והקטנה מחוץ ל-thread של הממשק
+Background image pipeline: download, decode and downscale off the UI thread
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, Tuple
+
+import requests
+from PIL import Image
+
+
+def fetch_image_bytes(generated) -> bytes:
+    """
+    תוכן התמונה של GeneratedImage
+
+    אם התמונה הגיעה כתוכן (b64_json) אין הורדה; אחרת היא מורדת פעם אחת
+    והתוכן נשמר על האובייקט לשימוש חוזר (תצוגה ושמירה)
+    """
+    if generated.data is None:
+        response = requests.get(generated.url, timeout=60)
+        response.raise_for_status()
+        generated.data = response.content
+    return generated.data
+
+
+def decode_preview(data: bytes, max_size: Tuple[int, int] = (380, 380)) -> Image.Image:
+    """
+    פענוח והקטנה של תמונה לתצוגה מקדימה
+
+    draft() מאפשר לפענח JPEG ישירות ברזולוציה מוקטנת, ו-reduce() מקטין
+    בכפולות שלמות לפני ה-LANCZOS הסופי, כך שהסינון היקר רץ על תמונה קטנה.
+    """
+    image = Image.open(BytesIO(data))
+    # draft פועל רק בפורמטים שתומכים בו (JPEG) ואינו עושה דבר באחרים
+    image.draft("RGB", max_size)
+
+    factor = min(image.width // max_size[0], image.height // max_size[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    return image
+
+
+class ImagePipeline:
+    """
+    עיבוד תמונות לתצוגה ב-thread רקע יחיד
+
+    רק התוצאה האחרונה שהתבקשה מועברת הלאה - תמונה שהוחלפה בבקשה חדשה
+    לפני שסיימה להיטען נזרקת.
+    """
+
+    def __init__(self, max_size: Tuple[int, int] = (380, 380)):
+        self.max_size = max_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-pipeline")
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def submit(self, generated, on_ready: Callable[[object, Image.Image], None],
+               on_error: Callable[[Exception], None]):
+        """
+        טעינת תמונה ברקע
+
+        Args:
+            generated: GeneratedImage לטעינה
+            on_ready: נקרא מה-thread של הרקע עם (generated, תמונה מוקטנת)
+            on_error: נקרא מה-thread של הרקע עם החריגה
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        self._executor.submit(self._process, generation, generated, on_ready, on_error)
+
+    def _is_current(self, generation: int) -> bool:
+        with self._lock:
+            return generation == self._generation
+
+    def _process(self, generation, generated, on_ready, on_error):
+        try:
+            data = fetch_image_bytes(generated)
+            if not self._is_current(generation):
+                return
+            preview = decode_preview(data, self.max_size)
+        except Exception as e:
+            if self._is_current(generation):
+                on_error(e)
+            return
+        if self._is_current(generation):
+            on_ready(generated, preview)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
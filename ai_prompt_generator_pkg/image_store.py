@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מאגר תמונות מקומי לפי תוכן - מפתח מפרמטרי היצירה לקובץ בדיסק
+Content-addressed local image store keyed by generation parameters
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+class ImageStore:
+    """
+    מאגר תמונות בדיסק עם קובץ אינדקס ופינוי LRU לפי גודל
+
+    המפתח הוא hash של המודל, הפרומפט, הגודל והאיכות, כך שבקשה חוזרת
+    מוגשת מהדיסק בלי קריאת API ובלי הורדה.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str = "image_store", max_bytes: int = 500 * 1024 * 1024,
+                 flush_every: int = 32):
+        """
+        Args:
+            directory: תיקיית המאגר
+            max_bytes: גודל מרבי כולל של התמונות לפני פינוי
+            flush_every: כל כמה גישות לשמור את זמני הגישה לאינדקס
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending_access = 0
+        os.makedirs(directory, exist_ok=True)
+        self._index: Dict[str, Dict[str, float]] = self._read_index()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, size: str, quality: str) -> str:
+        """מפתח התמונה לפי פרמטרי היצירה"""
+        payload = json.dumps([model, prompt, size, quality], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    def _read_index(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # רשומות שהקובץ שלהן נמחק מבחוץ אינן תקפות
+        return {key: entry for key, entry in index.items() if os.path.exists(self._file_path(key))}
+
+    def _write_index(self):
+        # כתיבה לקובץ זמני והחלפה - אינדקס חלקי לא נשאר בדיסק
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path())
+        self._pending_access = 0
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def path(self, key: str) -> Optional[str]:
+        """נתיב הקובץ של תמונה שבמאגר, או None"""
+        with self._lock:
+            return self._file_path(key) if key in self._index else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        """תוכן התמונה מהמאגר, או None אם אינה קיימת"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._file_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                del self._index[key]
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry["accessed"] = time.time()
+            self._pending_access += 1
+            if self._pending_access >= self.flush_every:
+                self._write_index()
+            return data
+
+    def put(self, key: str, data: bytes) -> str:
+        """
+        שמירת תמונה במאגר; מחזיר את נתיב הקובץ
+
+        התמונה שנשמרה אינה מפונה באותה קריאה, גם אם היא לבדה גדולה
+        מ-max_bytes - היא תפונה בשמירה הבאה.
+        """
+        with self._lock:
+            path = self._file_path(key)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            self._index[key] = {"size": len(data), "accessed": time.time()}
+            self._evict(keep=key)
+            self._write_index()
+            return path
+
+    def _evict(self, keep: Optional[str] = None):
+        """פינוי התמונות שבשימוש הכי פחות לאחרונה עד לגודל המרבי (פרט ל-keep)"""
+        total = sum(entry["size"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._index.pop(key)["size"]
+            try:
+                os.remove(self._file_path(key))
+            except OSError:
+                pass
+
+    def flush(self):
+        """שמירת זמני הגישה שטרם נשמרו לאינדקס"""
+        with self._lock:
+            if self._pending_access:
+                self._write_index()
+
+    def stats(self) -> Dict[str, int]:
+        """מוני פגיעות/החטאות, מספר תמונות וגודל כולל"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._index),
+                "bytes": sum(entry["size"] for entry in self._index.values()),
+            }
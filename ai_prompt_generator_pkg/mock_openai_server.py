@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שרת OpenAI מדומה מקומי - chat.completions ו-images.generate בלי מפתח ובלי רשת
+Local stand-in OpenAI server with latency and error injection
+
+משמש לבדיקות ולמדידות ביצועים (קצב, ניסיונות חוזרים, מטמון, מקביליות)
+ללא עלות. המחולל מופנה אליו דרך base_url:
+
+    with MockOpenAIServer(MockConfig(latency=0.2, error_rate_429=0.05)) as server:
+        generator = AIImagePromptGenerator(api_key="mock", base_url=server.base_url)
+
+או כתהליך נפרד:
+    python mock_openai_server.py --port 8765 --latency 0.2 --error-429 0.05
+"""
+
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+@dataclass
+class MockConfig:
+    """התנהגות השרת המדומה"""
+    latency: float = 0.0            # חציון זמן התגובה בשניות
+    latency_sigma: float = 0.0      # פיזור לוג-נורמלי (0 - זמן קבוע); 0.5 נותן זנב ארוך מציאותי
+    image_latency: Optional[float] = None  # חציון לתמונות (ברירת מחדל: latency)
+    error_rate_429: float = 0.0     # שיעור תשובות 429 (מגבלת קצב)
+    error_rate_500: float = 0.0     # שיעור תשובות 500
+    retry_after: Optional[float] = None  # כותרת Retry-After בתשובות 429
+    stream_chunks: int = 8          # מספר קטעי ההזרמה; זמן התגובה מתחלק ביניהם
+    image_size: int = 8             # צלע תמונת ה-PNG המוחזרת בפיקסלים
+    max_images: int = 1024          # מספר התמונות שנשמרות להורדה (url) לפני פינוי LRU
+    backlog: int = 1024             # תור החיבורים הממתינים (listen); קטן מדי נותן שגיאות חיבור בעומס
+    seed: Optional[int] = None      # זרע לשחזור הזמנים והשגיאות
+
+
+def _png(size: int) -> bytes:
+    """תמונת PNG קטנה בצבע אחיד (ספריה סטנדרטית בלבד)"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + b"\x4a\x90\xd9" * size for _ in range(size))
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def mock_completion_text(messages: List[Dict[str, str]]) -> str:
+    """
+    תשובה דטרמיניסטית שמתאימה לסוג הבקשה של המחולל
+
+    מערך JSON (שיפור באצווה) -> מערך משופר באותו אורך; בקשת 8 אלמנטים
+    (הנדסה לאחור) -> אובייקט JSON; אחרת -> פרומפט משופר
+    """
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    try:
+        prompts = json.loads(user)
+    except ValueError:
+        prompts = None
+    if isinstance(prompts, list):
+        return json.dumps([f"{p}, enhanced, high quality, detailed" for p in prompts], ensure_ascii=False)
+
+    text = user.split(":", 1)[-1].strip()
+    if "JSON" in system and "subject" in system:
+        return json.dumps({
+            "subject": text, "composition": "rule of thirds", "style": "realistic",
+            "lighting": "natural daylight", "color": "warm tones", "mood": "calm",
+            "details": "sharp focus", "context": "mock analysis",
+        }, ensure_ascii=False)
+    return f"{text}, enhanced, 8k resolution, sharp focus, well composed"
+
+
+class MockOpenAIServer:
+    """
+    שרת HTTP מקומי שמחקה את נקודות הקצה של OpenAI שהמחולל משתמש בהן
+
+    כל בקשה עוברת השהיה אקראית לפי MockConfig ועשויה להיכשל ב-429/500;
+    מוני הבקשות והשגיאות זמינים ב-stats().
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            config: התנהגות השרת (השהיות ושגיאות)
+            host: כתובת האזנה
+            port: פורט (0 - פורט פנוי כלשהו)
+        """
+        self.config = config or MockConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+        self._stats = {"requests": 0, "chat": 0, "stream": 0, "images": 0, "errors_429": 0, "errors_500": 0}
+        self._png = _png(self.config.image_size)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class(), bind_and_activate=False)
+        self._httpd.daemon_threads = True
+        # ברירת המחדל של socketserver היא 5 - חיבורים עודפים נדחים תחת עומס
+        self._httpd.request_queue_size = self.config.backlog
+        try:
+            self._httpd.server_bind()
+            self._httpd.server_activate()
+        except OSError:
+            self._httpd.server_close()
+            raise
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """כתובת הבסיס להעברה ל-base_url של המחולל / OpenAI"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """מוני בקשות ושגיאות שהוזרקו"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _latency(self, median: float) -> float:
+        if median <= 0:
+            return 0.0
+        with self._lock:
+            if not self.config.latency_sigma:
+                return median
+            return median * math.exp(self._random.gauss(0, self.config.latency_sigma))
+
+    def _store_image(self, data: bytes) -> str:
+        """שמירת תמונה להורדה; מחזיר את המזהה שלה"""
+        image_id = uuid.uuid4().hex
+        with self._lock:
+            self._images[image_id] = data
+            while len(self._images) > self.config.max_images:
+                self._images.popitem(last=False)
+        return image_id
+
+    def _stored_image(self, image_id: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._images.get(image_id)
+            if data is not None:
+                self._images.move_to_end(image_id)
+            return data
+
+    def _injected_error(self) -> Optional[int]:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.config.error_rate_429:
+            return 429
+        if roll < self.config.error_rate_429 + self.config.error_rate_500:
+            return 500
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_error(self, status: int):
+                server._count(f"errors_{status}")
+                headers = {}
+                if status == 429 and server.config.retry_after is not None:
+                    headers["retry-after"] = str(server.config.retry_after)
+                message = "Rate limit reached (mock)" if status == 429 else "Internal server error (mock)"
+                self._send_json(status, {"error": {"message": message, "type": "mock_error",
+                                                   "code": str(status)}}, headers)
+
+            def do_GET(self):
+                match = re.fullmatch(r"/images/([0-9a-f]+)\.png", self.path)
+                data = server._stored_image(match.group(1)) if match else None
+                if data is None:
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server._count("requests")
+                path = self.path.split("?", 1)[0]
+                if path.endswith("/chat/completions"):
+                    self._chat(request)
+                elif path.endswith("/images/generations"):
+                    self._image(request)
+                else:
+                    self._send_json(404, {"error": {"message": f"unknown endpoint {path}"}})
+
+            def _chat(self, request: dict):
+                latency = server._latency(server.config.latency)
+                error = server._injected_error()
+                if error:
+                    time.sleep(latency)
+                    self._send_error(error)
+                    return
+
+                text = mock_completion_text(request.get("messages", []))
+                prompt_tokens = sum(_tokens(m.get("content", "")) for m in request.get("messages", []))
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": _tokens(text),
+                         "total_tokens": prompt_tokens + _tokens(text)}
+                base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()),
+                        "model": request.get("model", "gpt-4")}
+
+                if request.get("stream"):
+                    server._count("stream")
+                    self._stream(text, base, latency)
+                    return
+                server._count("chat")
+                time.sleep(latency)
+                self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }]))
+
+            def _stream(self, text: str, base: dict, latency: float):
+                """הזרמה בפורמט SSE; זמן התגובה מתחלק בין הקטעים"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                count = max(1, server.config.stream_chunks)
+                step = math.ceil(len(text) / count)
+                pieces = [text[i:i + step] for i in range(0, len(text), step)]
+                for index, piece in enumerate(pieces):
+                    time.sleep(latency / count)
+                    delta = {"content": piece} if index else {"role": "assistant", "content": piece}
+                    self._event(dict(base, object="chat.completion.chunk", choices=[
+                        {"index": 0, "delta": delta, "finish_reason": None}]))
+                self._event(dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, payload: dict):
+                self.wfile.write(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+
+            def _image(self, request: dict):
+                median = server.config.image_latency
+                latency = server._latency(server.config.latency if median is None else median)
+                error = server._injected_error()
+                time.sleep(latency)
+                if error:
+                    self._send_error(error)
+                    return
+                server._count("images")
+
+                item = {"revised_prompt": request.get("prompt", "")}
+                if request.get("response_format") == "b64_json":
+                    item["b64_json"] = base64.b64encode(server._png).decode("ascii")
+                else:
+                    image_id = server._store_image(server._png)
+                    host, port = server._httpd.server_address[:2]
+                    item["url"] = f"http://{host}:{port}/images/{image_id}.png"
+                self._send_json(200, {"created": int(time.time()), "data": [item]})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="שרת OpenAI מדומה לבדיקות ומדידות ביצועים")
+    parser.add_argument("--host", default="127.0.0.1", help="כתובת האזנה")
+    parser.add_argument("--port", type=int, default=8765, help="פורט")
+    parser.add_argument("--latency", type=float, default=0.0, help="חציון זמן תגובה בשניות")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="פיזור לוג-נורמלי של זמן התגובה")
+    parser.add_argument("--image-latency", type=float, help="חציון זמן תגובה לתמונות")
+    parser.add_argument("--error-429", type=float, default=0.0, help="שיעור תשובות 429")
+    parser.add_argument("--error-500", type=float, default=0.0, help="שיעור תשובות 500")
+    parser.add_argument("--retry-after", type=float, help="כותרת Retry-After בתשובות 429")
+    parser.add_argument("--seed", type=int, help="זרע לשחזור")
+    parser.add_argument("--backlog", type=int, default=1024, help="תור החיבורים הממתינים")
+    parser.add_argument("--max-images", type=int, default=1024, help="מספר התמונות שנשמרות להורדה")
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, latency_sigma=args.latency_sigma,
+                        image_latency=args.image_latency, error_rate_429=args.error_429,
+                        error_rate_500=args.error_500, retry_after=args.retry_after, seed=args.seed,
+                        max_images=args.max_images, backlog=args.backlog)
+    server = MockOpenAIServer(config, args.host, args.port)
+    print(f"mock OpenAI server on {server.base_url} (Ctrl+C לעצירה)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+עיבוד אצווה מקבילי - חלוקת קובץ הקלט לטווחי בתים בין תהליכים
+Multi-process sharded batch prompt building
+
+קובץ הקלט מחולק לטווחי בתים שמיושרים לגבולות שורה. כל תהליך קורא את
+הטווח שלו ישירות מהקובץ, בונה את הפרומפטים בעזרת prompt_batch וכותב קטע
+פלט לקובץ זמני; הקטעים מאוחדים לפלט בסדר הקלט או בסדר סיומם.
+
+מספור השורות (למזהים ולהודעות שגיאה) אינו דורש מעבר נפרד על הקובץ: כל
+תהליך סופר את ירידות השורה בטווח שלו, מפרסם את המספר במערך משותף וממתין
+רק לטווחים שלפניו; הבנייה קוראת את הטווח מיד אחר כך, ממטמון הדפים.
+
+ב-CSV כל רשומה חייבת להיות בשורה אחת (שדות עם ירידת שורה בתוך מרכאות
+אינם נתמכים בחלוקה לטווחים - יש להשתמש ב-run_batch הרגיל).
+"""
+
+import codecs
+import csv
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import IO, Iterator, List, Optional, Sequence, Tuple
+
+from prompt_batch import PromptWriter, Progress, build_prompts, read_rows
+
+# גודל בלוק הקריאה והמיזוג
+BLOCK_SIZE = 1024 * 1024
+
+# מספר הקטעים לכל תהליך - קטעים קטנים יותר מאזנים עומס ומקדימים את המיזוג
+SHARDS_PER_WORKER = 4
+
+# ערכים במערך מספרי השורות לטווח שטרם נספר / שספירתו נכשלה
+_PENDING = -1
+_FAILED = -2
+
+# מספרי ירידות השורה לכל טווח, משותף לתהליכים (נקבע ב-_init_worker)
+_line_counts = None
+
+
+def plan_ranges(path: str, shards: int, start: int = 0) -> List[Tuple[int, int]]:
+    """
+    חלוקת הקובץ (מהבית start) לטווחים שווים בקירוב שכל אחד מתחיל בתחילת שורה
+
+    Returns:
+        רשימת טווחים (התחלה, סוף) לא ריקים; ייתכנו פחות טווחים מ-shards
+    """
+    size = os.path.getsize(path)
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, shards):
+            target = start + (size - start) * i // shards
+            if target <= bounds[-1]:
+                continue
+            # התקדמות לתחילת השורה הבאה (אם target כבר בתחילת שורה - נשאר)
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+    return [(begin, end) for begin, end in zip(bounds, bounds[1:]) if end > begin]
+
+
+def _read_blocks(path: str, begin: int, end: int) -> Iterator[bytes]:
+    """קריאת הטווח בבלוקים שכל אחד מסתיים בסוף שורה (פרט אולי לאחרון)"""
+    with open(path, "rb") as f:
+        f.seek(begin)
+        remaining = end - begin
+        tail = b""
+        while remaining > 0:
+            data = f.read(min(BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            data = tail + data
+            cut = data.rfind(b"\n") + 1 if remaining > 0 else len(data)
+            tail = data[cut:]
+            yield data[:cut]
+        if tail:
+            yield tail
+
+
+def _range_lines(path: str, begin: int, end: int) -> Iterator[str]:
+    """שורות הטווח כטקסט"""
+    for block in _read_blocks(path, begin, end):
+        lines = block.decode("utf-8").split("\n")
+        last = lines.pop()
+        for line in lines:
+            yield line + "\n"
+        if last:
+            yield last
+
+
+def _count_lines(path: str, begin: int, end: int) -> int:
+    """מספר ירידות השורה בטווח"""
+    return sum(block.count(b"\n") for block in _read_blocks(path, begin, end))
+
+
+def _init_worker(line_counts):
+    """אתחול תהליך במאגר - המערך המשותף של מספרי השורות"""
+    global _line_counts
+    _line_counts = line_counts
+
+
+def _start_line(path: str, index: int, begin: int, end: int, first_line: int) -> int:
+    """
+    ספירת השורות בטווח index, פרסומן והמתנה לספירת הטווחים שלפניו
+
+    הטווחים נשלחים למאגר לפי הסדר, כך שכל טווח קודם כבר נלקח על ידי תהליך
+    שסופר אותו לפני כל דבר אחר - ההמתנה קצרה ואינה יכולה להיתקע.
+
+    Args:
+        first_line: מספר השורה בקובץ של תחילת הטווח הראשון
+
+    Returns:
+        מספר השורה בקובץ של תחילת הטווח index
+
+    Raises:
+        RuntimeError: ספירת טווח קודם נכשלה (השגיאה עצמה מדווחת בקטע שלו)
+    """
+    try:
+        _line_counts[index] = _count_lines(path, begin, end)
+    except BaseException:
+        _line_counts[index] = _FAILED
+        raise
+    while True:
+        previous = _line_counts[:index]
+        if _FAILED in previous:
+            raise RuntimeError(f"ספירת השורות בקטע שלפני קטע {index} נכשלה")
+        if _PENDING not in previous:
+            return first_line + sum(previous)
+        time.sleep(0.001)
+
+
+def _build_shard(task: tuple) -> int:
+    """
+    עבודת תהליך: בניית הפרומפטים לטווח אחד וכתיבתם לקובץ הקטע
+
+    Returns:
+        מספר השורות שעובדו
+    """
+    path, index, begin, end, first_line, input_format, fieldnames, output_format, shard_path, template = task
+    first_line = _start_line(path, index, begin, end, first_line)
+    rows = read_rows(_range_lines(path, begin, end), input_format, first_line, fieldnames)
+    count = 0
+    with open(shard_path, "w", encoding="utf-8", newline="", buffering=BLOCK_SIZE) as shard:
+        writer = PromptWriter(shard, output_format, header=False)
+        for row_id, prompt in build_prompts(rows, template=template):
+            writer.write(row_id, prompt)
+            count += 1
+        writer.flush()
+    return count
+
+
+def _read_header(path: str, input_format: str) -> Tuple[int, Optional[Sequence[str]]]:
+    """
+    (תחילת הנתונים בבתים, שמות העמודות) - ב-CSV שורת הכותרת נקראת פעם אחת
+
+    BOM של UTF-8 בתחילת הקובץ (נפוץ בקבצים מ-Excel) מדולג - אחרת הוא נדבק
+    לשם העמודה הראשונה או לשורת ה-JSONL הראשונה.
+    """
+    with open(path, "rb") as f:
+        header = f.readline() if input_format == "csv" else f.read(len(codecs.BOM_UTF8))
+    if input_format != "csv":
+        return (len(codecs.BOM_UTF8) if header == codecs.BOM_UTF8 else 0), None
+    fieldnames = next(csv.reader([header.decode("utf-8-sig")]), [])
+    return len(header), fieldnames
+
+
+def run_parallel_batch(input_path: str, output_stream: IO[str], input_format: str = "jsonl",
+                       output_format: str = "jsonl", workers: Optional[int] = None,
+                       shards: Optional[int] = None, ordered: bool = True,
+                       progress: Optional[Progress] = None, tmpdir: Optional[str] = None,
+                       template=None) -> int:
+    """
+    בניית פרומפטים לכל שורות קובץ הקלט במאגר תהליכים
+
+    Args:
+        input_path: קובץ הקלט (קובץ אמיתי - לא stdin)
+        output_stream: פלט טקסט (קובץ או stdout)
+        input_format: "jsonl" או "csv"
+        output_format: "jsonl", "csv" או "text"
+        workers: מספר התהליכים (ברירת מחדל: מספר הליבות)
+        shards: מספר הקטעים (ברירת מחדל: SHARDS_PER_WORKER לכל תהליך)
+        ordered: True - הפלט בסדר הקלט (זהה ל-run_batch); False - הקטעים
+            מאוחדים לפי סדר סיומם
+        progress: מונה התקדמות (אופציונלי, מתעדכן בכל קטע שמאוחד)
+        tmpdir: תיקייה לקבצי הקטעים הזמניים (מומלץ: תיקיית הפלט)
+        template: ParametricTemplate למילוי מהשורות (אופציונלי)
+
+    Returns:
+        מספר השורות שעובדו
+
+    Raises:
+        ValueError: שורת קלט לא תקינה (כמו ב-run_batch)
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * SHARDS_PER_WORKER
+    data_start, fieldnames = _read_header(input_path, input_format)
+    ranges = plan_ranges(input_path, shards, data_start)
+
+    # כותרת ה-CSV נכתבת פעם אחת, לפני הקטעים
+    PromptWriter(output_stream, output_format).flush()
+
+    shard_dir = tempfile.mkdtemp(prefix=".prompt-shards-", dir=tmpdir)
+    # מספור השורות: כל קטע מתחיל אחרי כל השורות שבקטעים שלפניו (ראו _start_line)
+    line_counts = multiprocessing.RawArray("q", [_PENDING] * len(ranges))
+    first_line = 2 if fieldnames is not None else 1
+    count = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(line_counts,)) as pool:
+            futures = {}
+            for index, (begin, end) in enumerate(ranges):
+                shard_path = os.path.join(shard_dir, f"shard-{index:05d}")
+                task = (input_path, index, begin, end, first_line, input_format, fieldnames, output_format,
+                        shard_path, template)
+                futures[pool.submit(_build_shard, task)] = shard_path
+
+            done = futures if ordered else as_completed(futures)
+            for future in done:
+                count += future.result()
+                shard_path = futures[future]
+                with open(shard_path, "r", encoding="utf-8", newline="") as shard:
+                    shutil.copyfileobj(shard, output_stream, BLOCK_SIZE)
+                os.remove(shard_path)
+                if progress is not None:
+                    progress.update(count)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    output_stream.flush()
+    if progress is not None:
+        progress.update(count, force=True)
+    return count
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+עיבוד אצווה של פרומפטים - שורות JSONL / CSV נכנסות, פרומפטים יוצאים
+Streaming batch prompt building over JSONL and CSV
+
+הקלט נקרא שורה אחר שורה והפלט נכתב במנות, כך שהזיכרון קבוע בלי תלות
+בגודל הקובץ. ספריה סטנדרטית בלבד.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import fields
+from typing import IO, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from prompt_core import PromptElements, create_basic_prompt
+
+FIELD_NAMES = tuple(f.name for f in fields(PromptElements))
+
+# שמות עמודות חלופיים (כמו בארגומנטים של שורת הפקודה)
+FIELD_ALIASES = {"colors": "color"}
+
+FORMATS = ("jsonl", "csv")
+OUTPUT_FORMATS = ("jsonl", "csv", "text")
+
+# מספר השורות שנצברות לפני כתיבה אחת לפלט
+WRITE_BATCH = 1000
+
+
+# סיומות הקבצים המוכרות
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".txt": "text"}
+
+
+def detect_format(path: Optional[str], default: str = "jsonl", formats: Optional[Sequence[str]] = None) -> str:
+    """
+    זיהוי הפורמט לפי סיומת הקובץ (stdin / ללא סיומת - ברירת המחדל)
+
+    Args:
+        path: נתיב הקובץ ("-" - stdin/stdout)
+        default: הפורמט כשאין סיומת (ובלי formats - גם לסיומת לא מוכרת)
+        formats: הפורמטים המותרים (למשל FORMATS לקלט); סיומת אחרת מעלה שגיאה
+
+    Raises:
+        ValueError: הסיומת אינה אחד מהפורמטים המותרים
+    """
+    extension = os.path.splitext(path)[1].lower() if path and path != "-" else ""
+    if not extension:
+        return default
+    detected = EXTENSIONS.get(extension)
+    if formats is None:
+        return detected or default
+    if detected not in formats:
+        raise ValueError(f"לא ניתן לזהות פורמט ({'/'.join(formats)}) מהסיומת של {path} - "
+                         f"יש לציין את הפורמט במפורש")
+    return detected
+
+
+def row_to_elements(row: Dict[str, object]) -> PromptElements:
+    """שורת קלט (מילון) -> PromptElements; עמודות שאינן אלמנטים מתעלמים מהן"""
+    values = {}
+    for key, value in row.items():
+        name = FIELD_ALIASES.get(key, key)
+        if name in FIELD_NAMES and value is not None:
+            values[name] = str(value)
+    return PromptElements(**values)
+
+
+def read_rows(stream: Iterable[str], fmt: str, first_line: int = 1,
+              fieldnames: Optional[Sequence[str]] = None) -> Iterator[Tuple[int, Dict[str, object]]]:
+    """
+    קריאת שורות הקלט בהזרמה
+
+    Args:
+        stream: קלט טקסט או כל איטרטור של שורות
+        fmt: "jsonl" או "csv"
+        first_line: מספר השורה בקובץ של השורה הראשונה בקלט (לקריאת קטע מהקובץ)
+        fieldnames: שמות עמודות ה-CSV כשהקלט אינו מתחיל בשורת הכותרת
+
+    Yields:
+        (מספר שורה בקובץ, מילון העמודות); שורות ריקות מדולגות
+
+    Raises:
+        ValueError: שורת JSONL שאינה אובייקט JSON תקין
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream, fieldnames=fieldnames)
+        for row in reader:
+            yield first_line - 1 + reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, first_line):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"שורה {line_number}: JSON לא תקין ({e})") from e
+        if not isinstance(row, dict):
+            raise ValueError(f"שורה {line_number}: צפוי אובייקט JSON")
+        yield line_number, row
+
+
+class PromptWriter:
+    """כתיבת תוצאות במנות (jsonl / csv / text)"""
+
+    def __init__(self, stream: IO[str], fmt: str, header: bool = True):
+        """
+        Args:
+            stream: פלט טקסט
+            fmt: "jsonl", "csv" או "text"
+            header: כתיבת שורת הכותרת של CSV (לא בקטעי פלט שמאוחדים אחר כך)
+        """
+        self.stream = stream
+        self.fmt = fmt
+        self._pending = []
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(_PendingLines(self._pending), lineterminator="\n")
+            if header:
+                self._csv.writerow(["id", "prompt"])
+
+    def write(self, row_id, prompt: str):
+        if self.fmt == "jsonl":
+            self._pending.append(json.dumps({"id": row_id, "prompt": prompt}, ensure_ascii=False) + "\n")
+        elif self.fmt == "csv":
+            self._csv.writerow([row_id, prompt])
+        else:
+            self._pending.append(prompt + "\n")
+        if len(self._pending) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.stream.write("".join(self._pending))
+            self._pending.clear()
+
+
+class _PendingLines:
+    """יעד ל-csv.writer שצובר את השורות ברשימה במקום לכתוב מיד"""
+
+    def __init__(self, pending: list):
+        self.write = pending.append
+
+
+class Progress:
+    """מונה שורות וקצב לשנייה ל-stderr, מתעדכן לכל היותר פעם בשנייה"""
+
+    def __init__(self, stream: IO[str] = sys.stderr, interval: float = 1.0):
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._next_report = self.started + interval
+
+    def update(self, rows: int, force: bool = False):
+        now = time.perf_counter()
+        if not force and now < self._next_report:
+            return
+        self._next_report = now + self.interval
+        rate = rows / max(now - self.started, 1e-9)
+        self.stream.write(f"\r{rows:,} rows, {rate:,.0f} rows/s")
+        if force:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+def build_prompts(rows: Iterable[Tuple[int, Dict[str, object]]],
+                  assemble: Callable[[PromptElements], str] = create_basic_prompt,
+                  template=None) -> Iterator[Tuple[object, str]]:
+    """
+    (מזהה, פרומפט) לכל שורה; המזהה הוא עמודת id אם קיימת, אחרת מספר השורה
+
+    Args:
+        rows: (מספר שורה, מילון) כמו מ-read_rows
+        assemble: הרכבת הפרומפט מהאלמנטים שבשורה
+        template: ParametricTemplate - עמודות השורה ממלאות את מצייני המקום
+            בתבנית במקום לשמש כאלמנטים
+
+    Raises:
+        ValueError: בתבנית - לשורה חסר ערך למציין מקום
+    """
+    if template is None:
+        for line_number, row in rows:
+            yield row.get("id", line_number), assemble(row_to_elements(row))
+        return
+    fill = template.fill
+    for line_number, row in rows:
+        try:
+            prompt = fill(row)
+        except ValueError as e:
+            raise ValueError(f"שורה {line_number}: {e}") from None
+        yield row.get("id", line_number), prompt
+
+
+def run_batch(input_stream: IO[str], output_stream: IO[str], input_format: str = "jsonl",
+              output_format: str = "jsonl", progress: Optional[Progress] = None, template=None) -> int:
+    """
+    בניית פרומפטים לכל שורות הקלט והזרמתם לפלט
+
+    Args:
+        input_stream: קלט טקסט (קובץ או stdin)
+        output_stream: פלט טקסט (קובץ או stdout)
+        input_format: "jsonl" או "csv"
+        output_format: "jsonl", "csv" או "text" (פרומפט בכל שורה)
+        progress: מונה התקדמות (אופציונלי)
+        template: ParametricTemplate למילוי מהשורות (אופציונלי)
+
+    Returns:
+        מספר השורות שעובדו
+    """
+    writer = PromptWriter(output_stream, output_format)
+    count = 0
+    for row_id, prompt in build_prompts(read_rows(input_stream, input_format), template=template):
+        writer.write(row_id, prompt)
+        count += 1
+        if progress is not None and count % WRITE_BATCH == 0:
+            progress.update(count)
+    writer.flush()
+    output_stream.flush()
+    if progress is not None:
+        progress.update(count, force=True)
+    return count
+
+
+def open_input(path: str) -> IO[str]:
+    """פתיחת קובץ קלט ("-" - stdin)"""
+    if path == "-":
+        return sys.stdin
+    # utf-8-sig: BOM בתחילת הקובץ (נפוץ ב-CSV מ-Excel) אינו נדבק לעמודה הראשונה
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+def open_output(path: str) -> IO[str]:
+    """פתיחת קובץ פלט עם חוצץ גדול ("-" - stdout)"""
+    if path == "-":
+        return sys.stdout
+    return open(path, "w", encoding="utf-8", newline="", buffering=1024 * 1024)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מטמון קבוע בדיסק לתוצאות שיפור פרומפטים
+Persistent on-disk cache for enhanced prompts (SQLite, WAL mode)
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class PromptCache:
+    """מטמון SQLite במצב WAL עם TTL, פינוי LRU ומוני פגיעות - בטוח לשיתוף בין תהליכים"""
+
+    def __init__(self, path: str = "prompt_cache.sqlite3", ttl: Optional[float] = None,
+                 max_entries: int = 10000):
+        """
+        אתחול המטמון
+
+        Args:
+            path: נתיב קובץ מסד הנתונים
+            ttl: תוקף רשומה בשניות (None - ללא תפוגה)
+            max_entries: מספר רשומות מרבי לפני פינוי הרשומות הישנות ביותר
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """חיבור נפרד לכל thread - חיבורי SQLite אינם משותפים בין threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(basic_prompt: str, target_use: str, model: str,
+                 temperature: float, max_tokens: int) -> str:
+        """
+        יצירת מפתח מטמון
+
+        הפרומפט מנורמל (רווחים כפולים ושוליים) כך שהבדלי ריווח לא יגרמו להחטאה
+        """
+        normalized = " ".join(basic_prompt.split())
+        payload = json.dumps([normalized, target_use, model, temperature, max_tokens],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """קבלת ערך מהמטמון, או None אם אינו קיים או שפג תוקפו"""
+        conn = self._connection()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: str):
+        """שמירת ערך במטמון ופינוי הרשומות שבשימוש הכי פחות לאחרונה"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, value, now, now),
+        )
+
+        count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        """ניקוי כל הרשומות ואיפוס המונים"""
+        self._connection().execute("DELETE FROM entries")
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """מוני פגיעות/החטאות ומספר הרשומות"""
+        entries = self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        """סגירת החיבור של ה-thread הנוכחי"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ליבת מחולל הפרומפטים - מבנה הנתונים והרכבת הפרומפט
+Prompt generator core: data model and prompt assembly
+
+המודול משתמש בספריה הסטנדרטית בלבד (ללא openai / tkinter / PIL), כך שייבוא
+לצורך בניית פרומפטים בלבד נשאר מהיר. כל הממשקים משתמשים בו.
+"""
+
+import json
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Callable, Iterable, List, Sequence, Tuple
+
+# הגדרת מבנה הנתונים למסגרת 8 האלמנטים
+@dataclass
+class PromptElements:
+    """מסגרת 8 האלמנטים ליצירת פרומפט מקצועי"""
+    subject: str = ""           # נושא - מה/מי בתמונה
+    composition: str = ""       # קומפוזיציה - איך מסודר
+    style: str = ""            # סגנון - איזה מראה
+    lighting: str = ""         # תאורה - איזה אור
+    color: str = ""            # צבע - אילו צבעים
+    mood: str = ""             # מצב רוח - איזו תחושה
+    details: str = ""          # פרטים - מה לכלול/להשמיט
+    context: str = ""          # הקשר - למה זה מיועד
+
+class StyleCategory(Enum):
+    """קטגוריות סגנונות זמינות"""
+    REALISTIC = "realistic"
+    CARTOON = "cartoon"
+    WATERCOLOR = "watercolor"
+    OIL_PAINTING = "oil painting"
+    SKETCH = "sketch"
+    RENDER_3D = "3D render"
+    MINIMALIST = "minimalist"
+    VINTAGE = "vintage"
+    MODERN = "modern"
+    PHOTOGRAPHY = "professional photography"
+
+class LightingType(Enum):
+    """סוגי תאורה זמינים"""
+    SOFT_MORNING = "soft morning light"
+    DRAMATIC_SUNSET = "dramatic sunset"
+    STUDIO = "studio lighting"
+    NATURAL_DAYLIGHT = "natural daylight"
+    MOODY_SHADOWS = "moody shadows"
+    BRIGHT_AIRY = "bright and airy"
+
+class MoodType(Enum):
+    """סוגי מצבי רוח"""
+    ENERGETIC = "energetic"
+    CALM = "calm"
+    MYSTERIOUS = "mysterious"
+    PROFESSIONAL = "professional"
+    PLAYFUL = "playful"
+    ELEGANT = "elegant"
+    RUSTIC = "rustic"
+    FUTURISTIC = "futuristic"
+
+class CompositionType(Enum):
+    """סוגי קומפוזיציה"""
+    CLOSE_UP = "close-up portrait"
+    WIDE_ANGLE = "wide angle"
+    BIRDS_EYE = "bird's eye view"
+    LOW_ANGLE = "low angle"
+    SYMMETRICAL = "symmetrical"
+    RULE_OF_THIRDS = "rule of thirds"
+
+# סדר השדות בפרומפט והקידומת של כל שדה
+DEFAULT_FIELDS = (
+    ("subject", ""),                # נושא (חובה)
+    ("composition", "composition: "),
+    ("style", "style: "),
+    ("lighting", "lighting: "),
+    ("color", "colors: "),
+    ("mood", "mood: "),
+    ("details", "details: "),
+    ("context", "for: "),
+)
+
+# משפרי איכות שנוספים לסוף כל פרומפט
+QUALITY_WORDS = ("high quality", "detailed", "professional")
+
+class PromptAssembler:
+    """
+    הרכבת פרומפטים לפי מפרט שדות שמהודר פעם אחת
+
+    מהמפרט נוצרת פונקציית הרכבה ייעודית (כמו namedtuple בספריה הסטנדרטית):
+    בדיקת שדה אחרי שדה ללא לולאה כללית על המפרט, כך שמפרט מותאם עולה
+    כמו שרשרת if כתובה ביד. עם ברירות המחדל הפלט זהה ל-create_basic_prompt.
+    """
+    def __init__(self, fields: Sequence[Tuple[str, str]] = DEFAULT_FIELDS, separator: str = ", ",
+                 quality: Sequence[str] = QUALITY_WORDS):
+        """
+        Args:
+            fields: זוגות (שם שדה, קידומת) בסדר ההופעה בפרומפט; שדה ריק מושמט
+            separator: המפריד בין הקטעים
+            quality: מילים שנוספות לסוף כל פרומפט
+
+        Raises:
+            ValueError: מפרט ריק או שם שדה שאינו מזהה תקין
+        """
+        if not fields:
+            raise ValueError("נדרש לפחות שדה אחד")
+        for name, _ in fields:
+            if not name.isidentifier():
+                raise ValueError(f"שם שדה לא תקין: {name!r}")
+        self.fields = tuple(fields)
+        self.separator = separator
+        self.quality = tuple(quality)
+        self.assemble = self._compile()
+
+    def _compile(self) -> Callable[[object], str]:
+        # המפריד ומילות האיכות מועברים במרחב השמות; הקידומות נכתבות כליטרלים
+        namespace = {"separator": self.separator, "quality": self.quality}
+        lines = ["def assemble(elements):", "    parts = []"]
+        for name, prefix in self.fields:
+            lines += [f"    value = elements.{name}", "    if value:"]
+            if not prefix:
+                lines.append("        parts.append(value)")
+                continue
+            # הקידומת נכנסת כליטרל של f-string, כמו בשרשרת if כתובה ביד;
+            # גם ערך שאינו מחרוזת (מספר מתבנית JSON) עובר דרך str()
+            literal = prefix.replace("{", "{{").replace("}", "}}") + "{value}"
+            lines.append(f"        parts.append(f{literal!r})")
+        lines += ["    parts.extend(quality)", "    return separator.join(parts)"]
+        exec("\n".join(lines), namespace)
+        return namespace["assemble"]
+
+    def __call__(self, elements) -> str:
+        return self.assemble(elements)
+
+    def many(self, elements: Iterable) -> Iterable[str]:
+        """הרכבה בהזרמה (איטרטור) לרצף אלמנטים"""
+        return map(self.assemble, elements)
+
+_assemble_default = PromptAssembler().assemble
+
+def create_basic_prompt(elements: PromptElements) -> str:
+    """
+    יצירת פרומפט בסיסי מאלמנטים
+
+    השדות לפי DEFAULT_FIELDS ("composition: ...", "style: ..." וכו'),
+    מופרדים בפסיקים, ובסוף משפרי האיכות.
+
+    Args:
+        elements: מבנה נתונים של 8 האלמנטים
+
+    Returns:
+        פרומפט מעוצב
+    """
+    return _assemble_default(elements)
+
+def create_basic_prompts(elements: Iterable[PromptElements]) -> List[str]:
+    """create_basic_prompt לכל האלמנטים ברצף, בקריאה אחת"""
+    return list(map(_assemble_default, elements))
+
+def save_elements_template(elements: PromptElements, filename: str):
+    """שמירת תבנית אלמנטים לקובץ JSON"""
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(elements.__dict__, f, ensure_ascii=False, indent=2)
+
+def load_elements_template(filename: str) -> PromptElements:
+    """טעינת תבנית אלמנטים מקובץ JSON"""
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+        return PromptElements(**data)
+
+# דוגמאות מוכנות
+EXAMPLES = {
+    "cat": PromptElements(
+        subject="חתול פרסי לבן",
+        composition="close-up portrait",
+        style="professional photography",
+        lighting="soft morning light",
+        color="גוונים חמים",
+        mood="calm",
+        details="עיניים כחולות, פרווה רכה",
+        context="צילום מקצועי",
+    ),
+    "logo": PromptElements(
+        subject="לוגו מינימליסטי",
+        composition="symmetrical",
+        style="minimalist",
+        lighting="clean lighting",
+        color="כחול וצבעי אמון",
+        mood="professional",
+        details="פשוט וזכיר",
+        context="מיתוג עסקי",
+    ),
+    "landscape": PromptElements(
+        subject="נוף הרים עם אגם",
+        composition="wide angle",
+        style="realistic",
+        lighting="dramatic sunset",
+        color="צבעי זהב וכתום",
+        mood="calm",
+        details="השתקפויות במים",
+        context="צילום טבע",
+    ),
+}
+
+def get_example(example_type: str) -> PromptElements:
+    """עותק של דוגמא מוכנה (אלמנטים ריקים אם אינה קיימת)"""
+    example = EXAMPLES.get(example_type)
+    return replace(example) if example is not None else PromptElements()
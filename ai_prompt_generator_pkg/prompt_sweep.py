@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+סריקה קומבינטורית של פרומפטים על פני אוצר המילים של ה-enum-ים
+Lazy combinatorial prompt sweeps for A/B testing
+
+מרחב הסריקה הוא המכפלה הקרטזית נושא × קומפוזיציה × סגנון × תאורה × מצב
+רוח (בסדר השדות בפרומפט). כל צירוף מזוהה באינדקס, כך שהמרחב אינו נבנה
+בזיכרון: אפשר לחתוך טווחים לתהליכים שונים, לדגום באקראי או לפי שכבות,
+ולבנות פרומפט בודד לפי אינדקס. הפרומפטים זהים לפלט של create_basic_prompt.
+"""
+
+import random
+from dataclasses import replace
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from prompt_core import (
+    DEFAULT_FIELDS,
+    QUALITY_WORDS,
+    CompositionType,
+    LightingType,
+    MoodType,
+    PromptElements,
+    StyleCategory,
+    create_basic_prompt,
+)
+
+# הצירים בסדר הופעתם בפרומפט; הציר האחרון משתנה הכי מהר
+AXES = ("subject", "composition", "style", "lighting", "mood")
+
+# קידומות השדות כמו ב-create_basic_prompt
+PREFIXES = dict(DEFAULT_FIELDS)
+
+Axis = Optional[Iterable[Union[str, object]]]
+
+
+def _axis_values(values: Axis, fixed: str) -> Tuple[str, ...]:
+    """ערכי ציר כמחרוזות (חברי enum -> value); None - הערך הקבוע מהבסיס בלבד"""
+    if values is None:
+        return (fixed,)
+    result = tuple(getattr(value, "value", value) for value in values)
+    if not result:
+        raise ValueError("ציר סריקה ריק")
+    return result
+
+
+def _segment(field: str, value: str) -> str:
+    """קטע הפרומפט של שדה, עם המפריד שלפניו ("" לשדה ריק)"""
+    return f", {PREFIXES[field]}{value}" if value else ""
+
+
+class PromptSweep:
+    """
+    סריקה עצלה על מרחב הצירופים (או על תת-קבוצה של אינדקסים בו)
+
+    התנהגות של רצף: len, אינדקס (כולל שלילי), חיתוך (מחזיר סריקה עצלה
+    חדשה) ואיטרציה. איטרציה על אינדקסים עוקבים בונה את קידומת הנושא
+    והצירים הקבועים פעם אחת לכל קבוצת מצבי רוח.
+    """
+
+    def __init__(self, subjects: Iterable[str], compositions: Axis = CompositionType,
+                 styles: Axis = StyleCategory, lightings: Axis = LightingType, moods: Axis = MoodType,
+                 base: Optional[PromptElements] = None):
+        """
+        Args:
+            subjects: הנושאים
+            compositions, styles, lightings, moods: ערכי הצירים - enum, רשימת
+                חברי enum או מחרוזות; None - הערך מ-base, ללא סריקה
+            base: אלמנטים קבועים לכל הצירופים (צבע, פרטים, הקשר)
+        """
+        self.base = base or PromptElements()
+        self.values = {
+            "subject": _axis_values(subjects, self.base.subject),
+            "composition": _axis_values(compositions, self.base.composition),
+            "style": _axis_values(styles, self.base.style),
+            "lighting": _axis_values(lightings, self.base.lighting),
+            "mood": _axis_values(moods, self.base.mood),
+        }
+        self.sizes = tuple(len(self.values[axis]) for axis in AXES)
+        self.space_size = _product(self.sizes)
+        self._indices: Sequence[int] = range(self.space_size)
+
+        # קטעים מחושבים מראש: קידומת הנושא, וסיומת לכל מצב רוח כולל השדות הקבועים
+        self._segments = {axis: [_segment(axis, value) for value in self.values[axis]] for axis in AXES[:-1]}
+        self._color = _segment("color", self.base.color)
+        tail = (_segment("details", self.base.details) + _segment("context", self.base.context)
+                + "".join(f", {word}" for word in QUALITY_WORDS))
+        self._mood_tails = [_segment("mood", value) + tail for value in self.values["mood"]]
+        self._bare_mood_tails = [suffix[2:] for suffix in self._mood_tails]
+
+    def _view(self, indices: Sequence[int]) -> "PromptSweep":
+        view = object.__new__(PromptSweep)
+        view.__dict__.update(self.__dict__)
+        view._indices = indices
+        return view
+
+    # ---- מיפוי אינדקס <-> צירוף
+
+    def digits(self, index: int) -> Dict[str, int]:
+        """מיקום כל ציר בצירוף שבאינדקס (אינדקס במרחב המלא)"""
+        return _decode(index, AXES, self.sizes)
+
+    def index_of(self, **digits: int) -> int:
+        """האינדקס במרחב המלא של צירוף (מיקום בכל ציר; ציר חסר - 0)"""
+        index = 0
+        for axis, size in zip(AXES, self.sizes):
+            index = index * size + digits.get(axis, 0)
+        return index
+
+    def elements(self, index: int) -> PromptElements:
+        """האלמנטים של הצירוף באינדקס (בתוך הסריקה הנוכחית)"""
+        digits = self.digits(self._indices[index])
+        return replace(self.base, **{axis: self.values[axis][digits[axis]] for axis in AXES})
+
+    def _prefix(self, key: int) -> str:
+        """קידומת הפרומפט עד התאורה והצבע, לכל הצירופים שנבדלים במצב הרוח בלבד"""
+        parts = []
+        for axis, size in zip(reversed(AXES[:-1]), reversed(self.sizes[:-1])):
+            key, digit = divmod(key, size)
+            parts.append(self._segments[axis][digit])
+        parts.reverse()
+        return "".join(parts) + self._color
+
+    # ---- רצף
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[str, "PromptSweep"]:
+        if isinstance(item, slice):
+            return self._view(self._indices[item])
+        return create_basic_prompt(self.elements(item))
+
+    def __iter__(self) -> Iterator[str]:
+        for _, prompt in self.indexed():
+            yield prompt
+
+    def indexed(self) -> Iterator[Tuple[int, str]]:
+        """(אינדקס במרחב המלא, פרומפט) - לתיוג תוצאות A/B לפי צירוף"""
+        moods = self.sizes[-1]
+        last_key = None
+        head, tails = "", self._mood_tails
+        for index in self._indices:
+            key, mood = divmod(index, moods)
+            if key != last_key:
+                last_key = key
+                head = self._prefix(key)
+                # הקטע הראשון בפרומפט מופיע בלי המפריד שלפניו
+                if head:
+                    head, tails = head[2:], self._mood_tails
+                else:
+                    tails = self._bare_mood_tails
+            yield index, head + tails[mood]
+
+    # ---- חלוקה ודגימה
+
+    def shard(self, index: int, count: int) -> "PromptSweep":
+        """החלק ה-index (מ-0) מתוך count חלקים רציפים בגודל שווה בקירוב"""
+        if not 0 <= index < count:
+            raise ValueError(f"חלק {index} מחוץ לטווח 0..{count - 1}")
+        total = len(self)
+        return self[total * index // count:total * (index + 1) // count]
+
+    def sample(self, k: int, seed: Optional[int] = None) -> "PromptSweep":
+        """דגימה אקראית של k צירופים ללא חזרות, בסדר המרחב"""
+        chosen = random.Random(seed).sample(range(len(self)), k)
+        return self._view([self._indices[i] for i in sorted(chosen)])
+
+    def stratified(self, k: int, by: Union[str, Sequence[str]] = "style",
+                   seed: Optional[int] = None) -> "PromptSweep":
+        """
+        דגימה לפי שכבות: k צירופים לכל ערך (או צירוף ערכים) של צירי by
+
+        Args:
+            k: מספר הצירופים בכל שכבה (לכל היותר גודל השכבה)
+            by: ציר או צירים שמגדירים את השכבות, למשל ("subject", "style")
+            seed: זרע לדגימה
+
+        Returns:
+            סריקה על המרחב המלא (לא על תת-סריקה), בסדר המרחב
+        """
+        by = (by,) if isinstance(by, str) else tuple(by)
+        unknown = set(by) - set(AXES)
+        if unknown:
+            raise ValueError(f"צירים לא מוכרים: {sorted(unknown)}")
+        rnd = random.Random(seed)
+        free = [axis for axis in AXES if axis not in by]
+        free_sizes = [len(self.values[axis]) for axis in free]
+        by_sizes = [len(self.values[axis]) for axis in by]
+        stratum_size = _product(free_sizes)
+
+        chosen = []
+        for stratum in range(_product(by_sizes)):
+            digits = _decode(stratum, by, by_sizes)
+            for local in rnd.sample(range(stratum_size), min(k, stratum_size)):
+                digits.update(_decode(local, free, free_sizes))
+                chosen.append(self.index_of(**digits))
+        chosen.sort()
+        return self._view(chosen)
+
+
+def _product(sizes: Iterable[int]) -> int:
+    result = 1
+    for size in sizes:
+        result *= size
+    return result
+
+
+def _decode(index: int, axes: Sequence[str], sizes: Sequence[int]) -> Dict[str, int]:
+    """אינדקס בתת-מרחב של הצירים axes -> מיקום בכל ציר"""
+    digits = {}
+    for axis, size in zip(reversed(axes), reversed(sizes)):
+        index, digits[axis] = divmod(index, size)
+    return digits
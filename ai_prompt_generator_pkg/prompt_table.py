@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+טבלת אלמנטים עמודתית ודחוסה למיליוני פרומפטים
+Columnar, dictionary-encoded storage for PromptElements
+
+כל שדה נשמר כעמודת קודים (array) במקום מופע dataclass לכל שורה:
+- שדות ה-enum (קומפוזיציה, סגנון, תאורה, מצב רוח) - קוד של בית אחד לתוך
+  אוצר מילים של העמודה, שמאותחל מערכי ה-enum (העמודה מורחבת ל-2, 4 או 8
+  בתים כשיש יותר ערכים שונים)
+- שדות הטקסט החופשי - אינדקס של 4 בתים למאגר מחרוזות משותף, כך שכל
+  מחרוזת נשמרת פעם אחת בלבד
+
+הרכבת הפרומפטים לטבלה כולה עובדת על הקודים: קטע הפרומפט מחושב פעם אחת
+לכל ערך באוצר המילים של עמודת enum, ולכל קוד שמופיע במנה בעמודות הטקסט
+החופשי (כך שהזיכרון הזמני חסום בגודל המנה). הפלט זהה ל-create_basic_prompt.
+"""
+
+import sys
+from array import array
+from dataclasses import fields
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+from prompt_core import (
+    DEFAULT_FIELDS,
+    QUALITY_WORDS,
+    CompositionType,
+    LightingType,
+    MoodType,
+    PromptElements,
+    StyleCategory,
+)
+
+FIELD_NAMES = tuple(f.name for f in fields(PromptElements))
+
+# שדות שערכיהם באים בדרך כלל מ-enum - קוד קטן לכל עמודה
+ENUM_FIELDS = {"composition": CompositionType, "style": StyleCategory, "lighting": LightingType, "mood": MoodType}
+
+# שמות עמודות חלופיים בשורות מילון (כמו ב-prompt_batch)
+FIELD_ALIASES = {"colors": "color"}
+
+# קידומות השדות כמו ב-create_basic_prompt
+PREFIXES = dict(DEFAULT_FIELDS)
+
+QUALITY_SUFFIX = "".join(f", {word}" for word in QUALITY_WORDS)
+
+# מספר השורות שמורכבות יחד ב-iter_prompts (זיכרון זמני חסום)
+CHUNK_SIZE = 65536
+
+# הרחבת עמודת קודים כשקוד חורג מהטווח של סוג ה-array הנוכחי
+WIDER_TYPECODES = {"B": "H", "H": "I", "I": "L", "L": "Q"}
+TYPECODE_LIMITS = {typecode: 1 << (8 * array(typecode).itemsize) for typecode in "BHILQ"}
+
+
+class _Vocabulary:
+    """מחרוזת <-> קוד; קוד 0 הוא תמיד המחרוזת הריקה"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = [""]
+        self.codes: Optional[Dict[str, int]] = {"": 0}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        if self.codes is None:
+            self.codes = {value: code for code, value in enumerate(self.values)}
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class PromptRow:
+    """תצוגה של שורה בטבלה (ללא העתקת נתונים); השדות נקראים כמו ב-PromptElements"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "PromptTable", index: int):
+        self._table = table
+        self._index = index
+
+    def to_elements(self) -> PromptElements:
+        return PromptElements(**{name: getattr(self, name) for name in FIELD_NAMES})
+
+    def __repr__(self) -> str:
+        return f"PromptRow({self._index}, {self.to_elements()!r})"
+
+
+def _field_property(name: str) -> property:
+    return property(lambda row: row._table.value(name, row._index))
+
+
+for _name in FIELD_NAMES:
+    setattr(PromptRow, _name, _field_property(_name))
+
+
+class PromptTable:
+    """
+    מיכל עמודתי ל-PromptElements רבים
+
+    התנהגות של רצף: len, אינדקס (מחזיר PromptRow), איטרציה. הוספה
+    ב-append / extend של PromptElements או מילונים.
+    """
+
+    def __init__(self, rows: Iterable[Union[PromptElements, Mapping[str, object]]] = ()):
+        self._pool = _Vocabulary()
+        self._vocabularies: Dict[str, _Vocabulary] = {}
+        self._columns: Dict[str, array] = {}
+        for name in FIELD_NAMES:
+            if name in ENUM_FIELDS:
+                self._vocabularies[name] = _Vocabulary(member.value for member in ENUM_FIELDS[name])
+                self._columns[name] = array("B")
+            else:
+                self._vocabularies[name] = self._pool
+                self._columns[name] = array("I")
+        self.extend(rows)
+
+    # ---- הוספה
+
+    def append(self, item: Union[PromptElements, Mapping[str, object]]):
+        """הוספת שורה: PromptElements או מילון (עמודות שאינן אלמנטים מתעלמים מהן)"""
+        if isinstance(item, PromptElements):
+            get = item.__dict__.get
+        else:
+            values = {FIELD_ALIASES.get(key, key): value for key, value in item.items()}
+            get = values.get
+        for name in FIELD_NAMES:
+            value = get(name)
+            code = self._vocabularies[name].code(str(value) if value else "")
+            column = self._columns[name]
+            while code >= TYPECODE_LIMITS[column.typecode]:
+                # יותר ערכים שונים ממה שהקודים הנוכחיים מכילים - מעבר לקודים רחבים יותר
+                column = self._columns[name] = array(WIDER_TYPECODES[column.typecode], column)
+            column.append(code)
+
+    def extend(self, items: Iterable[Union[PromptElements, Mapping[str, object]]]):
+        for item in items:
+            self.append(item)
+
+    def compact(self):
+        """
+        שחרור מילוני החיפוש (מחרוזת -> קוד) ועודפי ההקצאה של העמודות בסוף
+        הטעינה; הוספה נוספת בונה את המילונים מחדש
+        """
+        for vocabulary in self._vocabularies.values():
+            vocabulary.codes = None
+        for name, column in self._columns.items():
+            self._columns[name] = array(column.typecode, column)
+
+    # ---- קריאה
+
+    def __len__(self) -> int:
+        return len(self._columns["subject"])
+
+    def __getitem__(self, index: int) -> PromptRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("אינדקס שורה מחוץ לטבלה")
+        return PromptRow(self, index)
+
+    def __iter__(self) -> Iterator[PromptRow]:
+        for index in range(len(self)):
+            yield PromptRow(self, index)
+
+    def value(self, name: str, index: int) -> str:
+        """ערך שדה בשורה"""
+        return self._vocabularies[name].values[self._columns[name][index]]
+
+    def column(self, name: str) -> List[str]:
+        """ערכי עמודה שלמה כמחרוזות (ללא עותקים - המחרוזות מהמאגר)"""
+        return list(map(self._vocabularies[name].values.__getitem__, self._columns[name]))
+
+    def nbytes(self) -> int:
+        """גודל משוער בזיכרון: עמודות הקודים, אוצרות המילים והמחרוזות שבהם"""
+        total = sum(column.itemsize * len(column) for column in self._columns.values())
+        vocabularies = {id(v): v for v in self._vocabularies.values()}.values()
+        for vocabulary in vocabularies:
+            total += sys.getsizeof(vocabulary.values)
+            if vocabulary.codes is not None:
+                total += sys.getsizeof(vocabulary.codes)
+            total += sum(sys.getsizeof(value) for value in vocabulary.values)
+        return total
+
+    # ---- הרכבת פרומפטים
+
+    def _segments(self, name: str) -> List[str]:
+        """קטע הפרומפט (עם המפריד שלפניו) לכל קוד באוצר המילים של עמודת enum"""
+        prefix = ", " + PREFIXES[name]
+        return ["" if not value else prefix + value for value in self._vocabularies[name].values]
+
+    def _chunk_segments(self, name: str, codes: array) -> Dict[int, str]:
+        """
+        קטע הפרומפט לקודים של מנה אחת בעמודת טקסט חופשי - רק לקודים שבמנה,
+        בלי לבנות עותק עם קידומת של המאגר המשותף כולו
+        """
+        prefix = ", " + PREFIXES[name]
+        values = self._pool.values
+        segments = {code: prefix + values[code] for code in set(codes)}
+        segments[0] = ""
+        return segments
+
+    def iter_prompts(self, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+        """הפרומפטים לכל השורות לפי הסדר, מורכבים במנות של chunk_size שורות"""
+        enum_segments = {name: self._segments(name) for name in ENUM_FIELDS}
+        subjects = self._pool.values
+        for start in range(0, len(self), chunk_size):
+            stop = start + chunk_size
+            parts = []
+            for name in FIELD_NAMES:
+                codes = self._columns[name][start:stop]
+                if name == "subject":
+                    # לנושא אין קידומת - המחרוזות מהמאגר עצמו
+                    segments = subjects
+                elif name in enum_segments:
+                    segments = enum_segments[name]
+                else:
+                    segments = self._chunk_segments(name, codes)
+                parts.append(map(segments.__getitem__, codes))
+            parts.append(repeat(QUALITY_SUFFIX))
+            for pieces in zip(*parts):
+                prompt = "".join(pieces)
+                # ללא נושא הפרומפט מתחיל במפריד של הקטע הבא - מושמט
+                yield prompt if pieces[0] else prompt[2:]
+
+    def prompts(self) -> List[str]:
+        """הפרומפטים לכל השורות (זהים ל-create_basic_prompt לכל שורה)"""
+        return list(self.iter_prompts())
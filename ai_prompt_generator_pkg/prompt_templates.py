@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+תבניות פרמטריות - אלמנטים עם מצייני מקום כמו {product} או {color}
+Precompiled parametric prompt templates
+
+התבנית היא PromptElements רגיל (אותו קובץ JSON של save_elements_template)
+שערכיו מכילים מצייני מקום בתחביר str.format. התבנית מפוענחת ומהודרת
+פעם אחת למחרוזת פורמט של הפרומפט כולו, כך שמילוי שורה (מילון, שורת CSV
+או JSONL) הוא החלפה בלבד. הפלט זהה ל-create_basic_prompt על האלמנטים
+הממולאים.
+"""
+
+from dataclasses import replace
+from itertools import islice, repeat
+from operator import contains
+from string import Formatter
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from prompt_core import DEFAULT_FIELDS, QUALITY_WORDS, PromptElements, load_elements_template
+
+# מספר השורות שממולאות יחד במסלול המהיר של fill_rows
+FILL_CHUNK = 1024
+
+# סוג הצגה מספרי בסוף הגדרת הפורמט -> המרת ערך מחרוזת (ערכי CSV הם תמיד מחרוזות)
+NUMERIC_TYPES = {**dict.fromkeys("bcdoxX", int), **dict.fromkeys("eEfFgGn%", float)}
+
+
+def _escape(text: str) -> str:
+    """טקסט קבוע בתוך מחרוזת פורמט"""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _placeholders(text: str) -> Tuple[List[str], bool, Dict[str, type]]:
+    """
+    (שמות מצייני המקום, האם יש טקסט קבוע, המרה מספרית לפי הגדרת הפורמט) בערך של שדה
+
+    Raises:
+        ValueError: תחביר שגוי או מציין מקום שאינו שם פשוט ({0}, {a.b}, {a[0]})
+    """
+    names, has_literal, numeric = [], False, {}
+    for literal, name, spec, _ in Formatter().parse(text):
+        has_literal = has_literal or bool(literal)
+        if name is None:
+            continue
+        if not name.isidentifier():
+            raise ValueError(f"מציין מקום לא נתמך: {{{name}}}")
+        names.append(name)
+        if spec and "{" in spec:
+            # מציין מקום מקונן בהגדרת הפורמט, למשל {price:{width}}
+            names.extend(_placeholders(spec)[0])
+        elif spec and spec[-1] in NUMERIC_TYPES:
+            numeric[name] = NUMERIC_TYPES[spec[-1]]
+    return names, has_literal, numeric
+
+
+def _format_error(error: Exception) -> ValueError:
+    """שגיאת מילוי כ-ValueError (build_prompts מוסיף לה את מספר השורה)"""
+    if isinstance(error, KeyError):
+        return ValueError(f"חסר ערך למציין המקום {{{error.args[0]}}}")
+    return ValueError(f"ערך לא מתאים לפורמט בתבנית: {error}")
+
+
+class ParametricTemplate:
+    """
+    תבנית אלמנטים עם מצייני מקום, מהודרת פעם אחת ומולאת משורות נתונים
+
+    ערך None (עמודה חסרה בשורת CSV קצרה, null ב-JSONL) נחשב ריק. שדה שכולו
+    מצייני מקום (למשל "{color}") שכל ערכיו ריקים מושמט מהפרומפט כמו
+    ב-create_basic_prompt; רק שדות כאלה מורכבים בנפרד בכל שורה. כשאין
+    כאלה, מילוי שורה הוא קריאה אחת ל-format_map. ערך מחרוזת למציין מקום
+    עם פורמט מספרי ({price:.2f}) מומר למספר לפני המילוי.
+    """
+
+    def __init__(self, elements: PromptElements, fields: Sequence[Tuple[str, str]] = DEFAULT_FIELDS,
+                 separator: str = ", ", quality: Sequence[str] = QUALITY_WORDS,
+                 defaults: Optional[Mapping[str, object]] = None):
+        """
+        Args:
+            elements: התבנית - ערכים עם מצייני מקום בתחביר str.format
+            fields, separator, quality: מפרט ההרכבה (כמו ב-PromptAssembler)
+            defaults: ערכי ברירת מחדל למצייני מקום שחסרים בשורה
+
+        Raises:
+            ValueError: מציין מקום לא תקין בתבנית
+        """
+        self.elements = elements
+        self.defaults = dict(defaults or {})
+        names = []
+        self._numeric: Dict[str, type] = {}
+        # חלקי הפרומפט: (מצייני המקום אם החלק עשוי להיות ריק, קידומת, מחרוזת
+        # פורמט); לחלק שאינו עשוי להיות ריק הקידומת כבר בתוך מחרוזת הפורמט
+        self._parts: List[Tuple[Tuple[str, ...], str, str]] = []
+        # שדות שכולם מצייני מקום -> שמותיהם (לדילוג על שדה שכל ערכיו ריקים)
+        self._optional_fields: Dict[str, Tuple[str, ...]] = {}
+        for name, prefix in fields:
+            text = getattr(elements, name)
+            if not text:
+                continue
+            field_names, has_literal, numeric = _placeholders(text)
+            names.extend(field_names)
+            self._numeric.update(numeric)
+            if field_names and not has_literal:
+                self._optional_fields[name] = tuple(field_names)
+                self._parts.append((tuple(field_names), prefix, text))
+            else:
+                self._parts.append(((), "", _escape(prefix) + text))
+        self._parts.extend(((), "", _escape(word)) for word in quality)
+        self.placeholders = tuple(dict.fromkeys(names))
+
+        self._separator = separator
+        self._optional = bool(self._optional_fields)
+        self._format = _escape(separator).join(template for _, _, template in self._parts)
+
+    @classmethod
+    def load(cls, filename: str, **kwargs) -> "ParametricTemplate":
+        """טעינת תבנית מקובץ JSON (הפורמט של save_elements_template) והידורה"""
+        return cls(load_elements_template(filename), **kwargs)
+
+    def _values(self, row: Mapping[str, object]) -> Mapping[str, object]:
+        """
+        ערכי המילוי לשורה: ברירות מחדל, None -> "" והמרה מספרית
+
+        Raises:
+            ValueError: ערך שאינו מספר למציין מקום עם פורמט מספרי
+        """
+        values = {**self.defaults, **row} if self.defaults else row
+        if None in values.values():
+            values = {name: "" if value is None else value for name, value in values.items()}
+        if not self._numeric:
+            return values
+        values = dict(values)
+        for name, convert in self._numeric.items():
+            value = values.get(name)
+            if isinstance(value, str) and value:
+                try:
+                    values[name] = convert(value)
+                except ValueError:
+                    raise ValueError(f"הערך {value!r} למציין המקום {{{name}}} אינו מספר") from None
+        return values
+
+    def fill(self, row: Mapping[str, object]) -> str:
+        """
+        הפרומפט לשורה אחת
+
+        Raises:
+            ValueError: לשורה חסר ערך למציין מקום (ואין ברירת מחדל), או ערך
+                שאינו מתאים להגדרת הפורמט
+        """
+        values = self._values(row)
+        try:
+            if not self._optional:
+                return self._format.format_map(values)
+            pieces = []
+            for names, prefix, template in self._parts:
+                # שדה שכל ערכיו ריקים מושמט בלי להפעיל את הגדרת הפורמט ({price:.2f})
+                if names and all(values[name] == "" for name in names):
+                    continue
+                value = template.format_map(values)
+                if value:
+                    pieces.append(prefix + value)
+            return self._separator.join(pieces)
+        except (KeyError, ValueError, TypeError) as e:
+            raise _format_error(e) from None
+
+    def fill_rows(self, rows: Iterable[Mapping[str, object]]) -> Iterator[str]:
+        """פרומפט לכל שורה ברצף (מילונים, csv.DictReader וכו')"""
+        if self._optional or self.defaults or self._numeric:
+            yield from map(self.fill, rows)
+            return
+        format_map = self._format.format_map
+        rows = iter(rows)
+        # במנות: מילוי ב-format_map ישירות; ערך None מופיע בפרומפט כ-"None",
+        # ורק פרומפטים כאלה (נדירים) ממולאים מחדש דרך fill
+        for chunk in iter(lambda: list(islice(rows, FILL_CHUNK)), []):
+            try:
+                prompts = list(map(format_map, chunk))
+            except (KeyError, ValueError, TypeError) as e:
+                raise _format_error(e) from None
+            if any(map(contains, prompts, repeat("None"))):
+                prompts = [self.fill(row) if "None" in prompt else prompt for row, prompt in zip(chunk, prompts)]
+            yield from prompts
+
+    def fill_elements(self, row: Mapping[str, object]) -> PromptElements:
+        """האלמנטים הממולאים לשורה (לשמירה או לעריכה)"""
+        values = self._values(row)
+        filled = {}
+        try:
+            for name, text in self.elements.__dict__.items():
+                names = self._optional_fields.get(name)
+                if names and all(values[placeholder] == "" for placeholder in names):
+                    filled[name] = ""
+                elif text:
+                    filled[name] = text.format_map(values)
+            return replace(self.elements, **filled)
+        except (KeyError, ValueError, TypeError) as e:
+            raise _format_error(e) from None
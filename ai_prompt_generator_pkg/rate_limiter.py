@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מתזמן בקשות ל-OpenAI - מגבלות קצב, מקביליות אדפטיבית ותור הוגן
+Request scheduler for OpenAI calls: RPM/TPM token buckets, AIMD adaptive
+concurrency driven by latency and 429/Retry-After, and fair queueing
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+
+@dataclass
+class RateLimits:
+    """מגבלות קצב לסוג בקשה אחד"""
+    requests_per_minute: float
+    tokens_per_minute: Optional[float] = None
+
+
+# ברירות מחדל שמרניות (רמת חשבון בסיסית); יש להתאים לחשבון בפועל
+DEFAULT_LIMITS = {
+    "chat": RateLimits(requests_per_minute=500, tokens_per_minute=10000),
+    "images": RateLimits(requests_per_minute=5),
+}
+
+# מזהה הקורא הנוכחי לצורך תור הוגן (ברירת מחדל: ה-thread או המשימה)
+_current_caller: contextvars.ContextVar = contextvars.ContextVar("prompt_scheduler_caller", default=None)
+
+
+class TokenBucket:
+    """דלי אסימונים שמתמלא ברציפות לפי קצב לדקה"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """כמה שניות לחכות עד שיהיו מספיק אסימונים (0 - אפשר עכשיו)"""
+        self._refill(now)
+        # בקשה גדולה מהקיבולת מותרת כשהדלי מלא, והדלי נכנס לחוב
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self.level -= amount
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class AIMDLimiter:
+    """
+    מגבלת מקביליות אדפטיבית (AIMD)
+
+    עלייה חיבורית לאחר כל הצלחה בזמן תגובה תקין, וירידה כפלית לאחר 429
+    או כשזמן התגובה חורג מהבסיס לאורך זמן. זמן התגובה מוחלק (EWMA) ומושווה
+    למינימום של הערך המוחלק בחלון של window הדגימות האחרונות, כך ששונות
+    רגילה בזמני התגובה אינה מורידה את המגבלה, והבסיס מתעדכן כשהשירות
+    עצמו מאט.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64,
+                 backoff: float = 0.5, latency_tolerance: float = 2.0,
+                 smoothing: float = 0.1, window: int = 200, patience: int = 10):
+        """
+        Args:
+            smoothing: משקל הדגימה החדשה בממוצע המוחלק
+            window: מספר הדגימות שבהן נמדד זמן התגובה הבסיסי (מינימום בחלון)
+            patience: מספר דגימות רצופות מעל הסף לפני ירידה
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.window = window
+        self.patience = patience
+        self.smoothed_latency: Optional[float] = None
+        self._samples = 0
+        self._inflated = 0
+        # תור מונוטוני (מספר דגימה, ערך מוחלק) למינימום בחלון
+        self._minima: deque = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def base_latency(self) -> Optional[float]:
+        """זמן התגובה הבסיסי - המינימום המוחלק בחלון"""
+        return self._minima[0][1] if self._minima else None
+
+    def on_success(self, latency: float, now: float):
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+        self._samples += 1
+        while self._minima and self._minima[-1][1] >= self.smoothed_latency:
+            self._minima.pop()
+        self._minima.append((self._samples, self.smoothed_latency))
+        if self._minima[0][0] <= self._samples - self.window:
+            self._minima.popleft()
+
+        if self.smoothed_latency > self.base_latency * self.latency_tolerance:
+            self._inflated += 1
+            if self._inflated >= self.patience:
+                self._decrease(now, latency)
+            return
+        self._inflated = 0
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_overload(self, now: float, latency: float):
+        self._decrease(now, latency)
+
+    def _decrease(self, now: float, latency: float):
+        # ירידה אחת לכל "סבב" - פרץ של שגיאות לא מרסק את המגבלה למינימום
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.backoff)
+
+
+class _Ticket:
+    """כרטיס המתנה/הרשאה לבקשה אחת"""
+    __slots__ = ("kind", "tokens", "caller", "started")
+
+    def __init__(self, kind: str, tokens: float, caller: Hashable):
+        self.kind = kind
+        self.tokens = tokens
+        self.caller = caller
+        self.started = 0.0
+
+
+class _Lane:
+    """מצב התזמון של סוג בקשה אחד (chat / images)"""
+
+    def __init__(self, limits: RateLimits, limiter: AIMDLimiter):
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.tokens = TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute else None
+        self.limiter = limiter
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.queues: Dict[Hashable, deque] = {}
+        self.order: deque = deque()
+
+    def head(self) -> Optional[_Ticket]:
+        """הכרטיס הבא לשירות - סבב הוגן בין הקוראים"""
+        if not self.order:
+            return None
+        return self.queues[self.order[0]][0]
+
+    def enqueue(self, ticket: _Ticket):
+        queue = self.queues.get(ticket.caller)
+        if queue is None:
+            queue = self.queues[ticket.caller] = deque()
+            self.order.append(ticket.caller)
+        queue.append(ticket)
+
+    def dequeue(self, ticket: _Ticket):
+        queue = self.queues[ticket.caller]
+        queue.remove(ticket)
+        if self.order[0] == ticket.caller:
+            self.order.popleft()
+            if queue:
+                # הקורא עובר לסוף הסבב
+                self.order.append(ticket.caller)
+        elif not queue:
+            self.order.remove(ticket.caller)
+        if not queue:
+            del self.queues[ticket.caller]
+
+
+class RequestScheduler:
+    """
+    מתזמן משותף לכל קריאות ה-API
+
+    כל בקשה עוברת דרך acquire/release: המתזמן אוכף תקציבי בקשות וטוקנים לדקה,
+    מגביל את מספר הבקשות במקביל לפי AIMD, מכבד Retry-After ומשרת קוראים שונים
+    בסבב הוגן כך שקורא אחד עם הרבה בקשות לא מרעיב את האחרים.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, RateLimits]] = None, initial_concurrency: int = 4,
+                 max_concurrency: int = 64, latency_tolerance: float = 2.0):
+        """
+        Args:
+            limits: מגבלות קצב לפי סוג בקשה ("chat", "images")
+            initial_concurrency: מגבלת מקביליות התחלתית לכל סוג
+            max_concurrency: תקרת המקביליות
+            latency_tolerance: פי כמה מזמן התגובה הבסיסי נחשב עומס
+        """
+        limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self._cond = threading.Condition()
+        self._lanes = {
+            kind: _Lane(kind_limits, AIMDLimiter(initial_concurrency, maximum=max_concurrency,
+                                                 latency_tolerance=latency_tolerance))
+            for kind, kind_limits in limits.items()
+        }
+
+    @staticmethod
+    @contextmanager
+    def as_caller(caller: Hashable):
+        """שיוך הבקשות בבלוק לקורא מסוים (משתמש, לקוח, עבודה) לצורך תור הוגן"""
+        token = _current_caller.set(caller)
+        try:
+            yield
+        finally:
+            _current_caller.reset(token)
+
+    def _try_grant(self, lane: _Lane, ticket: _Ticket, now: float) -> Optional[float]:
+        """ניסיון להעניק הרשאה; מחזיר None אם הוענקה, אחרת זמן המתנה מוצע"""
+        if lane.head() is not ticket:
+            return 0.05
+        delay = max(lane.blocked_until - now, lane.requests.delay(1, now))
+        if lane.tokens is not None:
+            delay = max(delay, lane.tokens.delay(ticket.tokens, now))
+        if delay > 0:
+            return delay
+        if lane.in_flight >= int(lane.limiter.limit):
+            return 0.05
+
+        lane.requests.consume(1)
+        if lane.tokens is not None:
+            lane.tokens.consume(ticket.tokens)
+        lane.in_flight += 1
+        lane.dequeue(ticket)
+        ticket.started = now
+        return None
+
+    def acquire(self, kind: str, tokens: float = 0, caller: Optional[Hashable] = None) -> _Ticket:
+        """המתנה חוסמת עד שמותר לשלוח בקשה"""
+        if caller is None:
+            caller = _current_caller.get() or threading.get_ident()
+        lane = self._lanes[kind]
+        ticket = _Ticket(kind, tokens, caller)
+        with self._cond:
+            lane.enqueue(ticket)
+            try:
+                while True:
+                    delay = self._try_grant(lane, ticket, time.monotonic())
+                    if delay is None:
+                        self._cond.notify_all()
+                        return ticket
+                    self._cond.wait(timeout=delay)
+            except BaseException:
+                lane.dequeue(ticket)
+                self._cond.notify_all()
+                raise
+
+    async def acquire_async(self, kind: str, tokens: float = 0, caller: Optional[Hashable] = None) -> _Ticket:
+        """המתנה אסינכרונית עד שמותר לשלוח בקשה"""
+        # asyncio (ואיתו ssl ו-socket) נטען רק בשימוש האסינכרוני
+        import asyncio
+
+        if caller is None:
+            caller = _current_caller.get() or id(asyncio.current_task())
+        lane = self._lanes[kind]
+        ticket = _Ticket(kind, tokens, caller)
+        with self._cond:
+            lane.enqueue(ticket)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_grant(lane, ticket, time.monotonic())
+                    if delay is None:
+                        self._cond.notify_all()
+                        return ticket
+                await asyncio.sleep(min(delay, 0.05))
+        except asyncio.CancelledError:
+            with self._cond:
+                lane.dequeue(ticket)
+                self._cond.notify_all()
+            raise
+
+    def release(self, ticket: _Ticket, error: Optional[BaseException] = None,
+                used_tokens: Optional[float] = None):
+        """
+        סיום בקשה ועדכון המתזמן בתוצאה
+
+        Args:
+            ticket: הכרטיס שהתקבל מ-acquire
+            error: החריגה אם הבקשה נכשלה
+            used_tokens: מספר הטוקנים שנוצלו בפועל (להחזרת העודף לתקציב)
+        """
+        lane = self._lanes[ticket.kind]
+        now = time.monotonic()
+        latency = now - ticket.started
+        with self._cond:
+            lane.in_flight -= 1
+            if error is not None and getattr(error, "status_code", None) == 429:
+                lane.limiter.on_overload(now, latency)
+                retry_after = retry_after_seconds(error)
+                if retry_after:
+                    lane.blocked_until = max(lane.blocked_until, now + retry_after)
+            elif error is None:
+                lane.limiter.on_success(latency, now)
+                if used_tokens is not None and lane.tokens is not None and used_tokens < ticket.tokens:
+                    lane.tokens.refund(ticket.tokens - used_tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind: str, tokens: float = 0, caller: Optional[Hashable] = None):
+        """acquire/release כמנהל הקשר"""
+        ticket = self.acquire(kind, tokens, caller)
+        try:
+            yield ticket
+        except BaseException as e:
+            self.release(ticket, error=e)
+            raise
+        self.release(ticket)
+
+    @asynccontextmanager
+    async def slot_async(self, kind: str, tokens: float = 0, caller: Optional[Hashable] = None):
+        """acquire_async/release כמנהל הקשר אסינכרוני (אותו דיווח הצלחה/כישלון כמו slot)"""
+        ticket = await self.acquire_async(kind, tokens, caller)
+        try:
+            yield ticket
+        except BaseException as e:
+            self.release(ticket, error=e)
+            raise
+        self.release(ticket)
+
+    def concurrency_limit(self, kind: str) -> int:
+        """מגבלת המקביליות הנוכחית לסוג בקשה"""
+        with self._cond:
+            return int(self._lanes[kind].limiter.limit)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """קריאת כותרות Retry-After / retry-after-ms מתשובת שגיאה, אם קיימות"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ניסיונות חוזרים, מפסק זרם וחריגות טיפוסיות לקריאות API
+Retry with exponential backoff and jitter, circuit breaker and typed errors
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from rate_limiter import retry_after_seconds
+
+
+class PromptGeneratorError(Exception):
+    """שגיאת בסיס של המחולל"""
+
+
+class APIRequestError(PromptGeneratorError):
+    """קריאת API נכשלה (שגיאה שאינה זמנית, או שכל הניסיונות החוזרים מוצו)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, attempts: int = 1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.attempts = attempts
+
+
+class CircuitOpenError(PromptGeneratorError):
+    """המפסק פתוח - הקריאה נדחתה מיד בלי לפנות ל-API"""
+
+    def __init__(self, message: str, retry_in: float):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class DeadlineExceededError(PromptGeneratorError):
+    """פעולה מרובת בקשות חרגה מהזמן שהוקצב לה; התוצאות שהושלמו זמינות ב-partial"""
+
+    def __init__(self, message: str, partial: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.partial = partial or {}
+
+
+# קודי HTTP שמצביעים על תקלה זמנית
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """האם השגיאה זמנית ושווה ניסיון חוזר (חיבור, timeout, 429, 5xx)"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    # שגיאות חיבור/timeout של ה-SDK אינן נושאות קוד סטטוס
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+@dataclass
+class RetryPolicy:
+    """מדיניות ניסיונות חוזרים עם backoff מעריכי ו-jitter מלא"""
+    max_retries: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """זמן ההמתנה לפני הניסיון הבא (attempt מתחיל ב-1); Retry-After גובר"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    מפסק זרם לפי שיעור שגיאות
+
+    כששיעור הכשלים הזמניים בחלון הקריאות האחרון עובר את הסף, המפסק נפתח
+    וכל קריאה נכשלת מיד. לאחר זמן הצינון עוברת קריאת בדיקה אחת; הצלחה סוגרת
+    את המפסק וכישלון פותח אותו מחדש.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: float = 0.5, window: int = 20, min_calls: int = 5,
+                 cooldown: float = 30.0):
+        """
+        Args:
+            failure_threshold: שיעור כשלים (0-1) שפותח את המפסק
+            window: מספר הקריאות האחרונות שנבדקות
+            min_calls: מספר קריאות מזערי בחלון לפני שהמפסק יכול להיפתח
+            cooldown: שניות עד קריאת הבדיקה
+        """
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """בדיקה לפני קריאה - זורק CircuitOpenError אם המפסק פתוח"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.cooldown - now
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            # קריאת בדיקה שלא דיווחה תוך זמן הצינון (למשל בוטלה) מפנה מקום לבדיקה חדשה
+            if self.state == self.HALF_OPEN and (
+                    not self._probe_in_flight or now - self._probe_started > self.cooldown):
+                self._probe_in_flight = True
+                self._probe_started = now
+                return
+            raise CircuitOpenError("השירות אינו זמין כרגע (מפסק פתוח)", max(0.0, remaining))
+
+    def record_success(self):
+        with self._lock:
+            self._results.append(True)
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._results.clear()
+                self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._results.append(False)
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            failures = self._results.count(False)
+            if (len(self._results) >= self.min_calls
+                    and failures / len(self._results) >= self.failure_threshold):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+
+def _on_error(error: BaseException, attempt: int, policy: RetryPolicy,
+              breaker: Optional[CircuitBreaker]) -> float:
+    """רישום הכישלון; מחזיר זמן המתנה לניסיון נוסף, או זורק שגיאה טיפוסית"""
+    retryable = is_retryable(error)
+    if breaker is not None:
+        # שגיאות לקוח (בקשה שגויה, הרשאות) אינן מעידות על תקלה בשירות
+        if retryable:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    if not retryable or attempt > policy.max_retries:
+        raise APIRequestError(str(error), getattr(error, "status_code", None), attempt) from error
+    return policy.delay(attempt, error)
+
+
+def call_with_retry(fn: Callable[[], Any], policy: RetryPolicy,
+                    breaker: Optional[CircuitBreaker] = None) -> Any:
+    """הרצת fn עם ניסיונות חוזרים ומפסק זרם"""
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = fn()
+        except PromptGeneratorError:
+            raise
+        except Exception as e:
+            time.sleep(_on_error(e, attempt, policy, breaker))
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+async def call_with_retry_async(fn: Callable[[], Awaitable[Any]], policy: RetryPolicy,
+                                breaker: Optional[CircuitBreaker] = None) -> Any:
+    """גרסה אסינכרונית של call_with_retry"""
+    # asyncio נטען רק בשימוש האסינכרוני (ראו rate_limiter.acquire_async)
+    import asyncio
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = await fn()
+        except PromptGeneratorError:
+            raise
+        except Exception as e:
+            await asyncio.sleep(_on_error(e, attempt, policy, breaker))
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
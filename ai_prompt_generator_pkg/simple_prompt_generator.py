@@ -7,75 +7,15 @@ Simple Prompt Generator for AI Images
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-import json
-import os
-from enum import Enum
-from dataclasses import dataclass
 
-
-# הגדרת מבנה הנתונים למסגרת 8 האלמנטים
-@dataclass
-class PromptElements:
-    """מסגרת 8 האלמנטים ליצירת פרומפט מקצועי"""
-
-    subject: str = ""  # נושא - מה/מי בתמונה
-    composition: str = ""  # קומפוזיציה - איך מסודר
-    style: str = ""  # סגנון - איזה מראה
-    lighting: str = ""  # תאורה - איזה אור
-    color: str = ""  # צבע - אילו צבעים
-    mood: str = ""  # מצב רוח - איזו תחושה
-    details: str = ""  # פרטים - מה לכלול/להשמיט
-    context: str = ""  # הקשר - למה זה מיועד
-
-
-class StyleCategory(Enum):
-    """קטגוריות סגנונות זמינות"""
-
-    REALISTIC = "realistic"
-    CARTOON = "cartoon"
-    WATERCOLOR = "watercolor"
-    OIL_PAINTING = "oil painting"
-    SKETCH = "sketch"
-    RENDER_3D = "3D render"
-    MINIMALIST = "minimalist"
-    VINTAGE = "vintage"
-    MODERN = "modern"
-    PHOTOGRAPHY = "professional photography"
-
-
-class LightingType(Enum):
-    """סוגי תאורה זמינים"""
-
-    SOFT_MORNING = "soft morning light"
-    DRAMATIC_SUNSET = "dramatic sunset"
-    STUDIO = "studio lighting"
-    NATURAL_DAYLIGHT = "natural daylight"
-    MOODY_SHADOWS = "moody shadows"
-    BRIGHT_AIRY = "bright and airy"
-
-
-class MoodType(Enum):
-    """סוגי מצבי רוח"""
-
-    ENERGETIC = "energetic"
-    CALM = "calm"
-    MYSTERIOUS = "mysterious"
-    PROFESSIONAL = "professional"
-    PLAYFUL = "playful"
-    ELEGANT = "elegant"
-    RUSTIC = "rustic"
-    FUTURISTIC = "futuristic"
-
-
-class CompositionType(Enum):
-    """סוגי קומפוזיציה"""
-
-    CLOSE_UP = "close-up portrait"
-    WIDE_ANGLE = "wide angle"
-    BIRDS_EYE = "bird's eye view"
-    LOW_ANGLE = "low angle"
-    SYMMETRICAL = "symmetrical"
-    RULE_OF_THIRDS = "rule of thirds"
+import prompt_core
+from prompt_core import (
+    CompositionType,
+    LightingType,
+    MoodType,
+    PromptElements,
+    StyleCategory,
+)
 
 
 class SimplePromptGeneratorGUI:
@@ -348,44 +288,7 @@ class SimplePromptGeneratorGUI:
 
     def create_basic_prompt(self, elements):
         """יצירת פרומפט בסיסי מאלמנטים"""
-        prompt_parts = []
-
-        # נושא (חובה)
-        if elements.subject:
-            prompt_parts.append(elements.subject)
-
-        # קומפוזיציה
-        if elements.composition:
-            prompt_parts.append(f"composition: {elements.composition}")
-
-        # סגנון
-        if elements.style:
-            prompt_parts.append(f"style: {elements.style}")
-
-        # תאורה
-        if elements.lighting:
-            prompt_parts.append(f"lighting: {elements.lighting}")
-
-        # צבעים
-        if elements.color:
-            prompt_parts.append(f"colors: {elements.color}")
-
-        # מצב רוח
-        if elements.mood:
-            prompt_parts.append(f"mood: {elements.mood}")
-
-        # פרטים נוספים
-        if elements.details:
-            prompt_parts.append(f"details: {elements.details}")
-
-        # הקשר
-        if elements.context:
-            prompt_parts.append(f"for: {elements.context}")
-
-        # הוספת משפרי איכות
-        prompt_parts.extend(["high quality", "detailed", "professional"])
-
-        return ", ".join(prompt_parts)
+        return prompt_core.create_basic_prompt(elements)
 
     def generate_prompt(self):
         """יצירת פרומפט"""
@@ -423,8 +326,7 @@ class SimplePromptGeneratorGUI:
         if filename:
             try:
                 elements = self.get_elements()
-                with open(filename, "w", encoding="utf-8") as f:
-                    json.dump(elements.__dict__, f, ensure_ascii=False, indent=2)
+                prompt_core.save_elements_template(elements, filename)
 
                 messagebox.showinfo("הצלחה", f"התבנית נשמרה ב: {filename}")
             except Exception as e:
@@ -438,9 +340,7 @@ class SimplePromptGeneratorGUI:
 
         if filename:
             try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    elements = PromptElements(**data)
+                elements = prompt_core.load_elements_template(filename)
 
                 self.set_elements(elements)
                 messagebox.showinfo("הצלחה", "התבנית נטענה בהצלחה")
@@ -456,41 +356,8 @@ class SimplePromptGeneratorGUI:
 
     def load_example(self, example_type):
         """טעינת דוגמאות מהירות"""
-        examples = {
-            "cat": PromptElements(
-                subject="חתול פרסי לבן",
-                composition="close-up portrait",
-                style="professional photography",
-                lighting="soft morning light",
-                color="גוונים חמים",
-                mood="calm",
-                details="עיניים כחולות, פרווה רכה",
-                context="צילום מקצועי",
-            ),
-            "logo": PromptElements(
-                subject="לוגו מינימליסטי",
-                composition="symmetrical",
-                style="minimalist",
-                lighting="clean lighting",
-                color="כחול וצבעי אמון",
-                mood="professional",
-                details="פשוט וזכיר",
-                context="מיתוג עסקי",
-            ),
-            "landscape": PromptElements(
-                subject="נוף הרים עם אגם",
-                composition="wide angle",
-                style="realistic",
-                lighting="dramatic sunset",
-                color="צבעי זהב וכתום",
-                mood="calm",
-                details="השתקפויות במים",
-                context="צילום טבע",
-            ),
-        }
-
-        if example_type in examples:
-            self.set_elements(examples[example_type])
+        if example_type in prompt_core.EXAMPLES:
+            self.set_elements(prompt_core.get_example(example_type))
             self.status_var.set(f"נטענה דוגמא: {example_type}")
 
 
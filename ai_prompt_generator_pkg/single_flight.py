@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+איחוד בקשות זהות שרצות במקביל לבקשה אחת
+Single-flight coalescing of identical in-flight calls
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    איחוד קריאות זהות בין threads
+
+    הקורא הראשון למפתח מבצע את הפעולה; קוראים נוספים עם אותו מפתח שמגיעים
+    בזמן שהיא רצה ממתינים לאותה תוצאה (או חריגה) במקום לבצע אותה שוב.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """ביצוע fn פעם אחת לכל המפתחות הזהים שבטיפול כרגע"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """מספר המפתחות שבטיפול כרגע"""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """איחוד קריאות זהות בין coroutines על אותה לולאת אירועים"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """הרצת הקורוטינה fn פעם אחת לכל המפתחות הזהים שבטיפול כרגע"""
+        # asyncio נטען רק בשימוש האסינכרוני - יצירת המחולל אינה מושכת אותו
+        import asyncio
+
+        # משימה שייכת ללולאה שיצרה אותה - לכן הלולאה היא חלק מהמפתח
+        loop_key = (id(asyncio.get_running_loop()), key)
+        task = self._calls.get(loop_key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[loop_key] = task
+            task.add_done_callback(lambda _: self._calls.pop(loop_key, None))
+
+        # shield - ביטול של ממתין אחד לא מבטל את הבקשה עבור האחרים
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """מספר המפתחות שבטיפול כרגע"""
+        return len(self._calls)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שמירת תוצאות מדידה והשוואה לקו בסיס שמור
+Benchmark results I/O and regression check against a stored baseline
+"""
+
+import json
+import platform
+import sys
+from typing import Dict, List, Optional
+
+
+def environment() -> Dict[str, str]:
+    """פרטי הסביבה שנמדדה - מדידות ממכונות שונות אינן ברות השוואה"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]], extra: Optional[dict] = None):
+    """שמירת תוצאות (שם מדידה -> מדדים) לקובץ JSON"""
+    payload = {"environment": environment(), "results": results}
+    payload.update(extra or {})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Dict[str, float]]:
+    """טעינת התוצאות מקובץ שנשמר ב-save_results"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            metrics: Dict[str, bool], threshold: float, min_delta: float = 0.0) -> List[str]:
+    """
+    השוואת תוצאות לקו הבסיס
+
+    Args:
+        results: התוצאות הנוכחיות
+        baseline: קו הבסיס
+        metrics: המדדים להשוואה -> True אם ערך גבוה יותר טוב (ops/sec), False אם נמוך (זמן)
+        threshold: שינוי יחסי מרבי מותר (0.2 = 20%)
+        min_delta: שינוי מוחלט מזערי שנחשב נסיגה (סינון רעש במדידות קטנות)
+
+    Returns:
+        רשימת תיאורי הנסיגות (ריקה אם אין)
+    """
+    regressions = []
+    for name, values in sorted(results.items()):
+        for metric, higher_is_better in metrics.items():
+            current = values.get(metric)
+            previous = baseline.get(name, {}).get(metric)
+            if current is None or not previous:
+                continue
+            change = (previous - current) if higher_is_better else (current - previous)
+            if change > previous * threshold and change > min_delta:
+                regressions.append(
+                    f"{name} {metric}: {previous:.6g} -> {current:.6g} "
+                    f"({change / previous:+.0%} worse, threshold {threshold:.0%})")
+    return regressions
+
+
+def report_regressions(regressions: List[str]) -> int:
+    """הדפסת הנסיגות; מחזיר קוד יציאה (1 אם נמצאו)"""
+    if not regressions:
+        print("no regressions against baseline")
+        return 0
+    print("regressions against baseline:", file=sys.stderr)
+    for line in regressions:
+        print(f"  {line}", file=sys.stderr)
+    return 1
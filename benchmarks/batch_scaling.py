@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת קנה המידה של עיבוד האצווה המקבילי לפי מספר התהליכים
+Throughput scaling of the sharded batch builder
+
+יוצר קובץ קטלוג JSONL סינתטי, מריץ את run_batch הסדרתי ואת
+run_parallel_batch עם 1, 2, 4 ... תהליכים (עד מספר הליבות), ומדווח שורות
+לשנייה, האצה ויעילות (האצה / מספר תהליכים).
+
+שימוש:
+    python benchmarks/batch_scaling.py
+    python benchmarks/batch_scaling.py --rows 2000000 --workers 1,2,4,8 --output scaling.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+from baseline import save_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ai_prompt_generator_pkg"))
+
+import prompt_batch  # noqa: E402
+from parallel_batch import run_parallel_batch  # noqa: E402
+from prompt_core import LightingType, MoodType, StyleCategory  # noqa: E402
+
+SUBJECTS = ["leather bag", "ceramic mug", "running shoe", "כיסא עץ", "מנורת שולחן", "wrist watch"]
+
+
+def write_catalog(path: str, rows: int, seed: int = 0):
+    """קטלוג סינתטי: נושא, סגנון, תאורה ומצב רוח אקראיים, ומזהה לחלק מהשורות"""
+    rnd = random.Random(seed)
+    styles = [s.value for s in StyleCategory]
+    lights = [l.value for l in LightingType]
+    moods = [m.value for m in MoodType]
+    with open(path, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        for i in range(rows):
+            row = {"subject": f"{rnd.choice(SUBJECTS)} {i}", "style": rnd.choice(styles),
+                   "lighting": rnd.choice(lights), "mood": rnd.choice(moods)}
+            if i % 2:
+                row["id"] = f"sku-{i}"
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def default_workers() -> List[int]:
+    cores = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="קנה מידה של עיבוד אצווה מקבילי")
+    parser.add_argument("--rows", type=int, default=500_000, help="מספר שורות בקטלוג הסינתטי")
+    parser.add_argument("--workers", help="רשימת מספרי תהליכים מופרדת בפסיקים (ברירת מחדל: חזקות 2 עד מספר הליבות)")
+    parser.add_argument("--output", help="שמירת התוצאות לקובץ JSON")
+    args = parser.parse_args()
+    worker_counts = [int(n) for n in args.workers.split(",")] if args.workers else default_workers()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        catalog = os.path.join(tmpdir, "catalog.jsonl")
+        output = os.path.join(tmpdir, "prompts.jsonl")
+        write_catalog(catalog, args.rows)
+
+        started = time.perf_counter()
+        with prompt_batch.open_input(catalog) as src, prompt_batch.open_output(output) as dst:
+            prompt_batch.run_batch(src, dst)
+        serial = time.perf_counter() - started
+        results["serial"] = {"seconds": round(serial, 3), "rows_per_sec": round(args.rows / serial)}
+
+        for workers in worker_counts:
+            started = time.perf_counter()
+            with prompt_batch.open_output(output) as dst:
+                run_parallel_batch(catalog, dst, workers=workers, tmpdir=tmpdir)
+            elapsed = time.perf_counter() - started
+            speedup = serial / elapsed
+            results[f"workers={workers}"] = {"seconds": round(elapsed, 3), "rows_per_sec": round(args.rows / elapsed),
+                                             "speedup": round(speedup, 2), "efficiency": round(speedup / workers, 2)}
+
+    print(f"{'run':<14}{'seconds':>10}{'rows/sec':>14}{'speedup':>10}{'efficiency':>12}")
+    for name, values in results.items():
+        print(f"{name:<14}{values['seconds']:>10.2f}{values['rows_per_sec']:>14,}"
+              f"{values.get('speedup', 1.0):>10.2f}{values.get('efficiency', 1.0):>12.2f}")
+    if args.output:
+        save_results(args.output, results, {"rows": args.rows, "cpu_count": os.cpu_count()})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מיקרו-מדידות לנתיבים החמים של הרכבת פרומפטים ותבניות
+Microbenchmarks for prompt composition and template I/O hot paths
+
+נמדדים create_basic_prompt, save_elements_template / load_elements_template
+ו-_parse_elements_from_text, על פני גדלי קלט, עברית ואנגלית, ואלמנטים
+דלילים (נושא וסגנון בלבד) או מלאים. לכל מקרה מדווחים פעולות לשנייה
+והקצאות זיכרון (tracemalloc) לפעולה, ומשווים לקו בסיס שמור.
+
+create_basic_prompt נמדד לצד מימוש הייחוס (שרשרת ה-if הקודמת) על 1,000
+גרסאות שונות של האלמנטים (ערך ייחודי בכל שדה), וגם בהרכבה
+בכמות על קטלוג של 1,000 שורות (create_basic_prompts), עם ההאצה ביחס אליו:
+קטלוג עם ערכי enum חוזרים, וקטלוג שבו הצבע והפרטים ייחודיים לכל שורה.
+מילוי תבנית פרמטרית מהודרת נמדד על אותו קטלוג.
+
+שימוש:
+    python benchmarks/hotpaths.py
+    python benchmarks/hotpaths.py --filter create_basic_prompt --output run.json
+    python benchmarks/hotpaths.py --update-baseline
+"""
+
+import argparse
+import gc
+import itertools
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from dataclasses import fields, replace
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from baseline import compare, load_results, report_regressions, save_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ai_prompt_generator_pkg"))
+
+import prompt_core  # noqa: E402
+from prompt_core import PromptElements  # noqa: E402
+from prompt_templates import ParametricTemplate  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotpaths_baseline.json")
+
+# מדד -> האם ערך גבוה יותר טוב; מדדי מהירות רועשים יותר ומושווים בסף נפרד
+SPEED_METRICS = {"ops_per_sec": True}
+MEMORY_METRICS = {"retained_bytes_per_op": False, "peak_bytes": False}
+
+WORDS = {
+    "en": ["golden", "retriever", "puppy", "sitting", "on", "green", "grass", "soft", "light"],
+    "he": ["גור", "גולדן", "רטריבר", "יושב", "על", "דשא", "ירוק", "אור", "רך"],
+}
+
+# גודל -> מספר מילים בכל שדה
+SIZES = {"small": 3, "medium": 20, "large": 200}
+
+# שדות ה-PromptElements ותוויות השורות ש-_parse_elements_from_text מזהה
+FIELD_LABELS = {
+    "subject": "subject", "composition": "composition", "style": "style", "lighting": "lighting",
+    "color": "color", "mood": "mood", "details": "details", "context": "context",
+}
+
+
+def make_elements(lang: str, size: str, full: bool) -> PromptElements:
+    """אלמנטים לדוגמה: מלאים (כל 8 השדות) או דלילים (נושא וסגנון)"""
+    words = WORDS[lang]
+    count = SIZES[size]
+    text = " ".join(words[i % len(words)] for i in range(count))
+    names = [f.name for f in fields(PromptElements)] if full else ["subject", "style"]
+    return PromptElements(**{name: text for name in names})
+
+
+def make_variants(elements: PromptElements, count: int = 1000) -> List[PromptElements]:
+    """גרסאות שונות של האלמנטים - מספר ייחודי בסוף כל שדה שאינו ריק"""
+    return [replace(elements, **{name: f"{value} {i}" for name, value in elements.__dict__.items() if value})
+            for i in range(count)]
+
+
+def ifchain_create_basic_prompt(elements: PromptElements) -> str:
+    """מימוש הייחוס - הרכבה שדה אחר שדה, להשוואה מול PromptAssembler"""
+    prompt_parts = []
+    if elements.subject:
+        prompt_parts.append(elements.subject)
+    if elements.composition:
+        prompt_parts.append(f"composition: {elements.composition}")
+    if elements.style:
+        prompt_parts.append(f"style: {elements.style}")
+    if elements.lighting:
+        prompt_parts.append(f"lighting: {elements.lighting}")
+    if elements.color:
+        prompt_parts.append(f"colors: {elements.color}")
+    if elements.mood:
+        prompt_parts.append(f"mood: {elements.mood}")
+    if elements.details:
+        prompt_parts.append(f"details: {elements.details}")
+    if elements.context:
+        prompt_parts.append(f"for: {elements.context}")
+    prompt_parts.extend(["high quality", "detailed", "professional"])
+    return ", ".join(prompt_parts)
+
+
+def make_catalog(rows: int = 1000) -> List[PromptElements]:
+    """קטלוג: נושא ייחודי לכל שורה, ערכי enum חוזרים והקשר קבוע"""
+    styles = list(prompt_core.StyleCategory)
+    lights = list(prompt_core.LightingType)
+    moods = list(prompt_core.MoodType)
+    return [PromptElements(subject=f"product {i}", style=styles[i % len(styles)].value,
+                           lighting=lights[i % len(lights)].value, mood=moods[i % len(moods)].value,
+                           context="online catalog") for i in range(rows)]
+
+
+def make_unique_catalog(rows: int = 50_000, batch: int = 1000) -> List[List[PromptElements]]:
+    """
+    קטלוג עם טקסט חופשי ייחודי (צבע ופרטים) בכל שורה, במנות של batch שורות
+
+    כל קריאה במדידה מקבלת את המנה הבאה, כך שערכים אינם חוזרים בין קריאות.
+    """
+    catalog = make_catalog(rows)
+    for i, element in enumerate(catalog):
+        element.color = f"warm tones {i}"
+        element.details = f"hand stitched seams, brass buckle, item {i}"
+    return [catalog[start:start + batch] for start in range(0, rows, batch)]
+
+
+def make_description(elements: PromptElements) -> str:
+    """טקסט חופשי בפורמט "שדה: ערך" לפענוח (כמו תשובת מודל שאינה JSON)"""
+    return "\n".join(f"{FIELD_LABELS[name]}: {value}"
+                     for name, value in elements.__dict__.items() if value)
+
+
+def cases(tmpdir: str) -> Iterator[Tuple[str, Callable[[], object]]]:
+    """כל המקרים: שם -> פונקציה ללא ארגומנטים"""
+    # ייבוא המחולל רק לצורך _parse_elements_from_text; הלקוח אינו נוצר
+    from ai_prompt_generator import AIImagePromptGenerator
+    generator = AIImagePromptGenerator(api_key="benchmark")
+
+    for lang in WORDS:
+        for size in SIZES:
+            for density in ("sparse", "full"):
+                elements = make_elements(lang, size, density == "full")
+                suffix = f"{lang}/{size}/{density}"
+                path = os.path.join(tmpdir, f"{lang}_{size}_{density}.json")
+                prompt_core.save_elements_template(elements, path)
+                description = make_description(elements)
+
+                # כל קריאה מקבלת את הגרסה הבאה, כך שאותם אלמנטים אינם חוזרים ברצף
+                variants = make_variants(elements)
+                yield f"create_basic_prompt/{suffix}", \
+                    lambda v=itertools.cycle(variants): prompt_core.create_basic_prompt(next(v))
+                yield f"ifchain_create_basic_prompt/{suffix}", \
+                    lambda v=itertools.cycle(variants): ifchain_create_basic_prompt(next(v))
+                yield f"save_elements_template/{suffix}", \
+                    lambda e=elements, p=path: prompt_core.save_elements_template(e, p)
+                yield f"load_elements_template/{suffix}", lambda p=path: prompt_core.load_elements_template(p)
+                yield f"parse_elements_from_text/{suffix}", \
+                    lambda d=description: generator._parse_elements_from_text(d)
+
+    catalog = make_catalog()
+    yield "create_basic_prompts/catalog", lambda: prompt_core.create_basic_prompts(catalog)
+    yield "ifchain_create_basic_prompt/catalog", lambda: list(map(ifchain_create_basic_prompt, catalog))
+
+    batches = make_unique_catalog()
+    assembled, reference = itertools.cycle(batches), itertools.cycle(batches)
+    yield "create_basic_prompts/catalog_unique", lambda: prompt_core.create_basic_prompts(next(assembled))
+    yield "ifchain_create_basic_prompt/catalog_unique", \
+        lambda: list(map(ifchain_create_basic_prompt, next(reference)))
+
+    template = ParametricTemplate(PromptElements(subject="{product} in {color}", style="professional photography",
+                                                 lighting="studio lighting", context="online catalog"))
+    rows = [{"product": element.subject, "color": element.style} for element in catalog]
+    yield "parametric_template_fill/catalog", lambda: list(template.fill_rows(rows))
+
+
+def measure_speed(fn: Callable[[], object], repeat: int, min_time: float) -> float:
+    """פעולות לשנייה - הטובה מבין כמה חזרות (הפחות מושפעת מרעש)"""
+    timer = timeit.Timer(fn)
+    # כיול קצר של מספר הקריאות כך שכל חזרה תימשך בערך min_time
+    loops, elapsed = 1, timer.timeit(1)
+    while elapsed < 0.01:
+        loops *= 10
+        elapsed = timer.timeit(loops)
+    loops = max(1, int(loops * min_time / elapsed))
+    best = min(timer.repeat(repeat=repeat, number=loops))
+    return loops / best
+
+
+def measure_memory(fn: Callable[[], object], calls: int = 200) -> Dict[str, float]:
+    """
+    הקצאות לפעולה לפי tracemalloc
+
+    retained_bytes_per_op: זיכרון שנשאר מוקצה אחרי קריאה (התוצאה ודליפות),
+    לפי ההפרש בין snapshot-ים כשתוצאות הקריאות אינן משוחררות
+    peak_bytes: שיא הזיכרון הזמני בקריאה בודדת (מעבר למה שהיה מוקצה לפניה)
+    """
+    fn()  # חימום - מטמונים פנימיים אינם נספרים
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        kept = [fn() for _ in range(calls)]
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del kept
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    return {"retained_bytes_per_op": round(retained / calls, 1), "peak_bytes": peak - base}
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    print(f"{'case':<52}{'ops/sec':>14}{'retained':>12}{'peak':>10}   (bytes per op)")
+    for name, values in results.items():
+        print(f"{name:<52}{values['ops_per_sec']:>14,.0f}{values['retained_bytes_per_op']:>12,.0f}"
+              f"{values['peak_bytes']:>10,}")
+
+
+def print_speedups(results: Dict[str, Dict[str, float]]):
+    """ההאצה של create_basic_prompt(s) ביחס למימוש הייחוס, לכל מקרה שנמדדו שניהם"""
+    for name, values in results.items():
+        if not name.startswith("ifchain_"):
+            continue
+        suffix = name.split("/", 1)[1]
+        current = results.get(f"create_basic_prompt/{suffix}") or results.get(f"create_basic_prompts/{suffix}")
+        if current:
+            print(f"speedup vs if-chain {suffix:<30}{current['ops_per_sec'] / values['ops_per_sec']:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="מיקרו-מדידות לנתיבים החמים")
+    parser.add_argument("--filter", help="מדידת המקרים ששמם מכיל את המחרוזת בלבד")
+    parser.add_argument("--repeat", type=int, default=5, help="מספר חזרות למדידת מהירות")
+    parser.add_argument("--min-time", type=float, default=0.1, help="משך משוער לכל חזרה בשניות")
+    parser.add_argument("--output", help="שמירת התוצאות לקובץ JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="קו בסיס להשוואה")
+    parser.add_argument("--threshold", type=float, default=0.3, help="נסיגה יחסית מרבית מותרת בפעולות לשנייה")
+    parser.add_argument("--memory-threshold", type=float, default=0.1, help="גידול יחסי מרבי מותר בזיכרון")
+    parser.add_argument("--update-baseline", action="store_true", help="שמירת התוצאות כקו הבסיס")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, fn in cases(tmpdir):
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = {"ops_per_sec": round(measure_speed(fn, args.repeat, args.min_time), 1)}
+            results[name].update(measure_memory(fn))
+    print_results(results)
+    print_speedups(results)
+
+    if args.output:
+        save_results(args.output, results)
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline} (run with --update-baseline)")
+        return 0
+    baseline = load_results(args.baseline)
+    regressions = compare(results, baseline, SPEED_METRICS, args.threshold)
+    # מדדי הזיכרון דטרמיניסטיים ברובם; שינוי של פחות מ-64 בתים אינו נחשב
+    regressions += compare(results, baseline, MEMORY_METRICS, args.memory_threshold, min_delta=64)
+    return report_regressions(regressions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקת עומס - משתמשים מקבילים של AIImagePromptGenerator מול שרת מדומה
+Load-testing harness simulating concurrent users of the generator
+
+מריץ תמהיל של create / enhance / reverse / generate על מחולל אחד משותף
+(כמו תהליך שמשרת משתמשים רבים), באחד משני מצבים:
+- --concurrency N: לולאה סגורה - N משתמשים, כל אחד שולח בקשה מיד כשהקודמת חזרה
+- --rate R: לולאה פתוחה - R בקשות לשנייה בהגעה פואסונית; זמן התגובה נמדד
+  ממועד ההגעה המתוכנן, כך שהמתנה בתור נכללת (ללא coordinated omission)
+
+לכל פעולה מדווחים קצב, p50/p95/p99 ושיעור שגיאות, כ-JSON לתכנון קיבולת.
+
+שימוש:
+    python benchmarks/loadtest.py --concurrency 32 --duration 20 --latency 0.3 --latency-sigma 0.5
+    python benchmarks/loadtest.py --rate 50 --mix enhance=3,create=5,generate=1 --error-429 0.05 --output load.json
+    python benchmarks/loadtest.py --base-url http://127.0.0.1:8765/v1 --concurrency 8
+    python benchmarks/loadtest.py --replay traffic.jsonl.gz --realtime --concurrency 8
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ai_prompt_generator_pkg"))
+
+from ai_prompt_generator import AIImagePromptGenerator, PromptElements  # noqa: E402
+from cassette import Cassette  # noqa: E402
+from mock_openai_server import MockConfig, MockOpenAIServer  # noqa: E402
+from rate_limiter import RateLimits, RequestScheduler  # noqa: E402
+from resilience import RetryPolicy  # noqa: E402
+
+OPERATIONS = ("create", "enhance", "reverse", "generate")
+DEFAULT_MIX = "create=4,enhance=3,reverse=2,generate=1"
+
+SUBJECTS = ["cat", "dog", "mountain lake", "coffee shop logo", "city at night",
+            "חתול פרסי", "נוף הרים", "לוגו לבית קפה"]
+STYLES = ["realistic", "watercolor", "minimalist", "3D render", "oil painting"]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """"enhance=3,create=5" -> משקל לכל פעולה"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"פעולה לא מוכרת בתמהיל: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class Workload:
+    """בחירת פעולות ופרומפטים; מאגר פרומפטים סופי יוצר חזרות מציאותיות (מטמון, איחוד בקשות)"""
+
+    def __init__(self, generator: AIImagePromptGenerator, mix: Dict[str, float], prompt_pool: int, seed: int):
+        self.generator = generator
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.prompt_pool = prompt_pool
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_call(self) -> (str, Callable[[], object]):
+        with self._lock:
+            name = self._random.choices(self.names, self.weights)[0]
+            index = self._random.randrange(self.prompt_pool)
+        subject = f"{SUBJECTS[index % len(SUBJECTS)]} #{index}"
+        elements = PromptElements(subject=subject, style=STYLES[index % len(STYLES)])
+        generator = self.generator
+        if name == "create":
+            return name, lambda: generator.create_basic_prompt(elements)
+        prompt = generator.create_basic_prompt(elements)
+        if name == "enhance":
+            return name, lambda: generator.enhance_prompt_with_ai(prompt)
+        if name == "reverse":
+            return name, lambda: generator.reverse_engineer_prompt(f"a photo of {subject}")
+        return name, lambda: generator.generate_image(prompt)
+
+
+class Recorder:
+    """איסוף זמני תגובה ושגיאות לפי פעולה"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, latency: float, error: Optional[BaseException] = None):
+        with self._lock:
+            if error is None:
+                self.latencies[name].append(latency)
+            else:
+                self.errors[name][type(error).__name__] += 1
+
+
+def run_call(recorder: Recorder, name: str, call: Callable[[], object], started: float):
+    try:
+        call()
+    except Exception as e:
+        recorder.record(name, time.perf_counter() - started, e)
+        return
+    recorder.record(name, time.perf_counter() - started)
+
+
+def run_closed_loop(workload: Workload, recorder: Recorder, concurrency: int, duration: float,
+                    scheduler: Optional[RequestScheduler]):
+    """N משתמשים, כל אחד ממתין לתשובה לפני הבקשה הבאה"""
+    deadline = time.perf_counter() + duration
+
+    def user(user_id: int):
+        def loop():
+            while time.perf_counter() < deadline:
+                name, call = workload.next_call()
+                run_call(recorder, name, call, time.perf_counter())
+        if scheduler is None:
+            loop()
+        else:
+            with scheduler.as_caller(f"user-{user_id}"):
+                loop()
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(workload: Workload, recorder: Recorder, rate: float, duration: float, max_workers: int,
+                  seed: int):
+    """הגעה פואסונית בקצב קבוע, בלי תלות בזמן התגובה"""
+    arrivals = random.Random(seed + 1)
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="load") as executor:
+        while True:
+            next_arrival += arrivals.expovariate(rate)
+            if next_arrival - start >= duration:
+                break
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name, call = workload.next_call()
+            executor.submit(run_call, recorder, name, call, next_arrival)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """אחוזון בשיטת nearest-rank: הערך בדרגה ceil(fraction * n), בטווח 1..n"""
+    if not sorted_values:
+        return 0.0
+    count = len(sorted_values)
+    rank = min(max(1, math.ceil(fraction * count)), count)
+    return sorted_values[rank - 1]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, object]]:
+    """סיכום לכל פעולה ולסך הכל"""
+    summary = {}
+    all_latencies = []
+    total_errors = 0
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = sorted(recorder.latencies.get(name, []))
+        errors = dict(recorder.errors.get(name, {}))
+        error_count = sum(errors.values())
+        summary[name] = _stats(latencies, error_count, elapsed)
+        summary[name]["errors_by_type"] = errors
+        all_latencies.extend(latencies)
+        total_errors += error_count
+    summary["total"] = _stats(sorted(all_latencies), total_errors, elapsed)
+    return summary
+
+
+def _stats(latencies: List[float], errors: int, elapsed: float) -> Dict[str, object]:
+    count = len(latencies) + errors
+    return {
+        "requests": count,
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def print_summary(summary: Dict[str, Dict[str, object]]):
+    print(f"{'operation':<10}{'requests':>10}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>9}   (ms)",
+          file=sys.stderr)
+    for name, values in summary.items():
+        print(f"{name:<10}{values['requests']:>10}{values['throughput_rps']:>9.1f}{values['p50_ms']:>10.1f}"
+              f"{values['p95_ms']:>10.1f}{values['p99_ms']:>10.1f}{values['error_rate']:>9.1%}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="בדיקת עומס של מחולל הפרומפטים מול שרת מדומה")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=16, help="מספר משתמשים מקבילים (לולאה סגורה)")
+    load.add_argument("--rate", type=float, help="בקשות לשנייה (לולאה פתוחה, הגעה פואסונית)")
+    parser.add_argument("--duration", type=float, default=10.0, help="משך הבדיקה בשניות")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="משקלי הפעולות, למשל enhance=3,create=5")
+    parser.add_argument("--prompt-pool", type=int, default=1000, help="גודל מאגר הפרומפטים השונים")
+    parser.add_argument("--max-workers", type=int, default=256, help="מקסימום בקשות פתוחות בלולאה פתוחה")
+    parser.add_argument("--seed", type=int, default=1, help="זרע לשחזור")
+    parser.add_argument("--scheduler", action="store_true", help="שימוש ב-RequestScheduler משותף")
+    parser.add_argument("--max-retries", type=int, default=3, help="ניסיונות חוזרים לשגיאות זמניות")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--base-url", help="שרת קיים תואם OpenAI (ברירת מחדל: שרת מדומה בתהליך)")
+    backend.add_argument("--replay", help="השמעה מקסטה במקום שרת")
+    parser.add_argument("--realtime", action="store_true", help="השמעה בזמני התגובה המקוריים")
+    parser.add_argument("--latency", type=float, default=0.2, help="שרת מדומה: חציון זמן תגובה")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="שרת מדומה: פיזור לוג-נורמלי")
+    parser.add_argument("--image-latency", type=float, help="שרת מדומה: חציון זמן תגובה לתמונות")
+    parser.add_argument("--error-429", type=float, default=0.0, help="שרת מדומה: שיעור 429")
+    parser.add_argument("--error-500", type=float, default=0.0, help="שרת מדומה: שיעור 500")
+    parser.add_argument("--output", help="שמירת הדו\"ח לקובץ JSON (ברירת מחדל: stdout)")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    cassette = Cassette(args.replay, realtime=args.realtime) if args.replay else None
+    if base_url is None and cassette is None:
+        server = MockOpenAIServer(MockConfig(
+            latency=args.latency, latency_sigma=args.latency_sigma, image_latency=args.image_latency,
+            error_rate_429=args.error_429, error_rate_500=args.error_500, retry_after=0.5, seed=args.seed,
+        )).start()
+        base_url = server.base_url
+
+    # הבדיקה מודדת את המחולל ולא את מגבלות החשבון; המתזמן מקבל תקציבים גבוהים
+    scheduler = RequestScheduler(
+        limits={"chat": RateLimits(60000, 10 ** 8), "images": RateLimits(60000)},
+        max_concurrency=1024,
+    ) if args.scheduler else None
+    generator = AIImagePromptGenerator(
+        api_key=os.getenv("OPENAI_API_KEY") or "load-test", base_url=base_url, cassette=cassette,
+        scheduler=scheduler, retry_policy=RetryPolicy(max_retries=args.max_retries),
+    )
+    workload = Workload(generator, parse_mix(args.mix), args.prompt_pool, args.seed)
+    recorder = Recorder()
+
+    start = time.perf_counter()
+    try:
+        if args.rate:
+            run_open_loop(workload, recorder, args.rate, args.duration, args.max_workers, args.seed)
+        else:
+            run_closed_loop(workload, recorder, args.concurrency, args.duration, scheduler)
+    finally:
+        elapsed = time.perf_counter() - start
+        if server is not None:
+            server.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_s": round(elapsed, 3),
+        "operations": summarize(recorder, elapsed),
+    }
+    if server is not None:
+        report["backend"] = server.stats()
+    print_summary(report["operations"])
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
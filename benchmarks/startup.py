@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת זמני הפעלה וייבוא של נקודות הכניסה
+Startup and import-time benchmarks for every entry point
+
+לכל מודול נמדדים:
+- ייבוא קר: תהליך חדש בלי bytecode של החבילה (כולל הידור קבצי החבילה
+  בלבד - הספרייה הסטנדרטית והתלויות נטענות מהמטמון הרגיל שלהן)
+- ייבוא חם: תהליך חדש עם bytecode החבילה מוכן (חציון של כמה הרצות)
+- פירוט לפי מודול בנוסח -X importtime (המודולים היקרים ביותר)
+- זמן מקצה לקצה של --help ושל יצירת פרומפט (לנקודות כניסה של שורת פקודה)
+
+שימוש:
+    python benchmarks/startup.py --output startup.json
+    python benchmarks/startup.py --baseline benchmarks/startup_baseline.json
+    python benchmarks/startup.py --update-baseline
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from baseline import compare, load_results, report_regressions, save_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(ROOT, "ai_prompt_generator_pkg")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+PROMPT_ARGS = ["--subject", "cat", "--style", "realistic", "--mood", "calm"]
+
+# שם -> (מודול, ארגומנטים ליצירת פרומפט או None אם אין שורת פקודה)
+# שמות ה-console scripts כפי שהוגדרו ב-setup.py; ממשקי ה-GUI נמדדים בייבוא בלבד
+ENTRY_POINTS = {
+    "ai-prompt": ("ai_prompt_generator", ["--api-key", "benchmark"] + PROMPT_ARGS),
+    "cli-prompt": ("cli_prompt_generator", PROMPT_ARGS),
+    "simple-prompt": ("simple_prompt_generator", None),
+    "gui": ("gui_prompt_generator", None),
+    "prompt_core": ("prompt_core", None),
+}
+
+# מדד -> האם ערך גבוה יותר טוב
+METRICS = {"import_cold_ms": False, "import_warm_ms": False, "help_ms": False, "prompt_ms": False}
+
+
+def _env() -> Dict[str, str]:
+    # מטמון ה-bytecode הרגיל (__pycache__ ליד כל קובץ) - גם של הספרייה הסטנדרטית
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.pop("PYTHONPYCACHEPREFIX", None)
+    return env
+
+
+def parse_importtime(stderr: str) -> Dict[str, Dict[str, int]]:
+    """
+    פענוח פלט -X importtime: שם מודול -> זמן עצמי ומצטבר (מיקרו-שניות)
+
+    רק המודולים שנטענו בייבוא האחרון ברמה העליונה (המודול הנמדד ותלויותיו)
+    נכללים - לא site ומה שהמפרש טוען בעלייה.
+    """
+    modules = {}
+    closed = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # ילדים מודפסים לפני ההורה; שורה ברמה העליונה סוגרת ייבוא שלם
+        if closed:
+            modules = {}
+        modules[name.strip()] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+        closed = len(name) - len(name.lstrip()) <= 1
+    return modules
+
+
+def measure_import(module: str, package_dir: str) -> Dict[str, Dict[str, int]]:
+    """ייבוא המודול בתהליך חדש עם -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=package_dir, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_command(args: List[str], package_dir: str, runs: int) -> float:
+    """חציון זמן הריצה (מילישניות) של סקריפט בתהליך חדש, כולל עליית המפרש"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=package_dir, env=_env(),
+                       capture_output=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_entry_point(module: str, prompt_args: Optional[List[str]], runs: int,
+                          top: int) -> Dict[str, object]:
+    """כל המדידות של נקודת כניסה אחת"""
+    # ייבוא מקדים מהחבילה עצמה - מטמון הספרייה הסטנדרטית והתלויות מוכן
+    measure_import(module, PACKAGE_DIR)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # עותק של החבילה בלי __pycache__: הייבוא הקר מהדר את קבצי החבילה בלבד
+        package_dir = os.path.join(tmpdir, "pkg")
+        shutil.copytree(PACKAGE_DIR, package_dir, ignore=shutil.ignore_patterns("__pycache__"))
+        cold = measure_import(module, package_dir)[module]["cumulative_us"] / 1000
+
+        # חם: ה-bytecode של העותק נכתב בהרצה הקרה
+        warm_runs = [measure_import(module, package_dir) for _ in range(runs)]
+        warm = statistics.median(r[module]["cumulative_us"] for r in warm_runs) / 1000
+        breakdown = sorted(warm_runs[-1].items(), key=lambda item: item[1]["self_us"], reverse=True)
+
+        result = {
+            "import_cold_ms": round(cold, 2),
+            "import_warm_ms": round(warm, 2),
+            "breakdown": dict(breakdown[:top]),
+        }
+        if prompt_args is not None:
+            script = f"{module}.py"
+            result["help_ms"] = round(measure_command([script, "--help"], package_dir, runs), 2)
+            result["prompt_ms"] = round(measure_command([script] + prompt_args, package_dir, runs), 2)
+    return result
+
+
+def print_results(results: Dict[str, Dict[str, object]]):
+    print(f"{'entry point':<16}{'cold':>10}{'warm':>10}{'--help':>10}{'prompt':>10}   (ms)")
+    for name, values in results.items():
+        cells = [values.get(metric) for metric in METRICS]
+        print(f"{name:<16}" + "".join(f"{c:>10.1f}" if c is not None else f"{'-':>10}" for c in cells))
+        slowest = ", ".join(f"{mod} {v['self_us'] / 1000:.1f}" for mod, v in list(values["breakdown"].items())[:3])
+        print(f"{'':<16}slowest imports (self ms): {slowest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="מדידת זמני הפעלה וייבוא של נקודות הכניסה")
+    parser.add_argument("--runs", type=int, default=7, help="מספר הרצות חמות לכל מדידה (חציון)")
+    parser.add_argument("--top", type=int, default=15, help="מספר המודולים בפירוט")
+    parser.add_argument("--only", nargs="+", choices=sorted(ENTRY_POINTS), help="מדידת חלק מנקודות הכניסה")
+    parser.add_argument("--output", help="שמירת התוצאות לקובץ JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="קו בסיס להשוואה")
+    parser.add_argument("--threshold", type=float, default=0.25, help="נסיגה יחסית מרבית מותרת")
+    parser.add_argument("--min-delta", type=float, default=10.0, help="נסיגה מוחלטת מזערית במילישניות")
+    parser.add_argument("--update-baseline", action="store_true", help="שמירת התוצאות כקו הבסיס")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or ENTRY_POINTS:
+        module, prompt_args = ENTRY_POINTS[name]
+        results[name] = benchmark_entry_point(module, prompt_args, args.runs, args.top)
+    print_results(results)
+
+    if args.output:
+        save_results(args.output, results)
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline} (run with --update-baseline)")
+        return 0
+    regressions = compare(results, load_results(args.baseline), METRICS, args.threshold, args.min_delta)
+    return report_regressions(regressions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
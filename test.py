@@ -1,8 +1,39 @@
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from ai_prompt_generator import (
     AIImagePromptGenerator,
     PromptElements,
 )  # Import the class and dataclass
+from cassette import Cassette, CassetteMissError
+from image_store import ImageStore
+from mock_openai_server import MockConfig, MockOpenAIServer
+import parallel_batch
+from prompt_cache import PromptCache
+import prompt_batch
+import prompt_core
+from prompt_sweep import PromptSweep
+from prompt_table import PromptTable
+from prompt_templates import ParametricTemplate
+from rate_limiter import AIMDLimiter, RateLimits, RequestScheduler
+from resilience import (
+    APIRequestError,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    RetryPolicy,
+)
+from single_flight import SingleFlight
 
 
 class TestPromptGenerator(unittest.TestCase):
@@ -30,6 +61,808 @@ class TestPromptGenerator(unittest.TestCase):
         prompt = self.generator.create_basic_prompt(elements)
         self.assertIn("hat", prompt)
 
+    def test_campaign_prompts_run_concurrently(self):
+        def slow_enhance(prompt, target_use="general"):
+            time.sleep(0.2)
+            return "enhanced " + prompt
+
+        self.generator.enhance_prompt_with_ai = slow_enhance
+        start = time.perf_counter()
+        campaign = self.generator.create_campaign_prompts("bakery", ["red"])
+        elapsed = time.perf_counter() - start
+        self.assertEqual(
+            set(campaign), {"logo", "instagram_post", "hero_image", "avatar"}
+        )
+        self.assertTrue(all(p.startswith("enhanced ") for p in campaign.values()))
+        self.assertLess(elapsed, 0.6)
+
+    def test_campaign_prompts_deadline_raises_with_partial_results(self):
+        def enhance(prompt, target_use="general"):
+            if prompt.startswith("minimalist logo"):
+                return "enhanced " + prompt
+            time.sleep(1)
+            return "late " + prompt
+
+        self.generator.enhance_prompt_with_ai = enhance
+        with self.assertRaises(DeadlineExceededError) as ctx:
+            self.generator.create_campaign_prompts("bakery", timeout=0.1)
+        self.assertEqual(list(ctx.exception.partial), ["logo"])
+
+    def test_campaign_prompts_async(self):
+        async def slow_enhance(prompt, target_use="general"):
+            await asyncio.sleep(0.2)
+            return "enhanced " + prompt
+
+        self.generator.enhance_prompt_with_ai_async = slow_enhance
+        start = time.perf_counter()
+        campaign = asyncio.run(self.generator.create_campaign_prompts_async("bakery"))
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(len(campaign), 4)
+        self.assertTrue(all(p.startswith("enhanced ") for p in campaign.values()))
+
+    def test_identical_concurrent_enhancements_share_one_request(self):
+        calls = []
+
+        def slow_enhance(prompt, target_use):
+            calls.append(prompt)
+            time.sleep(0.2)
+            return "enhanced " + prompt
+
+        self.generator._enhance_prompt_with_ai = slow_enhance
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(lambda _: self.generator.enhance_prompt_with_ai("cat"), range(8))
+            )
+        self.assertEqual(calls, ["cat"])
+        self.assertEqual(results, ["enhanced cat"] * 8)
+
+    def test_enhance_prompts_batch_packs_and_retries_failures(self):
+        requests = []
+
+        def create(**kwargs):
+            requests.append(kwargs)
+            prompts = json.loads(kwargs["messages"][1]["content"])
+            items = ["enhanced " + p if p != "bad" else "" for p in prompts]
+            content = json.dumps(items)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+            )
+
+        self.generator.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+        )
+        self.generator._enhance_prompt_with_ai = lambda prompt, target_use: "retried " + prompt
+        prompts = ["cat", "dog", "bad", "cat"]
+        results = self.generator.enhance_prompts_batch(prompts)
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(results, ["enhanced cat", "enhanced dog", "retried bad", "enhanced cat"])
+
+    def test_batch_planning_respects_token_budget(self):
+        batches = self.generator._plan_batches(["x" * 40] * 10, "general", 2000, 20)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(sum(len(b) for b in batches), 10)
+
+
+class TestPromptCore(unittest.TestCase):
+
+    # תקציב זמן הייבוא (קר) של מודול הליבה, במיקרו-שניות
+    IMPORT_BUDGET_US = 50000
+
+    def test_core_import_is_light_and_within_budget(self):
+        module_dir = os.path.dirname(os.path.abspath(prompt_core.__file__))
+        code = ("import sys, prompt_core; "
+                "print(sorted(m for m in ('openai', 'tkinter', 'PIL') if m in sys.modules))")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=module_dir, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+        cumulative = [
+            int(line.split("|")[1]) for line in result.stderr.splitlines()
+            if line.split("|")[-1].strip() == "prompt_core"
+        ]
+        self.assertEqual(len(cumulative), 1)
+        self.assertLess(cumulative[0], self.IMPORT_BUDGET_US)
+
+    def test_generator_uses_core_assembly(self):
+        generator = AIImagePromptGenerator(api_key="test_key")
+        elements = prompt_core.get_example("cat")
+        self.assertEqual(generator.create_basic_prompt(elements),
+                         prompt_core.create_basic_prompt(elements))
+        self.assertTrue(prompt_core.create_basic_prompt(elements).endswith(
+            "high quality, detailed, professional"))
+
+    def test_get_example_returns_copy(self):
+        prompt_core.get_example("cat").subject = "dog"
+        self.assertEqual(prompt_core.EXAMPLES["cat"].subject, "חתול פרסי לבן")
+        self.assertEqual(prompt_core.get_example("missing"), PromptElements())
+
+    def test_compiled_assembler_matches_field_by_field_assembly(self):
+        def reference(e):
+            parts = [f"{prefix}{getattr(e, name)}" for name, prefix in prompt_core.DEFAULT_FIELDS if getattr(e, name)]
+            return ", ".join(parts + ["high quality", "detailed", "professional"])
+
+        values = ["", "cat", "חתול פרסי", "0"]
+        elements = [PromptElements(*(values[(i >> (2 * f)) % 4] for f in range(8))) for i in range(0, 4 ** 8, 7)]
+        self.assertEqual(prompt_core.create_basic_prompts(elements), [reference(e) for e in elements])
+        # ערכים שאינם מחרוזות (מספרים מתבנית JSON) מעוצבים כמו ב-f-string
+        numeric = PromptElements(subject="cat", details=5, mood=2.5)
+        self.assertEqual(prompt_core.create_basic_prompt(numeric), reference(numeric))
+
+        assembler = prompt_core.PromptAssembler([("style", "s="), ("subject", "")], " | ", ["hq"])
+        self.assertEqual(list(assembler.many([PromptElements(), PromptElements(subject="x"),
+                                              PromptElements(subject="x", style="y")])), ["hq", "x | hq", "s=y | x | hq"])
+        # קידומת עם סוגריים מסולסלים, גרשיים ולוכסן נכתבת כפי שהיא
+        odd = prompt_core.PromptAssembler([("subject", "{x} it's \"q\"\\ ")], quality=[])
+        self.assertEqual(odd(PromptElements(subject="cat")), "{x} it's \"q\"\\ cat")
+        with self.assertRaises(ValueError):
+            prompt_core.PromptAssembler([("style-name", "")])
+
+
+class TestPromptBatch(unittest.TestCase):
+
+    def test_jsonl_and_csv_rows_stream_to_prompts(self):
+        jsonl = io.StringIO('{"id": "a", "subject": "cat", "colors": "red"}\n\n{"subject": "dog", "extra": 1}\n')
+        output = io.StringIO()
+        self.assertEqual(prompt_batch.run_batch(jsonl, output), 2)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(rows[0], {"id": "a", "prompt": prompt_core.create_basic_prompt(
+            PromptElements(subject="cat", color="red"))})
+        self.assertEqual(rows[1]["id"], 3)
+
+        csv_input = io.StringIO('subject,style\ncat,"sketch, bold"\n')
+        output = io.StringIO()
+        prompt_batch.run_batch(csv_input, output, "csv", "text")
+        self.assertEqual(output.getvalue(), "cat, style: sketch, bold, high quality, detailed, professional\n")
+
+    def test_invalid_jsonl_row_reports_line(self):
+        with self.assertRaisesRegex(ValueError, "שורה 2"):
+            prompt_batch.run_batch(io.StringIO('{"subject": "cat"}\n[1]\n'), io.StringIO())
+
+    def test_bom_prefixed_input_keeps_first_column(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, text in (("catalog.csv", "subject,style\ncat,sketch\ndog,\n"),
+                               ("catalog.jsonl", '{"subject": "cat", "style": "sketch"}\n{"subject": "dog"}\n')):
+                path = os.path.join(tmpdir, name)
+                with open(path, "w", encoding="utf-8-sig", newline="") as f:
+                    f.write(text)
+                fmt = prompt_batch.detect_format(path, formats=prompt_batch.FORMATS)
+                serial = io.StringIO()
+                with prompt_batch.open_input(path) as f:
+                    prompt_batch.run_batch(f, serial, fmt, "text")
+                self.assertEqual(serial.getvalue().splitlines(), [
+                    "cat, style: sketch, high quality, detailed, professional",
+                    "dog, high quality, detailed, professional"])
+                parallel = io.StringIO()
+                parallel_batch.run_parallel_batch(path, parallel, fmt, "text", workers=1, shards=2, tmpdir=tmpdir)
+                self.assertEqual(parallel.getvalue(), serial.getvalue())
+
+    def test_input_format_accepts_only_jsonl_and_csv(self):
+        self.assertEqual(prompt_batch.detect_format("rows.ndjson", formats=prompt_batch.FORMATS), "jsonl")
+        self.assertEqual(prompt_batch.detect_format("-", formats=prompt_batch.FORMATS), "jsonl")
+        for path in ("prompts.txt", "catalog.xlsx"):
+            with self.assertRaisesRegex(ValueError, "jsonl/csv"):
+                prompt_batch.detect_format(path, formats=prompt_batch.FORMATS)
+        self.assertEqual(prompt_batch.detect_format("prompts.txt"), "text")
+
+    def test_parallel_error_reports_file_line_from_later_shard(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "rows.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("".join(f'{{"subject": "item {i}"}}\n' if i != 170 else "[1]\n" for i in range(200)))
+            with self.assertRaisesRegex(ValueError, "שורה 171:"):
+                parallel_batch.run_parallel_batch(path, io.StringIO(), workers=2, shards=5, tmpdir=tmpdir)
+
+    def test_parallel_shards_match_serial_output(self):
+        lines = ['subject,id'] + [f'"item {i}, ""q""",{i if i % 3 else ""}' for i in range(500)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "catalog.csv")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write("\n".join(lines) + "\n")
+            for begin, end in parallel_batch.plan_ranges(path, 7):
+                with open(path, "rb") as f:
+                    f.seek(begin - 1 if begin else 0)
+                    self.assertTrue(begin == 0 or f.read(1) == b"\n")
+            with open(path, encoding="utf-8", newline="") as f:
+                serial = io.StringIO()
+                prompt_batch.run_batch(f, serial, "csv", "csv")
+            for ordered in (True, False):
+                output = io.StringIO()
+                count = parallel_batch.run_parallel_batch(path, output, "csv", "csv", workers=2, shards=7,
+                                                          ordered=ordered, tmpdir=tmpdir)
+                self.assertEqual(count, 500)
+                if ordered:
+                    self.assertEqual(output.getvalue(), serial.getvalue())
+                else:
+                    self.assertEqual(sorted(output.getvalue().splitlines()), sorted(serial.getvalue().splitlines()))
+            self.assertEqual(os.listdir(tmpdir), ["catalog.csv"])
+
+
+class TestPromptSweep(unittest.TestCase):
+
+    def test_sweep_matches_create_basic_prompt_and_slices_lazily(self):
+        sweep = PromptSweep(["cat", ""], lightings=None, base=PromptElements(lighting="studio", details="x"))
+        self.assertEqual(len(sweep), 2 * 6 * 10 * 8)
+        prompts = list(sweep)
+        self.assertEqual(prompts, [prompt_core.create_basic_prompt(sweep.elements(i)) for i in range(len(sweep))])
+        self.assertEqual(list(sweep[7:300:5]), prompts[7:300:5])
+        self.assertEqual(sweep[-1], prompts[-1])
+        self.assertEqual([p for i in range(3) for p in sweep.shard(i, 3)], prompts)
+        self.assertIsInstance(PromptSweep(["a"] * 10 ** 6)._indices, range)
+
+    def test_stratified_sample_covers_every_stratum(self):
+        sweep = PromptSweep(["cat", "dog"])
+        sample = sweep.stratified(3, by=("subject", "style"), seed=1)
+        self.assertEqual(len(sample), 2 * 10 * 3)
+        strata = {(e.subject, e.style) for e in map(sample.elements, range(len(sample)))}
+        self.assertEqual(len(strata), 20)
+        self.assertEqual(list(sweep.sample(5, seed=2)), list(sweep.sample(5, seed=2)))
+
+
+class TestPromptTable(unittest.TestCase):
+
+    def test_columnar_rows_and_prompts_match_elements(self):
+        elements = [prompt_core.get_example(name) for name in ("cat", "logo", "landscape")]
+        elements += [PromptElements(style="sketch"), PromptElements(), PromptElements(subject="cat", mood="x" * 300)]
+        table = PromptTable(elements)
+        table.append({"subject": "dog", "colors": "red", "extra": 1})
+        table.compact()
+        table.append(PromptElements(subject="cat", mood=" ".join(["y"] * 300)))
+        elements += [PromptElements(subject="dog", color="red"), PromptElements(subject="cat", mood=" ".join(["y"] * 300))]
+
+        self.assertEqual(len(table), len(elements))
+        self.assertEqual([row.to_elements() for row in table], elements)
+        self.assertEqual(table[-2].color, "red")
+        self.assertEqual(table.prompts(), [prompt_core.create_basic_prompt(e) for e in elements])
+        self.assertEqual(list(table.iter_prompts(chunk_size=2)), table.prompts())
+
+    def test_repeated_values_are_stored_once(self):
+        table = PromptTable({"subject": "bag", "style": "realistic", "details": "no text"} for _ in range(10000))
+        self.assertEqual(table._columns["style"].typecode, "B")
+        self.assertEqual(len(table._pool), 3)
+        self.assertLess(table.nbytes(), 10000 * 24)
+
+    def test_codes_widen_past_two_bytes(self):
+        count = 70000
+        table = PromptTable({"subject": "bag", "mood": f"mood {i}"} for i in range(count))
+        self.assertEqual(table._columns["mood"].itemsize, 4)
+        self.assertEqual(table[count - 1].mood, f"mood {count - 1}")
+        self.assertEqual(table[0].mood, "mood 0")
+        prompts = list(table.iter_prompts(chunk_size=30000))
+        self.assertEqual(prompts[-1], prompt_core.create_basic_prompt(PromptElements(subject="bag",
+                                                                                     mood=f"mood {count - 1}")))
+
+
+class TestParametricTemplate(unittest.TestCase):
+
+    def test_fill_matches_assembly_of_filled_elements(self):
+        template = ParametricTemplate(PromptElements(subject="{product} in {color}", color="{color}",
+                                                     details="{{literal}} {price:.2f}", context="{channel}"),
+                                      defaults={"channel": ""})
+        self.assertEqual(template.placeholders, ("product", "color", "price", "channel"))
+        rows = [{"product": "bag", "color": "red", "price": 3, "channel": "web"},
+                {"product": "mug", "color": "", "price": 1.5}]
+        prompts = list(template.fill_rows(rows))
+        self.assertEqual(prompts, [prompt_core.create_basic_prompt(template.fill_elements(row)) for row in rows])
+        self.assertEqual(prompts[1], "mug in , details: {literal} 1.50, high quality, detailed, professional")
+        with self.assertRaisesRegex(ValueError, "price"):
+            template.fill({"product": "x", "color": "y"})
+        with self.assertRaises(ValueError):
+            ParametricTemplate(PromptElements(subject="{item.__class__}"))
+
+    def test_batch_rows_fill_loaded_template(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "template.json")
+            prompt_core.save_elements_template(PromptElements(subject="{product}", style="sketch"), path)
+            template = ParametricTemplate.load(path)
+        output = io.StringIO()
+        prompt_batch.run_batch(io.StringIO("id,product\na,cat\n"), output, "csv", "csv", template=template)
+        self.assertEqual(output.getvalue(), 'id,prompt\na,"cat, style: sketch, high quality, detailed, professional"\n')
+        with self.assertRaisesRegex(ValueError, "שורה 2"):
+            prompt_batch.run_batch(io.StringIO("name\ncat\n"), io.StringIO(), "csv", template=template)
+
+    def test_short_csv_rows_and_numeric_formats(self):
+        template = ParametricTemplate(PromptElements(subject="{product}", color="{color}", details="{price:.2f}"))
+        output = io.StringIO()
+        prompt_batch.run_batch(io.StringIO("product,color,price\nbag,red,9.5\nmug\n"), output, "csv", "text",
+                               template=template)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "bag, colors: red, details: 9.50, high quality, detailed, professional",
+            "mug, high quality, detailed, professional",
+        ])
+        self.assertEqual(template.fill_elements({"product": "mug", "color": None, "price": None}),
+                         PromptElements(subject="mug"))
+        with self.assertRaisesRegex(ValueError, r"שורה 3:.*\{price\}"):
+            prompt_batch.run_batch(io.StringIO("product,color,price\nbag,,1\ncup,,cheap\n"), io.StringIO(), "csv",
+                                   template=template)
+
+        # בלי שדות אופציונליים (מסלול format_map המהיר) - None הוא ריק ולא "None"
+        plain = ParametricTemplate(PromptElements(subject="{product} in {color}"))
+        self.assertEqual(list(plain.fill_rows([{"product": "mug", "color": None}])),
+                         ["mug in , high quality, detailed, professional"])
+        counted = ParametricTemplate(PromptElements(subject="{count:d} items"))
+        self.assertEqual(counted.fill({"count": "2"}), "2 items, high quality, detailed, professional")
+        with self.assertRaisesRegex(ValueError, "פורמט"):
+            counted.fill({"count": 1.5})
+
+
+class TestLazyClient(unittest.TestCase):
+
+    def test_sdk_loaded_only_on_first_network_use(self):
+        module_dir = os.path.dirname(os.path.abspath(prompt_core.__file__))
+        code = (
+            "import sys, ai_prompt_generator as m; "
+            "g = m.AIImagePromptGenerator(api_key='k'); "
+            "g.create_basic_prompt(m.PromptElements(subject='cat')); "
+            "print(','.join(n for n in ('openai', 'asyncio', 'sqlite3', 'gzip') if n in sys.modules) or '-'); "
+            "print(g.client is g.client, 'openai' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=module_dir,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split(), ["-", "True", "True"])
+
+
+class TestGuiStartup(unittest.TestCase):
+
+    def test_gui_import_defers_heavy_dependencies(self):
+        try:
+            import tkinter  # noqa: F401
+        except ImportError:
+            self.skipTest("tkinter אינו זמין")
+        module_dir = os.path.dirname(os.path.abspath(prompt_core.__file__))
+        code = ("import sys, gui_prompt_generator; print(sorted(m for m in "
+                "('PIL', 'requests', 'openai', 'ai_prompt_generator') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=module_dir,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+class TestResilience(unittest.TestCase):
+
+    @staticmethod
+    def _status_error(status_code):
+        error = RuntimeError(f"status {status_code}")
+        error.status_code = status_code
+        return error
+
+    def _generator_with(self, create, **kwargs):
+        generator = AIImagePromptGenerator(
+            api_key="test_key", retry_policy=RetryPolicy(base_delay=0.001), **kwargs
+        )
+        generator.client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+        )
+        return generator
+
+    def test_transient_errors_are_retried(self):
+        attempts = []
+
+        def create(**kwargs):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise self._status_error(503)
+            content = "enhanced cat"
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+            )
+
+        generator = self._generator_with(create)
+        self.assertEqual(generator.enhance_prompt_with_ai("cat"), "enhanced cat")
+        self.assertEqual(len(attempts), 3)
+
+    def test_client_errors_raise_typed_error_without_retry(self):
+        attempts = []
+
+        def create(**kwargs):
+            attempts.append(1)
+            raise self._status_error(400)
+
+        generator = self._generator_with(create)
+        with self.assertRaises(APIRequestError) as ctx:
+            generator.enhance_prompt_with_ai("cat")
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(len(attempts), 1)
+
+    def test_circuit_opens_and_fails_fast(self):
+        attempts = []
+
+        def create(**kwargs):
+            attempts.append(1)
+            raise ConnectionError("down")
+
+        breaker = CircuitBreaker(min_calls=2, cooldown=60)
+        generator = self._generator_with(create, circuit_breaker=breaker)
+        generator.retry_policy = RetryPolicy(max_retries=0)
+        for prompt in ["a", "b"]:
+            with self.assertRaises(APIRequestError):
+                generator.enhance_prompt_with_ai(prompt)
+        with self.assertRaises(CircuitOpenError):
+            generator.enhance_prompt_with_ai("c")
+        self.assertEqual(len(attempts), 2)
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_stream_yields_deltas_and_caches_result(self):
+        def create(**kwargs):
+            self.assertTrue(kwargs["stream"])
+            return iter(
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=c))])
+                for c in [" enhanced", " cat", None]
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = PromptCache(os.path.join(tmpdir, "cache.sqlite3"))
+            generator = AIImagePromptGenerator(api_key="test_key", cache=cache)
+            generator.client = SimpleNamespace(
+                chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+            )
+            self.assertEqual(
+                list(generator.enhance_prompt_with_ai_stream("cat")), [" enhanced", " cat"]
+            )
+            self.assertEqual(list(generator.enhance_prompt_with_ai_stream("cat")), ["enhanced cat"])
+            cache.close()
+
+
+class TestImageGeneration(unittest.TestCase):
+
+    def test_b64_json_image_is_decoded_once(self):
+        requests = []
+
+        def generate(**kwargs):
+            requests.append(kwargs)
+            item = SimpleNamespace(b64_json="aW1hZ2U=", url=None, revised_prompt="a cat")
+            return SimpleNamespace(data=[item])
+
+        generator = AIImagePromptGenerator(api_key="test_key")
+        generator.client = SimpleNamespace(images=SimpleNamespace(generate=generate))
+        image = generator.generate_image_data("cat")
+        self.assertEqual(requests[0]["response_format"], "b64_json")
+        self.assertEqual(image.data, b"image")
+        self.assertIsNone(image.url)
+
+    def test_preview_is_downscaled_off_thread(self):
+        from io import BytesIO
+        from PIL import Image
+        from ai_prompt_generator import GeneratedImage
+        from image_pipeline import ImagePipeline
+
+        buffer = BytesIO()
+        Image.new("RGB", (1024, 1024), "red").save(buffer, format="JPEG")
+        ready = []
+        done = threading.Event()
+
+        def on_ready(generated, preview):
+            ready.append((threading.current_thread(), preview.size))
+            done.set()
+
+        pipeline = ImagePipeline(max_size=(380, 380))
+        pipeline.submit(GeneratedImage(data=buffer.getvalue()), on_ready, lambda e: done.set())
+        self.assertTrue(done.wait(5))
+        pipeline.shutdown()
+        self.assertIsNot(ready[0][0], threading.current_thread())
+        self.assertEqual(ready[0][1], (380, 380))
+
+    def test_image_store_serves_repeat_requests_locally(self):
+        requests = []
+
+        def generate(**kwargs):
+            requests.append(kwargs)
+            item = SimpleNamespace(b64_json="aW1hZ2U=", url=None, revised_prompt=None)
+            return SimpleNamespace(data=[item])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = ImageStore(tmpdir, max_bytes=8)
+            generator = AIImagePromptGenerator(api_key="test_key", image_store=store)
+            generator.client = SimpleNamespace(images=SimpleNamespace(generate=generate))
+            first_url = generator.generate_image("cat")
+            self.assertEqual(requests[0]["response_format"], "b64_json")
+            self.assertTrue(first_url.startswith("file://"))
+            self.assertEqual(generator.generate_image_data("cat").data, b"image")
+            self.assertEqual(len(requests), 1)
+
+            # max_bytes=8 - התמונה השנייה מפנה את הראשונה
+            generator.generate_image_data("dog")
+            self.assertEqual(store.stats()["entries"], 1)
+            self.assertEqual(ImageStore(tmpdir).stats()["entries"], 1)
+
+    def test_image_store_keeps_oversize_image_it_just_saved(self):
+        def generate(**kwargs):
+            item = SimpleNamespace(b64_json="aW1hZ2U=", url=None, revised_prompt=None)
+            return SimpleNamespace(data=[item])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = ImageStore(tmpdir, max_bytes=2)
+            generator = AIImagePromptGenerator(api_key="test_key", image_store=store)
+            generator.client = SimpleNamespace(images=SimpleNamespace(generate=generate))
+            url = generator.generate_image("cat")
+            self.assertTrue(url.startswith("file://"))
+            self.assertEqual(store.stats()["entries"], 1)
+            self.assertEqual(generator.generate_image_data("cat").data, b"image")
+
+            # תשובה עם url בלבד - התמונה לא נשמרת והכתובת המקורית מוחזרת
+            def generate_url(**kwargs):
+                return SimpleNamespace(data=[SimpleNamespace(url="https://example.com/dog.png")])
+
+            generator.client = SimpleNamespace(images=SimpleNamespace(generate=generate_url))
+            self.assertEqual(generator.generate_image("dog"), "https://example.com/dog.png")
+            self.assertEqual(store.stats()["entries"], 1)
+
+
+class TestMockServer(unittest.TestCase):
+
+    def test_generator_end_to_end_against_mock(self):
+        with MockOpenAIServer(MockConfig(latency=0.01)) as server:
+            generator = AIImagePromptGenerator(api_key="mock", base_url=server.base_url)
+            enhanced = generator.enhance_prompt_with_ai("cat")
+            streamed = "".join(generator.enhance_prompt_with_ai_stream("cat"))
+            image = generator.generate_image_data("cat")
+            elements = generator.reverse_engineer_prompt("a cat on a sofa")
+            stats = server.stats()
+        self.assertEqual(streamed, enhanced)
+        self.assertTrue(image.data.startswith(b"\x89PNG"))
+        self.assertEqual(elements.subject, "a cat on a sofa")
+        self.assertEqual((stats["chat"], stats["stream"], stats["images"]), (2, 1, 1))
+
+    def test_async_paths_against_mock_across_event_loops(self):
+        clients = []
+
+        async def run(generator, tag):
+            enhanced, elements, url = await asyncio.gather(
+                generator.enhance_prompt_with_ai_async(f"cat {tag}"),
+                generator.reverse_engineer_prompt_async(f"a cat on a sofa {tag}"),
+                generator.generate_image_async(f"cat {tag}"),
+            )
+            clients.append(await generator._get_async_client())
+            self.assertFalse(clients[-1].is_closed())
+            if tag == "second":
+                await generator.aclose()
+            return enhanced, elements, url
+
+        with MockOpenAIServer(MockConfig(latency=0.01)) as server:
+            generator = AIImagePromptGenerator(api_key="mock", base_url=server.base_url)
+            # asyncio.run שני על אותו מחולל - לקוח חדש ללולאה החדשה
+            for tag in ("first", "second"):
+                enhanced, elements, url = asyncio.run(run(generator, tag))
+                self.assertEqual(enhanced, f"cat {tag}, enhanced, 8k resolution, sharp focus, well composed")
+                self.assertEqual(elements.subject, f"a cat on a sofa {tag}")
+                self.assertTrue(url)
+            stats = server.stats()
+        self.assertEqual((stats["chat"], stats["images"]), (4, 2))
+        # לקוח לכל לולאה; הראשון נסגר עם סיום הלולאה שלו, השני ב-aclose
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed() for client in clients))
+        self.assertEqual(len(generator._async_clients), 0)
+
+    def test_url_images_are_capped_and_backlog_is_configurable(self):
+        from urllib.error import HTTPError
+        from urllib.request import urlopen
+
+        with MockOpenAIServer(MockConfig(max_images=2, backlog=256)) as server:
+            self.assertEqual(server._httpd.request_queue_size, 256)
+            generator = AIImagePromptGenerator(api_key="mock", base_url=server.base_url)
+            urls = [generator.generate_image(f"cat {i}") for i in range(3)]
+            # התמונה הראשונה פונתה; האחרונות עדיין להורדה
+            with self.assertRaises(HTTPError) as raised:
+                urlopen(urls[0]).close()
+            self.assertEqual(raised.exception.code, 404)
+            raised.exception.close()
+            for url in urls[1:]:
+                with urlopen(url) as response:
+                    self.assertTrue(response.read().startswith(b"\x89PNG"))
+
+    def test_injected_429_is_retried(self):
+        config = MockConfig(error_rate_429=0.5, retry_after=0.01, seed=7)
+        with MockOpenAIServer(config) as server:
+            generator = AIImagePromptGenerator(
+                api_key="mock", base_url=server.base_url,
+                retry_policy=RetryPolicy(max_retries=10, base_delay=0.01),
+                circuit_breaker=CircuitBreaker(min_calls=100),
+            )
+            results = [generator.enhance_prompt_with_ai(f"cat {i}") for i in range(5)]
+            stats = server.stats()
+        self.assertEqual(len(results), 5)
+        self.assertGreater(stats["errors_429"], 0)
+        self.assertEqual(stats["requests"], stats["chat"] + stats["errors_429"])
+
+
+class TestCassette(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "traffic.jsonl.gz")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_record_then_replay_without_network(self):
+        with MockOpenAIServer(MockConfig(latency=0.05)) as server, \
+                Cassette(self.path, Cassette.RECORD) as cassette:
+            generator = AIImagePromptGenerator(api_key="mock", base_url=server.base_url, cassette=cassette)
+            recorded = (
+                generator.enhance_prompt_with_ai("cat"),
+                "".join(generator.enhance_prompt_with_ai_stream("dog")),
+                generator.reverse_engineer_prompt("a cat on a sofa"),
+                generator.generate_image("cat"),
+            )
+
+        cassette = Cassette(self.path, Cassette.REPLAY)
+        self.assertEqual(len(cassette), 4)
+        generator = AIImagePromptGenerator(api_key=None, cassette=cassette)
+        start = time.perf_counter()
+        replayed = (
+            generator.enhance_prompt_with_ai("cat"),
+            "".join(generator.enhance_prompt_with_ai_stream("dog")),
+            generator.reverse_engineer_prompt("a cat on a sofa"),
+            generator.generate_image("cat"),
+        )
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(replayed, recorded)
+        with self.assertRaises(CassetteMissError):
+            generator.enhance_prompt_with_ai("never recorded")
+
+    def test_realtime_replay_keeps_original_timing(self):
+        with MockOpenAIServer(MockConfig(latency=0.1)) as server, \
+                Cassette(self.path, Cassette.RECORD) as cassette:
+            AIImagePromptGenerator(api_key="mock", base_url=server.base_url,
+                                   cassette=cassette).enhance_prompt_with_ai("cat")
+
+        generator = AIImagePromptGenerator(api_key=None, cassette=Cassette(self.path, realtime=True))
+        start = time.perf_counter()
+        generator.enhance_prompt_with_ai("cat")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_followers_receive_leader_exception(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        def call(_):
+            try:
+                flight.do("key", failing)
+            except RuntimeError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(list(executor.map(call, range(4))), ["boom"] * 4)
+        self.assertEqual(flight.in_flight(), 0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def test_requests_per_minute_budget(self):
+        scheduler = RequestScheduler({"chat": RateLimits(requests_per_minute=60)})
+        # קיבולת הפרץ היא 10 שניות של תקציב - 10 בקשות מיידיות
+        start = time.monotonic()
+        for _ in range(11):
+            scheduler.release(scheduler.acquire("chat"))
+        self.assertGreater(time.monotonic() - start, 0.9)
+
+    def test_rate_limited_error_halves_concurrency_and_honours_retry_after(self):
+        scheduler = RequestScheduler(initial_concurrency=8)
+        error = RuntimeError("rate limited")
+        error.status_code = 429
+        error.response = SimpleNamespace(headers={"retry-after-ms": "200"})
+        scheduler.release(scheduler.acquire("chat"), error=error)
+        self.assertEqual(scheduler.concurrency_limit("chat"), 4)
+        start = time.monotonic()
+        scheduler.release(scheduler.acquire("chat"))
+        self.assertGreater(time.monotonic() - start, 0.15)
+
+    def test_normal_latency_variance_keeps_growing_the_limit(self):
+        rng = random.Random(1)
+        limiter = AIMDLimiter(initial=8)
+        now = 0.0
+        for _ in range(2000):
+            latency = rng.lognormvariate(0.69, 0.5)  # חציון 2 שניות, ללא שגיאות
+            now += latency / limiter.limit
+            limiter.on_success(latency, now)
+        self.assertGreater(limiter.limit, 32)
+
+        # האטה מתמשכת (פי 4) מורידה את המגבלה
+        for _ in range(30):
+            now += 8.0
+            limiter.on_success(8.0, now)
+        self.assertLess(limiter.limit, limiter.maximum)
+
+    def test_interrupted_chat_call_releases_its_slot(self):
+        scheduler = RequestScheduler(initial_concurrency=1, max_concurrency=1)
+        generator = AIImagePromptGenerator(api_key="test_key", scheduler=scheduler)
+        generator._send = lambda endpoint, request: (_ for _ in ()).throw(KeyboardInterrupt())
+        with self.assertRaises(KeyboardInterrupt):
+            generator._chat_attempt({"model": "gpt-4", "messages": [], "max_tokens": 10})
+        self.assertEqual(scheduler._lanes["chat"].in_flight, 0)
+
+    def test_stream_holds_its_slot_until_exhausted_or_closed(self):
+        scheduler = RequestScheduler(initial_concurrency=2, max_concurrency=2)
+        generator = AIImagePromptGenerator(api_key="test_key", scheduler=scheduler)
+        generator._send = lambda endpoint, request: iter(["a", "b"])
+        lane = scheduler._lanes["chat"]
+        request = {"model": "gpt-4", "messages": [], "max_tokens": 10, "stream": True}
+        stream = generator._chat_attempt(request)
+        self.assertEqual(next(stream), "a")
+        self.assertEqual(lane.in_flight, 1)
+        self.assertEqual(list(stream), ["b"])
+        self.assertEqual(lane.in_flight, 0)
+        abandoned = generator._chat_attempt(request)
+        next(abandoned)
+        abandoned.close()
+        self.assertEqual(lane.in_flight, 0)
+
+    def test_failed_async_image_call_releases_its_slot(self):
+        scheduler = RequestScheduler(initial_concurrency=1, max_concurrency=1)
+        generator = AIImagePromptGenerator(api_key="test_key", scheduler=scheduler)
+
+        async def send(endpoint, request):
+            raise RuntimeError("boom")
+
+        generator._send_async = send
+        with self.assertRaises(RuntimeError):
+            asyncio.run(generator._images_attempt_async({"prompt": "cat"}))
+        self.assertEqual(scheduler._lanes["images"].in_flight, 0)
+
+    def test_callers_are_served_round_robin(self):
+        scheduler = RequestScheduler(initial_concurrency=1, max_concurrency=1)
+        order = []
+        holder = scheduler.acquire("chat", caller="holder")
+
+        def request(caller):
+            ticket = scheduler.acquire("chat", caller=caller)
+            order.append(caller)
+            scheduler.release(ticket)
+
+        threads = []
+        for caller in ["a", "a", "a", "b"]:
+            thread = threading.Thread(target=request, args=(caller,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        scheduler.release(holder)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["a", "b", "a", "a"])
+
+
+class TestPromptCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_normalizes_whitespace(self):
+        key = PromptCache.make_key("cat,  red ", "general", "gpt-4", 0.7, 300)
+        self.assertEqual(key, PromptCache.make_key("cat, red", "general", "gpt-4", 0.7, 300))
+        self.assertNotEqual(key, PromptCache.make_key("cat, red", "art", "gpt-4", 0.7, 300))
+
+    def test_ttl_and_lru_eviction(self):
+        cache = PromptCache(self.path, ttl=0.05, max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        self.assertEqual(cache.get("a"), "1")
+        cache.set("c", "3")
+        self.assertIsNone(cache.get("b"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+        cache.close()
+
+    def test_generator_serves_enhancement_from_cache(self):
+        cache = PromptCache(self.path)
+        generator = AIImagePromptGenerator(api_key="test_key", cache=cache)
+        request = generator._enhance_request("cat", "general")
+        cache.set(generator._enhance_cache_key("cat", "general", request), "cached cat")
+        self.assertEqual(generator.enhance_prompt_with_ai("cat"), "cached cat")
+        cache.close()
+
 
 if __name__ == "__main__":
     unittest.main()